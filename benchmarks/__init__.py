@@ -0,0 +1,19 @@
+"""
+Offline benchmarks for the error and request pipelines
+
+In-process fakes stand in for the file share, Log Analytics and ACS (registered in the client registry, with
+configurable latency), and synthetic generators produce handler CSVs and trace tables of any size. Run with
+``python -m benchmarks``; see benchmarks/run.py for options.
+"""
+import os
+
+# Settings the services read at import; set before anything under src is imported. Existing values win, so feature
+# flags (e.g. ERRORS_GROUP_SIGNATURES=true) can be benchmarked by setting them in the environment.
+for name, value in {
+    'REPORT_PATH': 'benchmarks',
+    'LOGS_RESOURCE_ID': '/subscriptions/benchmark',
+    'ACS_CONNECTION_STRING': 'endpoint=https://benchmark/;accesskey=benchmark',
+    'ACS_SENDER_ADDRESS': 'benchmark@example.com',
+    'STATE_STORE': 'memory',
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,268 @@
+"""
+In-process fakes for the Azure SDK clients the services use
+
+Each fake implements only the calls the services make, and sleeps for a configurable latency per call to stand in
+for network round-trips. install_fakes() registers them in the client registry, so the services pick them up
+without any code changes.
+"""
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Iterator
+
+from src.scfapp.log_alerts.config import REQUEST_TYPES
+from src.scfapp.log_alerts.services import clients
+from src.scfapp.log_alerts.services.query_cache import CachedLogsQueryResult, CachedLogsTable
+
+CHUNK_SIZE: int = 4 * 1024 * 1024  # StorageStreamDownloader's default chunk size
+
+
+class FakeDownloader:
+    """ Stands in for StorageStreamDownloader """
+    def __init__(self, data: bytes, latency: float):
+        self.data: bytes = data
+        self.latency: float = latency
+        self.size: int = len(data)
+
+    def chunks(self) -> Iterator[bytes]:
+        for start in range(0, len(self.data), CHUNK_SIZE):
+            time.sleep(self.latency)
+            yield self.data[start:start + CHUNK_SIZE]
+
+    def readall(self) -> bytes:
+        time.sleep(self.latency)
+        return self.data
+
+
+class FakeShareFileClient:
+    """ Stands in for ShareFileClient """
+    def __init__(self, share: 'FakeShareClient', path: str):
+        self.share: FakeShareClient = share
+        self.path: str = path
+
+    def download_file(self, offset: int | None = None, length: int | None = None) -> FakeDownloader:
+        time.sleep(self.share.latency)
+        data: bytes = self.share.get(self.path)
+        if offset is not None:
+            data = data[offset:offset + length if length is not None else None]
+        return FakeDownloader(data, self.share.latency)
+
+    def upload_file(self, data: bytes) -> None:
+        time.sleep(self.share.latency)
+        self.share.put(self.path, bytes(data))
+
+    def rename_file(self, new_name: str, overwrite: bool = False) -> None:
+        from azure.core.exceptions import ResourceExistsError
+
+        time.sleep(self.share.latency)
+        with self.share.lock:
+            if new_name in self.share.files and not overwrite:
+                raise ResourceExistsError(f"The specified resource already exists: {new_name}")
+            self.share.files[new_name] = self.share.files.pop(self.share.missing(self.path))
+
+    def delete_file(self) -> None:
+        time.sleep(self.share.latency)
+        with self.share.lock:
+            self.share.files.pop(self.share.missing(self.path))
+
+    def get_file_properties(self) -> Any:
+        time.sleep(self.share.latency)
+        return type('FileProperties', (), {'size': len(self.share.get(self.path))})()
+
+    def create_file(self, size: int) -> None:
+        time.sleep(self.share.latency)
+        self.share.put(self.path, bytes(size))
+
+    def resize_file(self, size: int) -> None:
+        time.sleep(self.share.latency)
+        data: bytes = self.share.get(self.path)
+        self.share.put(self.path, (data + bytes(max(size - len(data), 0)))[:size])
+
+    def upload_range(self, data: bytes, offset: int, length: int) -> None:
+        time.sleep(self.share.latency)
+        with self.share.lock:
+            current: bytearray = bytearray(self.share.files[self.share.missing(self.path)])
+            current[offset:offset + length] = data[:length]
+            self.share.files[self.path] = bytes(current)
+
+
+class FakeShareDirectoryClient:
+    """ Stands in for ShareDirectoryClient """
+    def __init__(self, share: 'FakeShareClient', path: str):
+        self.share: FakeShareClient = share
+        self.path: str = path.strip('/')
+
+    def list_directories_and_files(self) -> list[dict]:
+        time.sleep(self.share.latency)
+        prefix: str = f"{self.path}/"
+        items: dict[str, dict] = {}
+        with self.share.lock:
+            for path, data in self.share.files.items():
+                if not path.startswith(prefix):
+                    continue
+                name, _, rest = path[len(prefix):].partition('/')
+                items[name] = {'name': name, 'is_directory': bool(rest), 'size': 0 if rest else len(data)}
+            for directory in self.share.directories:
+                name = directory[len(prefix):].partition('/')[0]
+                if directory.startswith(prefix) and name not in items:
+                    items[name] = {'name': name, 'is_directory': True, 'size': 0}
+            if not items and self.path not in self.share.directories:
+                self.share.missing(f"{self.path}/")  # Directories only exist once created or holding files
+        return list(items.values())
+
+    def create_directory(self) -> None:
+        from azure.core.exceptions import ResourceExistsError
+
+        time.sleep(self.share.latency)
+        with self.share.lock:
+            if self.path in self.share.directories:
+                raise ResourceExistsError(f"The specified resource already exists: {self.path}")
+            self.share.directories.add(self.path)
+
+
+class FakeShareClient:
+    """ Stands in for ShareClient: a flat dict of paths to bytes """
+    def __init__(self, latency: float = 0.0):
+        self.latency: float = latency
+        self.files: dict[str, bytes] = {}
+        self.directories: set[str] = set()  # Created explicitly; directories holding files also exist
+        self.lock: threading.Lock = threading.Lock()
+
+    def get_file_client(self, path: str) -> FakeShareFileClient:
+        return FakeShareFileClient(self, path)
+
+    def get_directory_client(self, path: str) -> FakeShareDirectoryClient:
+        return FakeShareDirectoryClient(self, path)
+
+    def missing(self, path: str) -> str:
+        """ Raise ResourceNotFoundError if a file doesn't exist, otherwise return its path """
+        from azure.core.exceptions import ResourceNotFoundError
+
+        if path not in self.files:
+            raise ResourceNotFoundError(f"The specified resource does not exist: {path}")
+        return path
+
+    def get(self, path: str) -> bytes:
+        with self.lock:
+            return self.files[self.missing(path)]
+
+    def put(self, path: str, data: bytes) -> None:
+        with self.lock:
+            self.files[path] = data
+
+
+class FakeLogsQueryClient:
+    """
+    Stands in for LogsQueryClient over an in-memory traces table
+
+    It recognizes the three query shapes RequestsService sends (per type, batched and summarized) and answers them
+    the way Log Analytics would; it is not a KQL engine.
+    """
+    PER_TYPE_PATTERN: re.Pattern = re.compile(r"message has '([^']*)'")
+
+    def __init__(self, traces: list[tuple[datetime, str]], latency: float = 0.0):
+        self.traces: list[tuple[datetime, str]] = traces  # (timestamp, message), in time order
+        self.latency: float = latency
+        self.queries: int = 0
+
+    def query_resource(
+            self, resource_id: str, query: str, *, timespan: tuple[datetime, datetime], **kwargs: Any
+    ) -> CachedLogsQueryResult:
+        time.sleep(self.latency)
+        self.queries += 1
+        start, end = timespan
+        traces: list[tuple[datetime, str]] = [trace for trace in self.traces if start <= trace[0] < end]
+
+        if '| summarize request_count' in query:
+            return CachedLogsQueryResult([self.summarized(traces)])
+        if '| project request_type' in query:
+            rows: list[list] = [[rtype, ts, message] for ts, message, rtype in self.classified(traces)]
+            return CachedLogsQueryResult([CachedLogsTable(
+                'PrimaryResult', ['request_type', 'timestamp', 'message'], ['string', 'datetime', 'string'], rows
+            )])
+
+        term: str = self.PER_TYPE_PATTERN.search(query).group(1)
+        rows = [[ts, message] for ts, message in traces if term in message]
+        return CachedLogsQueryResult([CachedLogsTable(
+            'PrimaryResult', ['timestamp', 'message'], ['datetime', 'string'], rows
+        )])
+
+    def classified(self, traces: list[tuple[datetime, str]]) -> Iterator[tuple[datetime, str, str]]:
+        """ Tag traces with the first request type whose query string they contain """
+        for ts, message in traces:
+            for rtype in REQUEST_TYPES:
+                if rtype['query_string'] in message:
+                    yield ts, message, rtype['type']
+                    break
+
+    def summarized(self, traces: list[tuple[datetime, str]]) -> CachedLogsTable:
+        """ (request_type, request_id, request_count, first_seen), ordered by type then first appearance """
+        groups: dict[tuple[str, str], list] = {}
+        for ts, message, rtype in self.classified(traces):
+            key: tuple[str, str] = (rtype, message.rsplit(':', 1)[-1].strip())
+            if key in groups:
+                groups[key][2] += 1
+            else:
+                groups[key] = [rtype, key[1], 1, ts]
+        rows: list[list] = sorted(groups.values(), key=lambda row: (row[0], row[3]))
+        return CachedLogsTable('PrimaryResult', ['request_type', 'request_id', 'request_count', 'first_seen'],
+                               ['string', 'string', 'long', 'datetime'], rows)
+
+
+class FakePoller:
+    """ Stands in for the LROPoller returned by EmailClient.begin_send """
+    def __init__(self, message_id: str):
+        self.message_id: str = message_id
+
+    def result(self) -> dict:
+        return {'id': self.message_id, 'status': 'Succeeded'}
+
+    def done(self) -> bool:
+        return True
+
+    def status(self) -> str:
+        return 'Succeeded'
+
+
+class FakeEmailClient:
+    """ Stands in for EmailClient; records the messages it was asked to send """
+    def __init__(self, latency: float = 0.0):
+        self.latency: float = latency
+        self.sent: list[dict] = []
+        self.lock: threading.Lock = threading.Lock()
+
+    def begin_send(self, message: dict) -> FakePoller:
+        time.sleep(self.latency)
+        with self.lock:
+            self.sent.append(message)
+            return FakePoller(f"fake-{len(self.sent)}")
+
+
+def install_fakes(
+        traces: list[tuple[datetime, str]] | None = None,
+        share_latency: float = 0.0,
+        query_latency: float = 0.0,
+        email_latency: float = 0.0
+) -> tuple[FakeShareClient, FakeLogsQueryClient, FakeEmailClient]:
+    """
+    Register fresh fakes in the client registry
+
+    Args:
+        traces (list[tuple[datetime, str]] | None): Traces the query fake serves
+        share_latency (float): Seconds per file share call
+        query_latency (float): Seconds per query
+        email_latency (float): Seconds per send
+
+    Returns:
+        tuple[FakeShareClient, FakeLogsQueryClient, FakeEmailClient]: The registered fakes
+    """
+    share: FakeShareClient = FakeShareClient(share_latency)
+    logs: FakeLogsQueryClient = FakeLogsQueryClient(traces or [], query_latency)
+    email: FakeEmailClient = FakeEmailClient(email_latency)
+
+    clients.register_client(clients.SHARE_CLIENT, share)
+    clients.register_client(clients.LOGS_QUERY_CLIENT, logs)
+    clients.register_client(clients.EMAIL_CLIENT, email)
+
+    return share, logs, email
@@ -0,0 +1,88 @@
+"""
+Synthetic handler logs and request traces
+
+Both generators are seeded, so a given size always produces the same data and runs are comparable.
+"""
+import csv
+import io
+import random
+from datetime import datetime, timedelta
+
+from src.scfapp.log_alerts.config import REQUEST_TYPES
+
+# Message templates shaped like the handlers' errors: a fixed text with a barcode, MMS ID or UUID in it
+ERROR_TEMPLATES: tuple[str, ...] = (
+    "Item not found. Barcode: {barcode}",
+    "Failed to create request for MMS ID {mms_id}: item is not in place",
+    "Loan could not be returned for barcode {barcode} (request {uuid})",
+    "Alma API returned 500 for {uuid}",
+    "Timed out after 30s waiting for {barcode}",
+)
+DISTINCT_IDS: int = 5000  # Repeated IDs, so summaries and request counts have duplicates to find
+
+
+def error_log_csv(rows: int, day: datetime, seed: int = 1) -> bytes:
+    """
+    A handler CSV log (Timestamp, Barcode, Message) for one day
+
+    Args:
+        rows (int): Number of rows
+        day (datetime): Day the rows fall on
+        seed (int): Random seed
+
+    Returns:
+        bytes: CSV contents
+    """
+    rng: random.Random = random.Random(seed)
+    buffer: io.StringIO = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['Timestamp', 'Barcode', 'Message'])
+
+    step: float = 86400 / max(rows, 1)  # Spread evenly over the day
+    for i in range(rows):
+        barcode: str = f"3{rng.randrange(DISTINCT_IDS):013d}"
+        message: str = rng.choice(ERROR_TEMPLATES).format(
+            barcode=barcode,
+            mms_id=f"99{rng.randrange(DISTINCT_IDS):012d}3651",
+            uuid=f"{rng.getrandbits(128):032x}"
+        )
+        writer.writerow([(day + timedelta(seconds=i * step)).isoformat(timespec='seconds'), barcode, message])
+
+    return buffer.getvalue().encode()
+
+
+def request_traces(rows: int, start: datetime, seed: int = 1) -> list[tuple[datetime, str]]:
+    """
+    Request trace messages for one day, in time order, spread across the configured request types
+
+    Args:
+        rows (int): Number of traces
+        start (datetime): Start of the day
+        seed (int): Random seed
+
+    Returns:
+        list[tuple[datetime, str]]: (timestamp, message) pairs
+    """
+    rng: random.Random = random.Random(seed)
+    step: float = 86400 / max(rows, 1)
+    return [
+        (
+            start + timedelta(seconds=i * step),
+            f"{request_prefix(rng.choice(REQUEST_TYPES))} {rng.randrange(DISTINCT_IDS):014d}"
+        )
+        for i in range(rows)
+    ]
+
+
+def request_prefix(rtype: dict) -> str:
+    """
+    Message text before the ID; the services take the ID from after the last colon
+
+    Args:
+        rtype (dict): Request type
+
+    Returns:
+        str: Prefix
+    """
+    query_string: str = rtype['query_string']
+    return query_string if query_string.endswith(':') else f"{query_string}:"
@@ -0,0 +1,323 @@
+"""
+Benchmark runner for the error, request and email stages
+
+Each stage runs against the in-process fakes at each size: once under tracemalloc for peak memory, then --repeat
+times untraced for wall time (the fastest run is kept). Results are compared with benchmarks/baselines.json and the
+run fails if any stage is slower or uses more memory than its baseline allows. Wall times are compared relative to a
+fixed calibration workload timed on the same machine, so baselines recorded on other hardware still apply.
+
+Usage:
+    python -m benchmarks [--sizes 1000,100000] [--stages errors,requests,email] [--repeat 5] [--tolerance 0.5]
+                         [--share-latency 0] [--query-latency 0] [--email-latency 0.02] [--update-baselines]
+
+Add 1000000 to --sizes for the 1M-row runs; they take a few minutes and aren't part of the default set.
+"""
+import argparse
+import csv
+import gc
+import html
+import io
+import json
+import logging
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable
+from zoneinfo import ZoneInfo
+
+from benchmarks.fakes import install_fakes
+from benchmarks.generators import error_log_csv, request_traces
+from src.scfapp.log_alerts.config import ERROR_TYPES, REPORT_PATH
+from src.scfapp.log_alerts.services.email_service import EmailService
+from src.scfapp.log_alerts.services.error_rows import ErrorRows
+from src.scfapp.log_alerts.services.error_signatures import get_normalizer
+from src.scfapp.log_alerts.services.error_summary import ErrorSummary
+from src.scfapp.log_alerts.services.errors_service import ErrorsService
+from src.scfapp.log_alerts.services.requests_service import RequestsService
+
+BASELINES_PATH: Path = Path(__file__).resolve().parent / 'baselines.json'
+CALIBRATION_KEY: str = 'calibration'  # Baseline entry for the machine's speed
+CALIBRATION_ROWS: int = 20000  # Rows in the calibration workload
+DEFAULT_SIZES: tuple[int, ...] = (1000, 100000)
+EMAIL_BATCH: int = 20  # Messages per send_batch run
+NOISE_FLOOR: dict[str, float] = {'seconds': 0.05, 'peak_bytes': 1024 * 1024}  # Smaller increases are never flagged
+REPORT_DAY: datetime = datetime(2026, 1, 15, tzinfo=ZoneInfo('America/New_York'))  # Fixed, so runs are comparable
+
+
+@dataclass
+class Result:
+    """ One stage at one size """
+    key: str  # 'stage@size'
+    seconds: float  # Fastest wall time
+    rows: int  # Rows (or messages) processed
+    peak_bytes: int  # Peak traced allocation
+
+    @property
+    def throughput(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class Workload:
+    """ Data for one size, loaded into fresh fakes """
+    def __init__(self, size: int, args: argparse.Namespace):
+        self.size: int = size
+        self.err_type: dict = ERROR_TYPES[0]
+        self.filestring: str = REPORT_DAY.strftime('%Y%m%d')
+        self.log: bytes = error_log_csv(size, REPORT_DAY.replace(tzinfo=None))
+        self.traces: list[tuple[datetime, str]] = request_traces(size, REPORT_DAY)
+        self.timespan: tuple[datetime, datetime] = (REPORT_DAY, REPORT_DAY + timedelta(days=1))
+
+        self.share, self.logs_client, self.email_client = install_fakes(
+            self.traces, args.share_latency, args.query_latency, args.email_latency
+        )
+        self.share.put(f"{REPORT_PATH}/{ErrorsService().log_filename(self.err_type, self.filestring)}", self.log)
+
+        # Inputs for the stages that start from parsed data
+        self.error_rows: ErrorRows = ErrorsService().get_errors(self.err_type, self.filestring)
+        self.request_data: list[dict] = RequestsService().get_requests_per_type(self.logs_client, self.timespan)
+
+
+def stage_get_errors(work: Workload) -> int:
+    return len(ErrorsService().get_errors(work.err_type, work.filestring))
+
+
+def stage_error_body(work: Workload) -> int:
+    ErrorsService().generate_email_body(work.err_type, work.error_rows)
+    return len(work.error_rows)
+
+
+def stage_error_signatures(work: Workload) -> int:
+    summary: ErrorSummary = ErrorSummary(work.err_type, get_normalizer(work.err_type))
+    for row in work.error_rows:
+        summary.add(row)
+    summary.top(25)
+    return summary.rows
+
+
+def stage_requests_per_type(work: Workload) -> int:
+    RequestsService().get_requests_per_type(work.logs_client, work.timespan)
+    return work.size
+
+
+def stage_requests_summarized(work: Workload) -> int:
+    RequestsService().get_requests_summarized(work.logs_client, work.timespan)
+    return work.size
+
+
+def stage_request_body(work: Workload) -> int:
+    RequestsService().generate_email_body(work.request_data, REPORT_DAY.strftime('%Y-%m-%d'))
+    return work.size
+
+
+def stage_send_batch(work: Workload) -> int:
+    email_service: EmailService = EmailService()
+    recipients: list[dict] = email_service.create_email_recipients('benchmark@example.com')
+    results: list[dict] = email_service.send_batch([
+        {'subject': f"Benchmark {i}", 'html_body': '<p>Benchmark</p>', 'to_recipients': recipients}
+        for i in range(EMAIL_BATCH)
+    ])
+    return sum(1 for result in results if result['status'] == 'Succeeded')
+
+
+# Stages by group: (name, function, whether it depends on the size)
+STAGES: dict[str, list[tuple[str, Callable[[Workload], int], bool]]] = {
+    'errors': [
+        ('errors.get_errors', stage_get_errors, True),
+        ('errors.email_body', stage_error_body, True),
+        ('errors.signatures', stage_error_signatures, True),
+    ],
+    'requests': [
+        ('requests.per_type', stage_requests_per_type, True),
+        ('requests.summarized', stage_requests_summarized, True),
+        ('requests.email_body', stage_request_body, True),
+    ],
+    'email': [
+        ('email.send_batch', stage_send_batch, False),
+    ],
+}
+
+
+def measure(name: str, stage: Callable[[Workload], int], work: Workload, repeat: int) -> tuple[float, int, int]:
+    """
+    Time a stage and trace its peak memory
+
+    Args:
+        name (str): Stage name, for logging
+        stage (Callable[[Workload], int]): Stage
+        work (Workload): Data
+        repeat (int): Timed runs
+
+    Returns:
+        tuple[float, int, int]: Fastest wall time, rows processed and peak traced bytes
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        stage(work)
+        peak: int = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    best: float = float('inf')
+    rows: int = 0
+    for _ in range(max(repeat, 1)):
+        gc.collect()
+        start: float = time.perf_counter()
+        rows = stage(work)
+        best = min(best, time.perf_counter() - start)
+
+    logging.debug(f"{name}: {best:.4f}s, {rows} rows, {peak} bytes peak")
+    return best, rows, peak
+
+
+def calibrate(repeat: int) -> float:
+    """
+    Time a fixed CPU-bound workload (CSV parsing and HTML escaping, like the stages) that doesn't depend on the code
+    under test, as a measure of the machine's speed
+
+    Args:
+        repeat (int): Timed runs
+
+    Returns:
+        float: Fastest wall time
+    """
+    data: str = '\n'.join(
+        f"2026-01-15T00:{i // 60 % 60:02d}:{i % 60:02d},3123400{i:07d},\"Request {i} failed: <item>\""
+        for i in range(CALIBRATION_ROWS)
+    )
+    best: float = float('inf')
+    for _ in range(max(repeat, 1)):
+        gc.collect()
+        start: float = time.perf_counter()
+        ''.join(f"<td>{html.escape(row[2])}</td>" for row in csv.reader(io.StringIO(data)))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(args: argparse.Namespace) -> list[Result]:
+    """
+    Run the selected stages at each size
+
+    Args:
+        args (argparse.Namespace): Parsed arguments
+
+    Returns:
+        list[Result]: Results in run order
+    """
+    results: list[Result] = []
+    fixed_done: set[str] = set()  # Size-independent stages only run once
+
+    for size in args.sizes:
+        work: Workload = Workload(size, args)
+        for group in args.stages:
+            for name, stage, sized in STAGES[group]:
+                if not sized and name in fixed_done:
+                    continue
+                fixed_done.add(name)
+                seconds, rows, peak = measure(name, stage, work, args.repeat)
+                key: str = f"{name}@{size if sized else EMAIL_BATCH}"
+                results.append(Result(key, seconds, rows, peak))
+                print(f"{key:<32} {seconds * 1000:>10.1f} ms {results[-1].throughput:>14,.0f} rows/s "
+                      f"{peak / 1024 / 1024:>9.1f} MiB peak")
+
+    return results
+
+
+def compare(results: list[Result], baselines: dict[str, dict], tolerance: float, calibration: float) -> list[str]:
+    """
+    Find results worse than their baselines by more than the tolerance
+
+    Baseline wall times are scaled by how much slower (or faster) this machine ran the calibration workload than the
+    machine that recorded them. Without a recorded calibration, only peak memory is checked.
+
+    Args:
+        results (list[Result]): Results
+        baselines (dict[str, dict]): Baselines by key ({'seconds', 'peak_bytes'}), and the calibration ({'seconds'})
+        tolerance (float): Allowed fractional increase (0.5 allows 50% worse), on top of NOISE_FLOOR
+        calibration (float): This run's calibration time
+
+    Returns:
+        list[str]: Regression descriptions
+    """
+    recorded: dict | None = baselines.get(CALIBRATION_KEY)
+    scale: float | None = calibration / recorded['seconds'] if recorded else None  # This machine's relative time
+    if scale is None:
+        print("No calibration baseline; checking peak memory only")
+
+    regressions: list[str] = []
+    for result in results:
+        baseline: dict | None = baselines.get(result.key)
+        if baseline is None:
+            print(f"{result.key}: no baseline")
+            continue
+
+        for field, value in (('seconds', result.seconds), ('peak_bytes', result.peak_bytes)):
+            if field == 'seconds' and scale is None:
+                continue
+            expected: float = baseline[field] * scale if field == 'seconds' else baseline[field]
+            limit: float = expected * (1 + tolerance) + NOISE_FLOOR[field]
+            if value > limit:
+                regressions.append(f"{result.key} {field}: {value:.4g} > {limit:.4g} (baseline {expected:.4g})")
+
+    return regressions
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """
+    Parse command-line arguments
+
+    Args:
+        argv (list[str] | None): Arguments (default sys.argv)
+
+    Returns:
+        argparse.Namespace: Parsed arguments
+    """
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=lambda value: [int(size) for size in value.split(',')],
+                        default=list(DEFAULT_SIZES), help="Comma-separated row counts")
+    parser.add_argument('--stages', type=lambda value: value.split(','), default=list(STAGES),
+                        help=f"Comma-separated stage groups ({', '.join(STAGES)})")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per stage; the fastest is kept")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="Allowed fractional regression")
+    parser.add_argument('--share-latency', type=float, default=0.0, help="Seconds per file share call")
+    parser.add_argument('--query-latency', type=float, default=0.0, help="Seconds per Log Analytics query")
+    parser.add_argument('--email-latency', type=float, default=0.02, help="Seconds per ACS send")
+    parser.add_argument('--update-baselines', action='store_true', help="Record these results as the baselines")
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    unknown: list[str] = [group for group in args.stages if group not in STAGES]
+    if unknown:
+        parser.error(f"Unknown stage groups: {', '.join(unknown)}")
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    args: argparse.Namespace = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    calibration: float = calibrate(args.repeat)
+    print(f"{CALIBRATION_KEY:<32} {calibration * 1000:>10.1f} ms")
+    results: list[Result] = run(args)
+    baselines: dict[str, Any] = json.loads(BASELINES_PATH.read_text()) if BASELINES_PATH.exists() else {}
+
+    if args.update_baselines:
+        baselines.update({
+            result.key: {'seconds': round(result.seconds, 6), 'peak_bytes': result.peak_bytes} for result in results
+        })
+        baselines[CALIBRATION_KEY] = {'seconds': round(calibration, 6)}
+        BASELINES_PATH.write_text(json.dumps(baselines, indent=2, sort_keys=True) + '\n')
+        print(f"Updated {len(results)} baselines in {BASELINES_PATH.name}")
+        return 0
+
+    regressions: list[str] = compare(results, baselines, args.tolerance, calibration)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print("FAIL" if regressions else "OK")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
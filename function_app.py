@@ -1,9 +1,13 @@
 """Azure Function for SCFApp Log Alerts"""
 import azure.functions as func
+from src.scfapp.log_alerts.blueprints.bp_digest import bp as digest_bp
+from src.scfapp.log_alerts.blueprints.bp_error_worker import bp as error_worker_bp
 from src.scfapp.log_alerts.blueprints.bp_errors import bp as errors_bp
 from src.scfapp.log_alerts.blueprints.bp_requests import bp as requests_bp
 
 app = func.FunctionApp()
 
 app.register_blueprint(errors_bp)
+app.register_blueprint(error_worker_bp)
 app.register_blueprint(requests_bp)
+app.register_blueprint(digest_bp)
@@ -0,0 +1,125 @@
+"""
+Cold-start import report for function_app
+
+Runs ``python -X importtime -c "import function_app"`` in a fresh interpreter, prints a breakdown of where the import
+time goes and fails if the total exceeds the budget or if any heavy SDK is loaded at module import.
+
+Usage:
+    python scripts/import_time_report.py [--budget-ms 500] [--runs 3] [--top 15]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+REPO_ROOT: Path = Path(__file__).resolve().parent.parent
+
+# Modules that should only be imported when a function first runs
+DEFERRED_MODULES: tuple[str, ...] = (
+    'pandas',
+    'azure.monitor.query',
+    'azure.identity',
+    'azure.storage.fileshare',
+    'azure.storage.queue',
+    'azure.communication.email',
+    'azure.monitor.opentelemetry',
+    'opentelemetry',
+)
+
+IMPORTTIME_LINE: re.Pattern = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def measure(target: str) -> list[tuple[int, int, int, str]]:
+    """
+    Import a module in a fresh interpreter with -X importtime
+
+    Args:
+        target (str): Module to import
+
+    Returns:
+        list[tuple[int, int, int, str]]: (self µs, cumulative µs, depth, module) for each import
+    """
+    env: dict[str, str] = dict(os.environ, PYTHONPATH=str(REPO_ROOT))
+    result: subprocess.CompletedProcess = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"Importing {target} failed:\n{result.stderr}")
+
+    entries: list[tuple[int, int, int, str]] = []
+    for line in result.stderr.splitlines():
+        match: re.Match | None = IMPORTTIME_LINE.match(line)
+        if match:
+            entries.append((int(match[1]), int(match[2]), len(match[3]) // 2, match[4]))
+    return entries
+
+
+def package_of(module: str) -> str:
+    """
+    Group a module under its distribution-level package (e.g. azure.storage.fileshare)
+
+    Args:
+        module (str): Dotted module name
+
+    Returns:
+        str: Package name
+    """
+    parts: list[str] = module.split('.')
+    if parts[0] == 'azure' and len(parts) > 2 and parts[1] in ('storage', 'monitor', 'communication'):
+        return '.'.join(parts[:3])
+    if parts[0] in ('azure', 'src'):
+        return '.'.join(parts[:2])
+    return parts[0]
+
+
+def main() -> int:
+    """
+    Print the import report and check it against the budget
+
+    Returns:
+        int: Process exit code
+    """
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--target', default='function_app', help='Module to import (default: function_app)')
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('IMPORT_TIME_BUDGET_MS', 500)),
+                        help='Fail if the total import time exceeds this many milliseconds')
+    parser.add_argument('--runs', type=int, default=3, help='Take the fastest of this many runs')
+    parser.add_argument('--top', type=int, default=15, help='Number of packages to list')
+    args: argparse.Namespace = parser.parse_args()
+
+    runs: list[list[tuple[int, int, int, str]]] = [measure(args.target) for _ in range(max(args.runs, 1))]
+    entries: list[tuple[int, int, int, str]] = min(runs, key=lambda run: sum(e[0] for e in run))  # Fastest run
+    total_ms: float = sum(e[0] for e in entries) / 1000
+
+    by_package: dict[str, int] = defaultdict(int)
+    for self_us, _, _, module in entries:
+        by_package[package_of(module)] += self_us
+
+    print(f"Import of {args.target}: {total_ms:.1f} ms total ({len(entries)} modules, best of {len(runs)})\n")
+    print(f"{'package':<40} {'self ms':>10} {'share':>7}")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{package:<40} {self_us / 1000:>10.1f} {self_us / 1000 / total_ms:>7.1%}")
+
+    failures: list[str] = []
+    loaded: set[str] = {e[3] for e in entries}
+    for module in DEFERRED_MODULES:
+        if module in loaded:
+            failures.append(f"{module} is imported at startup; it should load when its function first runs")
+    if total_ms > args.budget_ms:
+        failures.append(f"total import time {total_ms:.1f} ms exceeds budget of {args.budget_ms:.0f} ms")
+
+    print()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print(f"OK: within {args.budget_ms:.0f} ms budget and no heavy SDKs loaded at startup")
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,30 @@
+"""Blueprint for the SCFApp daily digest"""
+import azure.functions as func
+
+from src.scfapp.log_alerts.config import DIGEST_NCRON, DISABLE_EMAIL
+
+bp = func.Blueprint()
+
+
+if DIGEST_NCRON:  # Only registered when a digest schedule is configured
+    # noinspection PyUnusedLocal
+    @bp.timer_trigger(
+        schedule=DIGEST_NCRON,
+        arg_name="digest_timer",
+        run_on_startup=False
+    )
+    def DailyDigest(digest_timer: func.TimerRequest) -> None:
+        """
+        Azure Function to gather yesterday's error logs and requests concurrently and send one combined report per
+        set of recipients, archiving the error logs that were delivered.
+
+        Args:
+            digest_timer (func.TimerRequest): timer trigger
+        """
+        if DISABLE_EMAIL:  # If email is disabled, skip
+            return
+
+        # Imported here so the SDKs and pandas load when this function first runs, not at host startup
+        from src.scfapp.log_alerts.services.digest_service import DigestService
+
+        DigestService().run()
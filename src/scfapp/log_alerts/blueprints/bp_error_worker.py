@@ -0,0 +1,29 @@
+"""Blueprint for the SCFApp Error Alerts fan-out worker"""
+import azure.functions as func
+
+from src.scfapp.log_alerts.config import DISABLE_EMAIL, ERRORS_FANOUT, ERRORS_QUEUE_NAME, ERRORS_QUEUE_CONNECTION
+
+bp = func.Blueprint()
+
+
+if ERRORS_FANOUT:  # Only registered in fan-out mode
+    @bp.queue_trigger(
+        arg_name="msg",
+        queue_name=ERRORS_QUEUE_NAME,
+        connection=ERRORS_QUEUE_CONNECTION
+    )
+    def ErrorLogWorker(msg: func.QueueMessage) -> None:
+        """
+        Azure Function triggered by an error log work item enqueued by ErrorLogAlert, to report and archive that one
+        log. Raising makes the host retry the item, then move it to the poison queue.
+
+        Args:
+            msg (func.QueueMessage): queue message
+        """
+        if DISABLE_EMAIL:  # If email is disabled, skip
+            return
+
+        # Imported here so the storage SDKs load when this function first runs, not at host startup
+        from src.scfapp.log_alerts.services.error_queue_service import ErrorQueueService
+
+        ErrorQueueService().process(msg.get_body().decode('utf-8'))
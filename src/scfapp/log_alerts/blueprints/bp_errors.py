@@ -1,8 +1,17 @@
 """Blueprint for SCFApp Error Alerts"""
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
 import azure.functions as func
 
-from src.scfapp.log_alerts.config import ERRORS_NCRON, ERROR_TYPES, DISABLE_EMAIL
-from src.scfapp.log_alerts.services.errors_service import ErrorsService
+from src.scfapp.log_alerts.config import (
+    ERRORS_NCRON, ERROR_TYPES, DISABLE_EMAIL, ERRORS_ASYNC, ERRORS_DISCOVERY, ERRORS_CATCHUP, ERRORS_FANOUT,
+    EMAIL_BATCH, ARCHIVE_NCRON, DIGEST_NCRON
+)
+
+if TYPE_CHECKING:  # Services are imported when the functions first run
+    from src.scfapp.log_alerts.services.errors_service import ErrorsService
 
 bp = func.Blueprint()
 
@@ -24,16 +33,82 @@ def ErrorLogAlert(mytimer: func.TimerRequest) -> None:
     if DISABLE_EMAIL:  # If email is disabled, skip
         return
 
+    if DIGEST_NCRON:  # DailyDigest reports and archives yesterday's logs instead
+        logging.warning(
+            "DIGEST_NCRON is set, so ErrorLogAlert is skipped: DailyDigest reports yesterday's error logs, and "
+            "ERRORS_CATCHUP, ERRORS_FANOUT, ERRORS_ASYNC and EMAIL_BATCH don't apply"
+        )
+        return
+
+    # Imported here so the storage SDK loads when this function first runs, not at host startup
+    from src.scfapp.log_alerts.services.errors_service import ErrorsService
+
     errors_service: ErrorsService = ErrorsService()  # Instance of errors service
 
     yesterday_filestring: str = errors_service.set_filestring()  # Yesterday's date string
 
-    for err_type in ERROR_TYPES:  # Iterate through each error type
+    if ERRORS_FANOUT:  # Enqueue one work item per log for ErrorLogWorker (with ERRORS_CATCHUP, earlier days' too)
+        from src.scfapp.log_alerts.services.error_queue_service import ErrorQueueService
+
+        ErrorQueueService(errors_service).enqueue(ERROR_TYPES, yesterday_filestring, ERRORS_CATCHUP)
+
+    elif ERRORS_CATCHUP:  # Report and archive every unarchived log, one email per error type
+        errors_service.process_catchup(ERROR_TYPES, yesterday_filestring)
+
+    else:
+        process_day(errors_service, yesterday_filestring)
+
+    errors_service.record_daily_volumes(ERROR_TYPES, yesterday_filestring)  # Zeros for error types with no errors
+
+
+def process_day(errors_service: 'ErrorsService', yesterday_filestring: str) -> None:
+    """
+    Report yesterday's error logs, archiving each once its email is delivered
+
+    Args:
+        errors_service (ErrorsService): Errors service
+        yesterday_filestring (str): Yesterday filestring
+    """
+    error_types: list[dict] = ERROR_TYPES  # Error types to fetch
+    if ERRORS_DISCOVERY:  # Only fetch logs that exist and aren't empty
+        error_types = errors_service.available_error_types(ERROR_TYPES, yesterday_filestring)
+
+    if ERRORS_ASYNC:  # Process all error types concurrently
+        asyncio.run(errors_service.process_errors_async(error_types, yesterday_filestring))
+        return
+
+    if EMAIL_BATCH:  # Send all reports concurrently and archive the delivered ones
+        errors_service.process_errors_batched(error_types, yesterday_filestring)
+        return
+
+    for err_type in error_types:  # Iterate through each error type
         all_errors: list[dict] | None = errors_service.get_errors(err_type, yesterday_filestring)  # Get all errors
 
         if not all_errors:  # If no errors found, skip
             continue
 
-        errors_service.send_email_wrapper(err_type, all_errors)  # Send email
+        if not errors_service.send_email_wrapper(err_type, all_errors):  # Send email
+            logging.error(f"{err_type['type']} report was not delivered; leaving its log for the next run")
+            continue
 
         errors_service.archive_error_log(err_type, yesterday_filestring)  # Archive error log
+
+
+if ARCHIVE_NCRON:  # Only registered when a compaction schedule is configured
+    # noinspection PyUnusedLocal
+    @bp.timer_trigger(
+        schedule=ARCHIVE_NCRON,
+        arg_name="archive_timer",
+        run_on_startup=False
+    )
+    def ErrorArchiveCompaction(archive_timer: func.TimerRequest) -> None:
+        """
+        Azure Function to roll closed months of archived error logs in REPORT_PATH/OLD into one compressed bundle
+        per error type and month.
+
+        Args:
+            archive_timer (func.TimerRequest): timer trigger
+        """
+        from src.scfapp.log_alerts.services.archive_service import ArchiveService
+
+        ArchiveService().compact_closed_months()
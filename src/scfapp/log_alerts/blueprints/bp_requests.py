@@ -1,8 +1,9 @@
 """ Azure Function Blueprint for SCFApp Requests Log Alert. """
+import logging
+
 import azure.functions as func
 
-from src.scfapp.log_alerts.config import REQUESTS_NCRON, DISABLE_EMAIL
-from src.scfapp.log_alerts.services.requests_service import RequestsService
+from src.scfapp.log_alerts.config import REQUESTS_NCRON, DISABLE_EMAIL, REQUESTS_INGEST_NCRON, DIGEST_NCRON
 
 bp: func.Blueprint = func.Blueprint()
 
@@ -25,8 +26,36 @@ def RequestLogAlert(applog_timer: func.TimerRequest) -> None:
     if DISABLE_EMAIL:  # If email is disabled, skip
         return
 
+    if DIGEST_NCRON:  # DailyDigest reports the requests instead
+        logging.warning("DIGEST_NCRON is set, so RequestLogAlert is skipped: DailyDigest reports the requests")
+        return
+
+    # Imported here so the query SDK and pandas load when this function first runs, not at host startup
+    from src.scfapp.log_alerts.services.requests_service import RequestsService
+
     requests_service = RequestsService()  # Instance of requests service
     scfapp_requests: list[dict] | None = requests_service.get_requests()  # Get requests
 
     if scfapp_requests:
         requests_service.send_email_wrapper(scfapp_requests)  # Send email
+
+
+if REQUESTS_INGEST_NCRON:  # Only registered when a polling schedule is configured
+    # noinspection PyUnusedLocal,PyTypeChecker
+    @bp.timer_trigger(
+        schedule=REQUESTS_INGEST_NCRON,
+        arg_name="ingest_timer",
+        run_on_startup=False
+    )
+    def RequestIngest(ingest_timer: func.TimerRequest) -> None:
+        """
+        Azure Function to add requests logged since the last run to the day's running tally, so the daily
+        report (with REQUESTS_INCREMENTAL) only has to query the last few minutes.
+
+        Args:
+            ingest_timer (func.TimerRequest): timer trigger
+
+        """
+        from src.scfapp.log_alerts.services.requests_service import RequestsService
+
+        RequestsService().ingest_recent_requests()  # Query only the delta since the last watermark
@@ -60,6 +60,118 @@ disable_email_setting: str | None = os.environ.get("DISABLE_EMAIL")
 if disable_email_setting and disable_email_setting.strip().lower() in ("true", "1", "yes", "on"):
     DISABLE_EMAIL = True
 
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """
+    Read a boolean feature flag from the environment
+
+    Args:
+        name (str): Environment variable name
+        default (bool): Value to use when the variable is unset or empty
+
+    Returns:
+        bool: True if the variable is set to a truthy value
+    """
+    setting: str | None = os.environ.get(name)
+    if not setting or setting.strip() == "":
+        return default
+    return setting.strip().lower() in ("true", "1", "yes", "on")
+
+
+# Query all request types in a single batched KQL statement
+REQUESTS_BATCHED_QUERY: bool = env_flag("REQUESTS_BATCHED_QUERY")
+
+# Extract request IDs and counts server-side instead of returning full traces
+REQUESTS_SUMMARIZED_QUERY: bool = env_flag("REQUESTS_SUMMARIZED_QUERY")
+
+# Split the day's request queries into concurrent time slices, re-splitting any slice that comes back partial
+REQUESTS_SLICED_QUERY: bool = env_flag("REQUESTS_SLICED_QUERY")
+REQUESTS_QUERY_SLICES: int = int(os.environ.get("REQUESTS_QUERY_SLICES") or 4)  # Initial slices per day
+REQUESTS_QUERY_CONCURRENCY: int = int(os.environ.get("REQUESTS_QUERY_CONCURRENCY") or 4)  # Slices queried at once
+REQUESTS_QUERY_MIN_SLICE_MINUTES: int = int(os.environ.get("REQUESTS_QUERY_MIN_SLICE_MINUTES") or 5)  # No finer
+
+# Incrementally ingest requests from a persisted watermark instead of re-querying the whole day
+REQUESTS_INCREMENTAL: bool = env_flag("REQUESTS_INCREMENTAL")
+REQUESTS_INGEST_NCRON: str | None = os.environ.get("REQUESTS_INGEST_NCRON") or None  # Optional polling schedule
+REQUESTS_INGEST_LAG_MINUTES: int = int(os.environ.get("REQUESTS_INGEST_LAG_MINUTES") or 10)  # Ingestion delay
+
+# Persisted state (watermarks, caches, indexes): 'share', 'local' or 'memory'
+STATE_STORE: str = os.environ.get("STATE_STORE") or "share"
+STATE_PATH: str = os.environ.get("STATE_PATH") or "log-alerts-state"
+
+# Persistent cache for Application Insights query results
+QUERY_CACHE: bool = env_flag("QUERY_CACHE")
+QUERY_CACHE_TTL_MINUTES: int = int(os.environ.get("QUERY_CACHE_TTL_MINUTES") or 60)  # For windows still open
+QUERY_CACHE_MAX_MB: int = int(os.environ.get("QUERY_CACHE_MAX_MB") or 50)  # Oldest entries evicted past this
+
+# Where error logs are read from and archived to: 'share' (Azure File Share) or 'local' (a directory tree under
+# ERRORS_STORAGE_PATH with the same layout as the share, for replaying archived logs and benchmarks)
+ERRORS_STORAGE_BACKEND: str = os.environ.get("ERRORS_STORAGE_BACKEND") or "share"
+ERRORS_STORAGE_PATH: str = os.environ.get("ERRORS_STORAGE_PATH") or "."
+
+# Process error types concurrently with the async file share client
+ERRORS_ASYNC: bool = env_flag("ERRORS_ASYNC")
+ERRORS_CONCURRENCY: int = int(os.environ.get("ERRORS_CONCURRENCY") or 4)
+
+# Find error logs with one directory listing instead of requesting each expected filename
+ERRORS_DISCOVERY: bool = env_flag("ERRORS_DISCOVERY")
+
+# Report and archive every unarchived log up to yesterday, merged into one email per error type
+ERRORS_CATCHUP: bool = env_flag("ERRORS_CATCHUP")
+
+# Fan error logs out over a Storage queue: ErrorLogAlert enqueues one message per log and ErrorLogWorker reports and
+# archives each one. ERRORS_QUEUE_CONNECTION names the app setting that holds the queue's connection string.
+ERRORS_FANOUT: bool = env_flag("ERRORS_FANOUT")
+ERRORS_QUEUE_NAME: str = os.environ.get("ERRORS_QUEUE_NAME") or "error-log-work"
+ERRORS_QUEUE_CONNECTION: str = os.environ.get("ERRORS_QUEUE_CONNECTION") or "AzureWebJobsStorage"
+ERRORS_QUEUE_CONNECTION_STRING: str | None = os.environ.get(ERRORS_QUEUE_CONNECTION)
+ERRORS_QUEUE_LEASE_MINUTES: int = int(os.environ.get("ERRORS_QUEUE_LEASE_MINUTES") or 10)  # Worker's claim on a log
+
+# Maximum rows kept per error log (0 for no cap); the rest are counted and reported as truncated
+ERRORS_MAX_ROWS: int = int(os.environ.get("ERRORS_MAX_ROWS") or 0)
+
+# Oversized error reports carry a summary of the top messages, with the full log attached as a gzip'd CSV
+ERRORS_SUMMARY_MAX_ROWS: int = int(os.environ.get("ERRORS_SUMMARY_MAX_ROWS") or 0)  # Row threshold (0 for none)
+ERRORS_SUMMARY_MAX_BYTES: int = int(os.environ.get("ERRORS_SUMMARY_MAX_BYTES") or 5 * 1024 * 1024)  # Body threshold
+ERRORS_SUMMARY_TOP: int = int(os.environ.get("ERRORS_SUMMARY_TOP") or 25)  # Messages listed in the summary
+ERRORS_ATTACHMENT_MAX_BYTES: int = int(os.environ.get("ERRORS_ATTACHMENT_MAX_BYTES") or 5 * 1024 * 1024)  # Gzip'd
+
+# Report distinct problems instead of raw rows, grouping messages by signature (IDs, barcodes, UUIDs, times masked)
+ERRORS_GROUP_SIGNATURES: bool = env_flag("ERRORS_GROUP_SIGNATURES")
+
+# Collapse rows (or signatures) already reported on earlier days, using a persisted hash index per error type
+ERRORS_SUPPRESS_SEEN: bool = env_flag("ERRORS_SUPPRESS_SEEN")
+ERRORS_SEEN_DAYS: int = int(os.environ.get("ERRORS_SEEN_DAYS") or 30)  # Forget hashes not reported for this long
+
+# Optional schedule for one daily digest that gathers the error and request reports concurrently and sends one
+# combined email per set of recipients; ErrorLogAlert and RequestLogAlert stand down while it's configured
+DIGEST_NCRON: str | None = os.environ.get("DIGEST_NCRON") or None
+
+# Optional schedule for compacting closed months of archived logs into one bundle per error type and month
+ARCHIVE_NCRON: str | None = os.environ.get("ARCHIVE_NCRON") or None
+
+# Record daily counts per request and error type and show 7- and 30-day trends in the reports
+METRICS_TRENDS: bool = env_flag("METRICS_TRENDS")
+
+# Flag unusual daily request and error volumes against EWMA baselines, optionally alerting a separate address
+ANOMALY_DETECTION: bool = env_flag("ANOMALY_DETECTION")
+ANOMALY_THRESHOLD: float = float(os.environ.get("ANOMALY_THRESHOLD") or 3)  # Deviations from the baseline
+ANOMALY_ALPHA: float = float(os.environ.get("ANOMALY_ALPHA") or 0.2)  # Weight of each new day in the baseline
+ANOMALY_WARMUP_DAYS: int = int(os.environ.get("ANOMALY_WARMUP_DAYS") or 7)  # Days observed before scoring
+ANOMALY_ALERT_TO_EMAIL_STR: str | None = os.environ.get("ANOMALY_ALERT_TO_EMAIL_STR") or None
+
+# Send all of a run's emails concurrently with one client, retrying throttled and transient failures
+EMAIL_BATCH: bool = env_flag("EMAIL_BATCH")
+EMAIL_CONCURRENCY: int = int(os.environ.get("EMAIL_CONCURRENCY") or 5)
+EMAIL_MAX_ATTEMPTS: int = int(os.environ.get("EMAIL_MAX_ATTEMPTS") or 4)
+EMAIL_RETRY_BASE_SECONDS: float = float(os.environ.get("EMAIL_RETRY_BASE_SECONDS") or 2)
+
+# Per-stage timing and volume metrics: 'none', 'log' (one JSON trace per stage), 'otel' (OpenTelemetry meters, sent to
+# Application Insights as custom metrics) or 'memory' (kept in process, for tests and benchmarks)
+INSTRUMENTATION: str = os.environ.get("INSTRUMENTATION") or "none"
+INSTRUMENTATION_LOG_LEVEL: str = os.environ.get("INSTRUMENTATION_LOG_LEVEL") or "WARNING"  # host.json drops INFO
+APPLICATIONINSIGHTS_CONNECTION_STRING: str | None = os.environ.get("APPLICATIONINSIGHTS_CONNECTION_STRING")  # 'otel'
+
 # Request types to check
 REQUEST_TYPES: list[dict[str, Any]] = [
     {
@@ -80,26 +192,38 @@ REQUEST_TYPES: list[dict[str, Any]] = [
     }
 ]
 
-# Error types to check
+# Column kinds in the handlers' CSV logs: 'timestamp' (ISO 8601), 'int' and 'float' columns are parsed once as
+# rows are read, and 'category' columns (few distinct values) share one string per value. Other columns are text.
+HANDLER_LOG_SCHEMA: dict[str, str] = {
+    'Timestamp': 'timestamp'
+}
+
+# Error types to check. 'schema' gives the log's column kinds. Optional keys: 'message_column' and 'timestamp_column'
+# name the columns used in summaries (the schema's timestamp column, or guessed from the header otherwise), and
+# 'signature_patterns' lists extra (regex, placeholder) masks for grouping.
 ERROR_TYPES: list[dict] = [
     {
         'type': 'RequestHandler',
         'to': RH_ERRORS_TO_EMAIL_STR,
-        'cc': RH_ERRORS_CC_EMAIL_STR
+        'cc': RH_ERRORS_CC_EMAIL_STR,
+        'schema': HANDLER_LOG_SCHEMA
     },
     {
         'type': 'ItemsHandler',
         'to': IH_ERRORS_TO_EMAIL_STR,
-        'cc': IH_ERRORS_CC_EMAIL_STR
+        'cc': IH_ERRORS_CC_EMAIL_STR,
+        'schema': HANDLER_LOG_SCHEMA
     },
     {
         'type': 'LoanReturnedHandler',
         'to': LRH_ERRORS_TO_EMAIL_STR,
-        'cc': LRH_ERRORS_CC_EMAIL_STR
+        'cc': LRH_ERRORS_CC_EMAIL_STR,
+        'schema': HANDLER_LOG_SCHEMA
     },
     {
         'type': 'RequestCanceled',
         'to': RC_ERRORS_TO_EMAIL_STR,
-        'cc': RC_ERRORS_CC_EMAIL_STR
+        'cc': RC_ERRORS_CC_EMAIL_STR,
+        'schema': HANDLER_LOG_SCHEMA
     }
 ]
@@ -0,0 +1,157 @@
+""" Flags unusual daily request and error volumes against incrementally updated baselines """
+import json
+import logging
+import math
+import threading
+from datetime import date
+
+from src.scfapp.log_alerts.config import (
+    ANOMALY_THRESHOLD, ANOMALY_ALPHA, ANOMALY_WARMUP_DAYS, ANOMALY_ALERT_TO_EMAIL_STR
+)
+from src.scfapp.log_alerts.services.email_service import EmailService
+from src.scfapp.log_alerts.services.html_report import HtmlReport
+from src.scfapp.log_alerts.services.state_store import StateStore
+
+# High-priority headers for alert emails
+ALERT_HEADERS: dict[str, str] = {'Importance': 'High', 'X-Priority': '1'}
+
+
+class AnomalyDetector:
+    """
+    Keeps an exponentially weighted mean and variance per series and scores each day's count against them
+
+    The spread used for scoring is at least the Poisson spread (sqrt of the mean, and at least 1), so low, noisy
+    counts don't raise alarms. Series aren't scored until they have ANOMALY_WARMUP_DAYS observations. Each series
+    is O(1) to update, and the whole state is one small JSON file. Re-observing a day returns the stored result
+    without updating the baseline again.
+    """
+    def __init__(
+            self,
+            store: StateStore,
+            name: str,
+            threshold: float = ANOMALY_THRESHOLD,
+            alpha: float = ANOMALY_ALPHA,
+            warmup: int = ANOMALY_WARMUP_DAYS
+    ):
+        self.store: StateStore = store
+        self.name: str = name
+        self.threshold: float = threshold
+        self.alpha: float = alpha
+        self.warmup: int = warmup
+        self.lock: threading.Lock = threading.Lock()  # Error types may be observed concurrently
+        self.state: dict[str, dict] | None = None  # Loaded on first use
+
+    def load(self) -> dict[str, dict]:
+        """
+        Read the baselines (caller holds the lock)
+
+        Returns:
+            dict[str, dict]: {series: {'mean', 'var', 'n', 'day', 'last'}}
+        """
+        if self.state is None:
+            try:
+                data: bytes | None = self.store.read(self.name)
+                self.state = json.loads(data) if data else {}
+            except Exception as e:  # Start new baselines rather than fail the report
+                logging.warning(f"Ignoring unreadable anomaly state {self.name}: {e}")
+                self.state = {}
+        return self.state
+
+    def observed(self, series: str, day: date) -> bool:
+        """
+        Check whether a day (or a later one) has already been folded into a series' baseline
+
+        Args:
+            series (str): Series name
+            day (date): Day
+
+        Returns:
+            bool: True if observing the day again wouldn't change the baseline
+        """
+        with self.lock:
+            return self.load().get(series, {}).get('day', 0) >= day.toordinal()
+
+    def observe(self, series: str, day: date, count: int) -> dict | None:
+        """
+        Score a day's count, then fold it into the series' baseline
+
+        Args:
+            series (str): Series name, e.g. 'Physical Item requests'
+            day (date): Day being reported
+            count (int): Count
+
+        Returns:
+            dict | None: {'series', 'count', 'expected', 'score'} if the count is an outlier, otherwise None
+        """
+        with self.lock:
+            state: dict[str, dict] = self.load()
+            baseline: dict = state.setdefault(series, {'mean': 0.0, 'var': 0.0, 'n': 0, 'day': 0, 'last': None})
+
+            if baseline['day'] >= day.toordinal():  # Already observed
+                return baseline['last'] if baseline['day'] == day.toordinal() else None
+
+            result: dict | None = None
+            if baseline['n'] >= self.warmup:
+                spread: float = math.sqrt(max(baseline['var'], baseline['mean'], 1.0))
+                score: float = (count - baseline['mean']) / spread
+                if abs(score) >= self.threshold:
+                    result = {'series': series, 'count': count, 'expected': baseline['mean'], 'score': score}
+
+            if baseline['n'] == 0:
+                baseline['mean'] = float(count)
+            else:
+                diff: float = count - baseline['mean']
+                increment: float = self.alpha * diff
+                baseline['mean'] += increment
+                baseline['var'] = (1 - self.alpha) * (baseline['var'] + diff * increment)
+            baseline['n'] += 1
+            baseline['day'] = day.toordinal()
+            baseline['last'] = result
+
+            try:
+                self.store.write(self.name, json.dumps(state).encode())
+            except Exception as e:
+                logging.error(f"Failed to save anomaly state {self.name}: {e}")
+
+        if result is not None:
+            logging.warning(f"Anomaly: {describe_anomaly(result)}")
+        return result
+
+
+def describe_anomaly(anomaly: dict) -> str:
+    """
+    Describe an outlier, e.g. 'Physical Item requests: 0 (expected about 12.3)'
+
+    Args:
+        anomaly (dict): AnomalyDetector.observe result
+
+    Returns:
+        str: Description
+    """
+    direction: str = "high" if anomaly['score'] > 0 else "low"
+    return f"{anomaly['series']}: {anomaly['count']} (unusually {direction}; expected about {anomaly['expected']:.1f})"
+
+
+def send_anomaly_alert(anomalies: list[dict], report_date: str) -> None:
+    """
+    Send a separate high-priority email listing outliers, if ANOMALY_ALERT_TO_EMAIL_STR is set
+
+    Args:
+        anomalies (list[dict]): AnomalyDetector.observe results
+        report_date (str): Day reported (YYYY-MM-DD)
+    """
+    if not anomalies or not ANOMALY_ALERT_TO_EMAIL_STR:
+        return
+
+    report: HtmlReport = HtmlReport()
+    report.paragraph(f"Unusual Remote Storage App volumes on {report_date}:")
+    for anomaly in anomalies:
+        report.paragraph(describe_anomaly(anomaly))
+
+    email_service: EmailService = EmailService()
+    email_service.send_email_with_acs(
+        subject=f"ALERT: Remote Stg App unusual volumes - {report_date}",
+        html_body=report.render(),
+        to_recipients=email_service.create_email_recipients(ANOMALY_ALERT_TO_EMAIL_STR),
+        headers=ALERT_HEADERS
+    )
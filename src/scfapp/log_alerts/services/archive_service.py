@@ -0,0 +1,271 @@
+""" Service for compacting archived error logs into monthly bundles """
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import logging
+import re
+import uuid
+import zlib
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from src.scfapp.log_alerts.config import REPORT_PATH
+from src.scfapp.log_alerts.services.csv_stream import CsvRowStream
+from src.scfapp.log_alerts.services.errors_service import LOG_FILENAME_PATTERN
+from src.scfapp.log_alerts.services.log_storage import LogNotFoundError, LogStorage, create_log_storage
+
+
+# noinspection PyMethodMayBeStatic
+class ArchiveService:
+    """
+    Rolls the daily logs in REPORT_PATH/OLD for closed months into one bundle per error type and month
+
+    A bundle ({type}_{YYYYMM}.csv.gz in OLD/ARCHIVE) holds one gzip member per day, named after its daily log, so
+    the whole bundle still decompresses as a (multi-header) CSV, and a manifest ({type}_{YYYYMM}.json) records each
+    day's offset, length and row count so a single day can be read back with one range download. Days are appended
+    one at a time and only deleted from OLD once the manifest includes them, so an interrupted run resumes where it
+    stopped; the manifest is replaced atomically, and an unreadable one is rebuilt from the bundle's member names. A
+    day that fails is left in OLD for the next run without holding up the rest of its month.
+    """
+    def __init__(self, storage: LogStorage | None = None):
+        self.storage: LogStorage = storage or create_log_storage()  # File share or local directory tree
+        self.old_path: str = f"{REPORT_PATH}/OLD"
+        self.archive_path: str = f"{REPORT_PATH}/OLD/ARCHIVE"
+
+    def compact_closed_months(self) -> None:
+        """ Bundle every archived log from a month before the current one """
+        current_month: str = datetime.now(ZoneInfo('America/New_York')).strftime('%Y%m')  # Still being archived
+
+        try:
+            names: list[str] = [item['name'] for item in self.storage.list(self.old_path) if not item['is_directory']]
+        except Exception as e:  # Handle errors
+            logging.error(f"Failed to list archived logs in {self.old_path}: {e}", exc_info=True)
+            return
+
+        months: dict[tuple[str, str], dict[str, str]] = {}  # (type, YYYYMM) -> {YYYYMMDD: filename}
+        for name in names:
+            match: re.Match | None = LOG_FILENAME_PATTERN.match(name)
+            if match and match['date'][:6] < current_month:
+                months.setdefault((match['type'], match['date'][:6]), {})[match['date']] = name
+
+        if not months:
+            logging.info("No closed months to compact")
+            return
+
+        self.storage.make_directory(self.archive_path)
+        for (err_type, month), days in sorted(months.items()):
+            try:
+                self.compact_month(err_type, month, days)
+            except Exception as e:  # Keep failures isolated to this bundle; the next run resumes it
+                logging.error(f"Failed to compact {err_type} logs for {month}: {e}", exc_info=True)
+
+    def compact_month(self, err_type: str, month: str, days: dict[str, str]) -> None:
+        """
+        Append a month's daily logs to its bundle, then delete them from OLD
+
+        Args:
+            err_type (str): Error type name
+            month (str): Month (YYYYMM)
+            days (dict[str, str]): Log filenames in OLD by date (YYYYMMDD)
+        """
+        manifest: dict = self.load_manifest(err_type, month) or {
+            'type': err_type, 'month': month, 'size': 0, 'days': {}
+        }
+        bundle_path: str = f"{self.archive_path}/{self.bundle_name(err_type, month)}"
+
+        for date, filename in sorted(days.items()):
+            try:
+                if date not in manifest['days']:
+                    member, rows = self.compress_log(f"{self.old_path}/{filename}")
+                    self.storage.write_at(bundle_path, manifest['size'], member)  # Overwrites any interrupted append
+                    manifest['days'][date] = {'offset': manifest['size'], 'length': len(member), 'rows': rows}
+                    manifest['size'] += len(member)
+                    self.save_manifest(err_type, month, manifest)  # Day is now committed to the bundle
+
+                self.storage.delete(f"{self.old_path}/{filename}")
+            except Exception as e:  # Keep failures isolated to this day; the next run retries it
+                logging.error(f"Failed to compact {filename}: {e}", exc_info=True)
+                continue
+            logging.info(f"Compacted {filename} into {self.bundle_name(err_type, month)}")
+
+    def compress_log(self, filepath: str) -> tuple[bytes, int]:
+        """
+        Compress a log as a standalone gzip member named after the log, counting its rows as it streams
+
+        Args:
+            filepath (str): Log path
+
+        Returns:
+            tuple[bytes, int]: gzip member and row count
+        """
+        member: io.BytesIO = io.BytesIO()
+        rows: CsvRowStream = CsvRowStream()  # Counts records, including ones with quoted newlines
+        count: int = 0
+
+        with gzip.GzipFile(filename=filepath.rsplit('/', 1)[-1], mode='wb', fileobj=member, mtime=0) as compressor:
+            for chunk in self.storage.open_stream(filepath):
+                compressor.write(chunk)
+                count += len(rows.feed(chunk))
+        count += len(rows.close())
+
+        return member.getvalue(), count
+
+    def read_day(self, err_type: str, date: str) -> bytes | None:
+        """
+        Read one day's log back from its bundle without downloading the rest of the month
+
+        Args:
+            err_type (str): Error type name
+            date (str): Date (YYYYMMDD)
+
+        Returns:
+            bytes | None: CSV contents, or None if the day isn't in a bundle
+        """
+        manifest: dict | None = self.load_manifest(err_type, date[:6])
+        day: dict | None = manifest['days'].get(date) if manifest else None
+        if day is None:
+            return None
+
+        member: bytes = self.storage.read_range(
+            f"{self.archive_path}/{self.bundle_name(err_type, date[:6])}", day['offset'], day['length']
+        )
+        return gzip.decompress(member)
+
+    def load_manifest(self, err_type: str, month: str) -> dict | None:
+        """
+        Read a bundle's manifest
+
+        Args:
+            err_type (str): Error type name
+            month (str): Month (YYYYMM)
+
+        Returns:
+            dict | None: Manifest (rebuilt from the bundle if it was unreadable), or None if the bundle hasn't been
+                started
+        """
+        try:
+            data: bytes = b''.join(
+                self.storage.open_stream(f"{self.archive_path}/{self.manifest_name(err_type, month)}")
+            )
+            manifest: dict = json.loads(data)
+            if not isinstance(manifest.get('size'), int) or not isinstance(manifest.get('days'), dict):
+                raise ValueError("missing size or days")
+            return manifest
+        except LogNotFoundError:
+            return None
+        except (ValueError, AttributeError) as e:  # Unreadable, e.g. a partial write before writes were atomic
+            logging.warning(f"Rebuilding unreadable manifest {self.manifest_name(err_type, month)}: {e}")
+            return self.rebuild_manifest(err_type, month)
+
+    def rebuild_manifest(self, err_type: str, month: str) -> dict | None:
+        """
+        Recreate a manifest by scanning its bundle's gzip members, which are named after their daily logs
+
+        Scanning stops at a member that doesn't decompress (an interrupted append), so the next day appended
+        overwrites it. Members without a log name are kept in the bundle but can't be indexed.
+
+        Args:
+            err_type (str): Error type name
+            month (str): Month (YYYYMM)
+
+        Returns:
+            dict | None: Rebuilt (and saved) manifest, or None if the bundle doesn't exist
+        """
+        try:
+            data: bytes = b''.join(
+                self.storage.open_stream(f"{self.archive_path}/{self.bundle_name(err_type, month)}")
+            )
+        except LogNotFoundError:
+            return None
+
+        manifest: dict = {'type': err_type, 'month': month, 'size': 0, 'days': {}}
+        view: memoryview = memoryview(data)
+        while manifest['size'] < len(data):
+            offset: int = manifest['size']
+            decompressor = zlib.decompressobj(wbits=31)  # One gzip member
+            rows: CsvRowStream = CsvRowStream()
+            try:
+                count: int = len(rows.feed(decompressor.decompress(view[offset:])))
+            except zlib.error:
+                break
+            if not decompressor.eof:  # Truncated member
+                break
+            count += len(rows.close())
+
+            length: int = len(data) - offset - len(decompressor.unused_data)
+            match: re.Match | None = LOG_FILENAME_PATTERN.match(_member_name(data, offset) or '')
+            if match:
+                manifest['days'][match['date']] = {'offset': offset, 'length': length, 'rows': count}
+            else:
+                logging.warning(f"Can't index unnamed member at {offset} in {self.bundle_name(err_type, month)}")
+            manifest['size'] += length
+
+        self.save_manifest(err_type, month, manifest)
+        return manifest
+
+    def save_manifest(self, err_type: str, month: str, manifest: dict) -> None:
+        """
+        Replace a bundle's manifest atomically, writing it beside the target and renaming it over the old one
+
+        Args:
+            err_type (str): Error type name
+            month (str): Month (YYYYMM)
+            manifest (dict): Manifest
+        """
+        name: str = self.manifest_name(err_type, month)
+        tmp_path: str = f"{self.archive_path}/.{name}.{uuid.uuid4().hex}"  # Temp file beside the target
+        self.storage.write(tmp_path, json.dumps(manifest, sort_keys=True).encode())
+        try:
+            self.storage.move(tmp_path, f"{self.archive_path}/{name}")
+        except BaseException:
+            self.storage.delete(tmp_path)
+            raise
+
+    def bundle_name(self, err_type: str, month: str) -> str:
+        """
+        Bundle filename
+
+        Args:
+            err_type (str): Error type name
+            month (str): Month (YYYYMM)
+
+        Returns:
+            str: Filename
+        """
+        return f"{err_type}_{month}.csv.gz"
+
+    def manifest_name(self, err_type: str, month: str) -> str:
+        """
+        Manifest filename
+
+        Args:
+            err_type (str): Error type name
+            month (str): Month (YYYYMM)
+
+        Returns:
+            str: Filename
+        """
+        return f"{err_type}_{month}.json"
+
+
+def _member_name(data: bytes, offset: int) -> str | None:
+    """
+    Read the original file name from a gzip member's header
+
+    Args:
+        data (bytes): Bundle contents
+        offset (int): Start of the member
+
+    Returns:
+        str | None: File name, or None if the header doesn't carry one
+    """
+    flags: int = data[offset + 3]
+    position: int = offset + 10  # Past the fixed header
+    if flags & 0x04:  # FEXTRA
+        position += 2 + int.from_bytes(data[position:position + 2], 'little')
+    if not flags & 0x08:  # No FNAME
+        return None
+    end: int = data.index(b'\0', position)
+    return data[position:end].decode('latin-1')
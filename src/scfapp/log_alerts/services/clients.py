@@ -0,0 +1,193 @@
+"""
+Process-wide registry of Azure SDK clients
+
+Clients are created on first use and reused for the life of the worker process, so warm invocations skip credential
+probing, connection-string parsing and TLS handshakes. Tests can register fakes under the same names, and
+close_clients() tears everything down.
+"""
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+from typing import Any, Callable, TYPE_CHECKING
+
+from src.scfapp.log_alerts.config import (
+    STORAGE_CONNECTION_STRING, SHARE_NAME, ACS_CONNECTION_STRING, ERRORS_QUEUE_CONNECTION_STRING, ERRORS_QUEUE_NAME
+)
+
+if TYPE_CHECKING:  # SDKs are imported when a client is first created
+    from azure.communication.email import EmailClient
+    from azure.identity import DefaultAzureCredential
+    from azure.monitor.query import LogsQueryClient
+    from azure.storage.fileshare import ShareClient, ShareDirectoryClient, ShareFileClient
+    from azure.storage.queue import QueueClient
+
+# Registry names
+CREDENTIAL: str = 'credential'
+LOGS_QUERY_CLIENT: str = 'logs_query_client'
+SHARE_CLIENT: str = 'share_client'
+EMAIL_CLIENT: str = 'email_client'
+QUEUE_CLIENT: str = 'queue_client'
+
+_clients: dict[str, Any] = {}  # Live clients by name
+_lock: threading.Lock = threading.Lock()  # Guards creation
+
+
+def get_client(name: str, factory: Callable[[], Any]) -> Any:
+    """
+    Get a registered client, creating it with the factory on first use
+
+    Args:
+        name (str): Registry name
+        factory (Callable[[], Any]): Creates the client
+
+    Returns:
+        Any: Client
+    """
+    client: Any = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:  # Still missing once we hold the lock
+                client = factory()
+                _clients[name] = client
+                logging.info(f"Created {name}")
+    return client
+
+
+def register_client(name: str, client: Any) -> None:
+    """
+    Register a client (e.g. a fake in tests), replacing any existing one
+
+    Args:
+        name (str): Registry name
+        client (Any): Client
+    """
+    with _lock:
+        _clients[name] = client
+
+
+def close_clients() -> None:
+    """ Close and forget every registered client """
+    with _lock:
+        clients: list[tuple[str, Any]] = list(_clients.items())
+        _clients.clear()
+
+    for name, client in clients:
+        close: Callable[[], None] | None = getattr(client, 'close', None)
+        if close is None:
+            continue
+        try:
+            close()
+        except Exception as e:  # Teardown is best-effort
+            logging.warning(f"Failed to close {name}: {e}")
+
+
+atexit.register(close_clients)  # Release connections when the worker shuts down
+
+
+def get_credential() -> DefaultAzureCredential:
+    """
+    Shared Azure credential; its token cache is reused across invocations
+
+    Returns:
+        DefaultAzureCredential: Credential
+    """
+    def create() -> DefaultAzureCredential:
+        from azure.identity import DefaultAzureCredential
+
+        return DefaultAzureCredential()
+
+    return get_client(CREDENTIAL, create)
+
+
+def get_logs_query_client() -> LogsQueryClient:
+    """
+    Shared Application Insights query client
+
+    Returns:
+        LogsQueryClient: Query client
+    """
+    def create() -> LogsQueryClient:
+        from azure.monitor.query import LogsQueryClient
+
+        # noinspection PyTypeChecker
+        return LogsQueryClient(get_credential())
+
+    return get_client(LOGS_QUERY_CLIENT, create)
+
+
+def get_share_client() -> ShareClient:
+    """
+    Shared file share client; file and directory clients derived from it share its connection pool
+
+    Returns:
+        ShareClient: Share client
+    """
+    def create() -> ShareClient:
+        from azure.storage.fileshare import ShareClient
+
+        return ShareClient.from_connection_string(conn_str=STORAGE_CONNECTION_STRING, share_name=SHARE_NAME)
+
+    return get_client(SHARE_CLIENT, create)
+
+
+def get_share_file_client(file_path: str) -> ShareFileClient:
+    """
+    Client for a file on the share, using the shared connection pool
+
+    Args:
+        file_path (str): Path within the share
+
+    Returns:
+        ShareFileClient: File client
+    """
+    return get_share_client().get_file_client(file_path)
+
+
+def get_share_directory_client(directory_path: str) -> ShareDirectoryClient:
+    """
+    Client for a directory on the share, using the shared connection pool
+
+    Args:
+        directory_path (str): Path within the share
+
+    Returns:
+        ShareDirectoryClient: Directory client
+    """
+    return get_share_client().get_directory_client(directory_path)
+
+
+def get_email_client() -> EmailClient:
+    """
+    Shared Azure Communication Services email client
+
+    Returns:
+        EmailClient: Email client
+    """
+    def create() -> EmailClient:
+        from azure.communication.email import EmailClient
+
+        return EmailClient.from_connection_string(ACS_CONNECTION_STRING)
+
+    return get_client(EMAIL_CLIENT, create)
+
+
+def get_queue_client() -> QueueClient:
+    """
+    Shared client for the error log work queue; messages are base64-encoded, as the Functions queue trigger expects
+
+    Returns:
+        QueueClient: Queue client
+    """
+    def create() -> QueueClient:
+        from azure.storage.queue import QueueClient, TextBase64EncodePolicy
+
+        return QueueClient.from_connection_string(
+            conn_str=ERRORS_QUEUE_CONNECTION_STRING,
+            queue_name=ERRORS_QUEUE_NAME,
+            message_encode_policy=TextBase64EncodePolicy()
+        )
+
+    return get_client(QUEUE_CLIENT, create)
@@ -0,0 +1,193 @@
+""" Incremental CSV parsing over streamed byte chunks """
+import codecs
+import csv
+from collections import deque
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+
+class _LineQueue:
+    """
+    Iterator over decoded lines that can be refilled after it runs dry
+
+    The lines handed out since the reader last finished a record are kept, so a record the reader couldn't finish
+    (its quoted field continues in the next chunk) can be put back and parsed again once more lines arrive.
+    """
+    def __init__(self):
+        self.lines: deque[str] = deque()  # Lines waiting to be read
+        self.size: int = 0  # Characters waiting to be read
+        self.record: list[str] = []  # Lines read for the record in progress
+        self.ran_dry: bool = False  # The reader asked for a line after the last one
+
+    def __iter__(self) -> '_LineQueue':
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            self.ran_dry = True
+            raise StopIteration
+        line: str = self.lines.popleft()
+        self.size -= len(line)
+        self.record.append(line)
+        return line
+
+    def extend(self, lines: Iterable[str]) -> None:
+        """ Queue lines to be read """
+        for line in lines:
+            self.lines.append(line)
+            self.size += len(line)
+
+    def rewind(self) -> int:
+        """
+        Put the lines of the record in progress back, to be read again
+
+        Returns:
+            int: Characters put back
+        """
+        self.lines.extendleft(reversed(self.record))
+        rewound: int = sum(len(line) for line in self.record)
+        self.size += rewound
+        self.record = []
+        return rewound
+
+
+class CsvRowStream:
+    """
+    Turns UTF-8 byte chunks into CSV row dictionaries without holding the whole file in memory
+
+    Chunks are decoded incrementally, so multibyte characters split across chunk boundaries are handled. Lines go to a
+    single csv.reader, which keeps quoted fields that contain newlines intact. A record whose quoted field runs past
+    the end of a chunk is parsed again from its start, but only once the text queued for it has doubled, so a field
+    spread over many chunks (a long stack trace) is parsed a few times rather than once per chunk and the total work
+    stays linear. Rows are the same as csv.DictReader's.
+    """
+    def __init__(self):
+        self.decoder: codecs.IncrementalDecoder = codecs.getincrementaldecoder('utf-8')()  # UTF-8 decoder
+        self.partial_line: list[str] = []  # Pieces of the text after the last newline seen
+        self.queue: _LineQueue = _LineQueue()  # Lines waiting to be parsed
+        self.reader = csv.reader(self.queue)  # Row reader
+        self.fieldnames: list[str] | None = None  # Header row
+        self.retry_size: int = 0  # Queued characters needed before an unfinished record is parsed again
+
+    def feed(self, chunk: bytes) -> list[dict]:
+        """
+        Add a chunk of bytes and return any rows it completes
+
+        Args:
+            chunk (bytes): Next chunk of the file
+
+        Returns:
+            list[dict]: Completed rows
+        """
+        text: str = self.decoder.decode(chunk)  # Decode chunk
+        if '\n' not in text:  # Line continues in the next chunk; joined once it ends
+            self.partial_line.append(text)
+            return []
+
+        lines: list[str] = text.split('\n')  # Split into lines
+        lines[0] = ''.join(self.partial_line) + lines[0]
+        self.partial_line = [lines.pop()]  # Keep the unterminated line for the next chunk
+
+        self.queue.extend(line + '\n' for line in lines)
+        if self.queue.size < self.retry_size:  # Unfinished record hasn't doubled yet
+            return []
+        return self.drain(final=False)
+
+    def close(self) -> list[dict]:
+        """
+        Flush the decoder and return any remaining rows
+
+        Returns:
+            list[dict]: Completed rows, including one with an unterminated quoted field at the end of the file
+        """
+        text: str = ''.join(self.partial_line) + self.decoder.decode(b'', final=True)  # Flush decoder
+        self.partial_line = []
+
+        if text:
+            self.queue.extend([text])
+        return self.drain(final=True)
+
+    def drain(self, final: bool) -> list[dict]:
+        """
+        Parse the queued lines
+
+        Args:
+            final (bool): No more lines will arrive, so a record cut short by the end of the lines is kept as it is
+
+        Returns:
+            list[dict]: Parsed rows
+        """
+        rows: list[dict] = []
+        queue: _LineQueue = self.queue
+        while queue.lines:
+            queue.ran_dry = False
+            try:
+                fields: list[str] = next(self.reader)
+            except StopIteration:  # Only blank lines were queued
+                queue.record = []
+                break
+            if queue.ran_dry and not final:  # Record continues in the next chunk
+                self.retry_size = 2 * queue.rewind()
+                break
+            queue.record = []
+            self.retry_size = 0
+
+            if not fields:  # Blank line
+                continue
+            if self.fieldnames is None:
+                self.fieldnames = fields
+                continue
+            rows.append(self.row(fields))
+        return rows
+
+    def row(self, fields: list[str]) -> dict:
+        """
+        Map a record's fields to the header, the way csv.DictReader does
+
+        Args:
+            fields (list[str]): Record fields
+
+        Returns:
+            dict: Row (extra fields are a list under the key None, and missing fields are None)
+        """
+        fieldnames: list[str] = self.fieldnames
+        row: dict = dict(zip(fieldnames, fields))
+        if len(fields) > len(fieldnames):
+            row[None] = fields[len(fieldnames):]
+        elif len(fields) < len(fieldnames):
+            for key in fieldnames[len(fields):]:
+                row[key] = None
+        return row
+
+
+def iter_csv_rows(chunks: Iterable[bytes]) -> Iterator[dict]:
+    """
+    Yield CSV row dictionaries from an iterable of byte chunks
+
+    Args:
+        chunks (Iterable[bytes]): File contents, e.g. StorageStreamDownloader.chunks()
+
+    Yields:
+        dict: CSV row
+    """
+    stream: CsvRowStream = CsvRowStream()
+    for chunk in chunks:
+        yield from stream.feed(chunk)
+    yield from stream.close()
+
+
+async def aiter_csv_rows(chunks: AsyncIterable[bytes]) -> AsyncIterator[dict]:
+    """
+    Yield CSV row dictionaries from an async iterable of byte chunks
+
+    Args:
+        chunks (AsyncIterable[bytes]): File contents, e.g. the async StorageStreamDownloader.chunks()
+
+    Yields:
+        dict: CSV row
+    """
+    stream: CsvRowStream = CsvRowStream()
+    async for chunk in chunks:
+        for row in stream.feed(chunk):
+            yield row
+    for row in stream.close():
+        yield row
@@ -0,0 +1,260 @@
+"""
+Daily digest of the error and request reports
+
+The day's error logs and request data are gathered concurrently, each report is rendered once as a section, and
+every recipient gets a single email with all of the sections addressed to them: recipients of the same sections share
+one email, so an address listed for several error types (and the requests report) no longer gets several emails.
+"""
+from __future__ import annotations
+
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from html import escape
+
+from src.scfapp.log_alerts.config import (
+    ERROR_TYPES, ERRORS_ATTACHMENT_MAX_BYTES, ERRORS_CONCURRENCY, ERRORS_DISCOVERY, ERRORS_GROUP_SIGNATURES,
+    REQUESTS_CC_EMAIL_BASE_STR, REQUESTS_TO_EMAIL_STR
+)
+from src.scfapp.log_alerts.services.email_service import EmailService
+from src.scfapp.log_alerts.services.error_rows import ErrorRows
+from src.scfapp.log_alerts.services.errors_service import ErrorsService
+from src.scfapp.log_alerts.services.html_report import HtmlReport
+from src.scfapp.log_alerts.services.instrumentation import span
+from src.scfapp.log_alerts.services.requests_service import RequestsService
+
+
+# noinspection PyMethodMayBeStatic
+class DigestService:
+    """ Service for building and sending the daily digest """
+    def __init__(self):
+        self.errors_service: ErrorsService = ErrorsService()
+        self.requests_service: RequestsService = RequestsService()
+        self.email_service: EmailService = EmailService()  # One client for the whole batch
+
+    def run(self) -> list[dict]:
+        """
+        Gather, render and send the digest, then archive the error logs whose sections were delivered
+
+        Returns:
+            list[dict]: Delivery result for each email sent
+        """
+        yesterday_filestring: str = self.errors_service.set_filestring()  # Yesterday's date string
+        all_errors, scfapp_requests = self.gather(yesterday_filestring)
+
+        sections: list[dict] = self.error_sections(all_errors) + self.request_sections(scfapp_requests)
+        self.errors_service.record_daily_volumes(ERROR_TYPES, yesterday_filestring)  # Zeros for the quiet types
+        if not sections:
+            logging.info("Nothing to report in the digest.")
+            return []
+
+        groups: list[dict] = self.recipient_groups(sections)
+        report_date: str = self.errors_service.format_filestring(yesterday_filestring)
+        results: list[dict] = self.email_service.send_batch([
+            self.digest_email(group, sections, report_date) for group in groups
+        ])
+
+        for i, section in enumerate(sections):
+            delivered: bool = any(i in group['sections'] for group in groups) and all(
+                result['status'] == 'Succeeded' for group, result in zip(groups, results) if i in group['sections']
+            )
+            if 'err_type' not in section:
+                continue
+            self.errors_service.finish_seen_index(section['err_type'], delivered)
+            if delivered:
+                self.errors_service.archive_error_log(section['err_type'], yesterday_filestring)
+            else:
+                logging.error(f"{section['title']} were not delivered; leaving the log for the next run")
+
+        return results
+
+    def gather(self, yesterday_filestring: str) -> tuple[dict[str, ErrorRows], list[dict] | None]:
+        """
+        Read every error log and query the request data concurrently
+
+        Args:
+            yesterday_filestring (str): Yesterday filestring
+
+        Returns:
+            tuple[dict[str, ErrorRows], list[dict] | None]: Non-empty error rows by error type, and the request data
+                (None if there was none or the query failed)
+        """
+        error_types: list[dict] = ERROR_TYPES  # Error types to fetch
+        if ERRORS_DISCOVERY:  # Only fetch logs that exist and aren't empty
+            error_types = self.errors_service.available_error_types(ERROR_TYPES, yesterday_filestring)
+
+        with span('digest.gather', types=len(error_types)), \
+                ThreadPoolExecutor(max_workers=max(ERRORS_CONCURRENCY, 1) + 1) as executor:
+            requests_future: Future = executor.submit(self.requests_service.get_requests)
+            error_futures: dict[str, Future] = {
+                err_type['type']: executor.submit(self.errors_service.get_errors, err_type, yesterday_filestring)
+                for err_type in error_types
+            }
+
+            all_errors: dict[str, ErrorRows] = {}
+            for err_type, future in error_futures.items():
+                try:
+                    rows: ErrorRows | None = future.result()
+                except Exception as e:  # Keep failures isolated to this error type
+                    logging.error(f"Failed to read {err_type} errors: {e}", exc_info=True)
+                    continue
+                if rows:
+                    all_errors[err_type] = rows
+
+            try:
+                scfapp_requests: list[dict] | None = requests_future.result()
+            except Exception as e:  # The error sections are still worth sending
+                logging.error(f"Failed to query requests for the digest: {e}", exc_info=True)
+                scfapp_requests = None
+
+        return all_errors, scfapp_requests
+
+    def error_sections(self, all_errors: dict[str, ErrorRows]) -> list[dict]:
+        """
+        Render each error type's report as a section
+
+        The logs' attachments share one ERRORS_ATTACHMENT_MAX_BYTES budget, so any digest email stays within it.
+
+        Args:
+            all_errors (dict[str, ErrorRows]): Error rows by error type
+
+        Returns:
+            list[dict]: Sections ({'title', 'to', 'cc', 'html', 'attachments', 'err_type'})
+        """
+        sections: list[dict] = []
+        attachment_budget: int = ERRORS_ATTACHMENT_MAX_BYTES
+
+        for err_type in ERROR_TYPES:
+            rows: ErrorRows | None = all_errors.get(err_type['type'])
+            if not rows:
+                continue
+
+            summarize: bool = ERRORS_GROUP_SIGNATURES or self.errors_service.exceeds_summary_rows(rows)
+            html, attachment = self.error_section(err_type, rows, summarize, attachment_budget)
+            if not summarize and self.errors_service.exceeds_summary_bytes(html):  # Summarize it instead
+                html, attachment = self.error_section(err_type, rows, True, attachment_budget)
+            if attachment is not None:
+                attachment_budget -= len(attachment['contentInBase64']) * 3 // 4  # Compressed size
+
+            sections.append({
+                'title': f"{err_type['type']} errors",
+                'to': err_type['to'],
+                'cc': err_type['cc'],
+                'html': html,
+                'attachments': [attachment] if attachment is not None else [],
+                'err_type': err_type
+            })
+
+        return sections
+
+    def error_section(
+            self, err_type: dict[str, str], rows: ErrorRows, summarize: bool, attachment_budget: int
+    ) -> tuple[str, dict | None]:
+        """
+        Render one error type's section
+
+        Args:
+            err_type (str): Error type
+            rows (ErrorRows): Parsed rows
+            summarize (bool): Write a summary instead of the rows
+            attachment_budget (int): Largest compressed log to attach
+
+        Returns:
+            tuple[str, dict | None]: HTML fragment, and the full log's attachment if it was attached
+        """
+        with span('errors.render', type=err_type['type'], digest=True) as stage:
+            report: HtmlReport = HtmlReport()
+            report.raw(f"            <h3>{escape(err_type['type'])} errors</h3>\n")
+            attachment: dict | None = self.errors_service.write_section(
+                report, err_type, rows, summarize, attachment_budget
+            )
+            html: str = report.fragment()
+            stage.add(rows=len(rows), nbytes=len(html))
+
+        return html, attachment
+
+    def request_sections(self, scfapp_requests: list[dict] | None) -> list[dict]:
+        """
+        Render the requests report as a section
+
+        Args:
+            scfapp_requests (list[dict] | None): Request data
+
+        Returns:
+            list[dict]: The section, or nothing if there's no request data
+        """
+        if not scfapp_requests:
+            return []
+
+        _, text = self.requests_service.build_report(scfapp_requests)
+        if not text:
+            return []
+
+        return [{
+            'title': "Requests",
+            'to': REQUESTS_TO_EMAIL_STR,
+            'cc': REQUESTS_CC_EMAIL_BASE_STR,
+            'html': f"            <h3>Requests</h3>\n<pre>{escape(text)}</pre>\n",
+            'attachments': []
+        }]
+
+    def recipient_groups(self, sections: list[dict]) -> list[dict]:
+        """
+        Group recipients by the sections they get, so each address receives exactly one email
+
+        Addresses are compared case-insensitively. An address that is a TO recipient of any of its sections is a TO
+        recipient of its email; if a group only has CC recipients, they are sent the email as TO recipients.
+
+        Args:
+            sections (list[dict]): Sections
+
+        Returns:
+            list[dict]: Groups ({'to', 'cc', 'sections'}, with the section indexes in report order)
+        """
+        recipients: dict[str, dict] = {}  # By lower-case address
+        for i, section in enumerate(sections):
+            for field in ('to', 'cc'):
+                for recipient in self.email_service.create_email_recipients(section[field]):
+                    entry: dict = recipients.setdefault(
+                        recipient['address'].lower(), {'address': recipient['address'], 'to': False, 'sections': set()}
+                    )
+                    entry['to'] = entry['to'] or field == 'to'
+                    entry['sections'].add(i)
+
+        groups: dict[tuple[int, ...], dict] = {}  # By section indexes
+        for entry in recipients.values():
+            group: dict = groups.setdefault(tuple(sorted(entry['sections'])), {'to': [], 'cc': []})
+            group['to' if entry['to'] else 'cc'].append({'address': entry['address']})
+
+        return [
+            {'to': group['to'] or group['cc'], 'cc': group['cc'] if group['to'] else [], 'sections': indexes}
+            for indexes, group in groups.items()
+        ]
+
+    def digest_email(self, group: dict, sections: list[dict], report_date: str) -> dict:
+        """
+        Build the send_email_with_acs arguments for one recipient group
+
+        Args:
+            group (dict): Recipient group
+            sections (list[dict]): Sections
+            report_date (str): Report date (YYYY-MM-DD)
+
+        Returns:
+            dict: Subject, body, recipients and any attachments
+        """
+        report: HtmlReport = HtmlReport()
+        report.paragraph(f"Remote Storage App daily digest for {report_date}")
+        attachments: list[dict] = []
+        for i in group['sections']:
+            report.raw(sections[i]['html'])
+            attachments.extend(sections[i]['attachments'])
+
+        email: dict = {
+            'subject': f"Remote Stg App Daily Digest - {report_date}",
+            'html_body': report.render(),
+            'to_recipients': group['to'],
+            'cc_recipients': group['cc'] or None
+        }
+        if attachments:
+            email['attachments'] = attachments
+        return email
@@ -1,14 +1,32 @@
 """Service for sending emails using Azure Communication Services."""
+import base64
 import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from azure.communication.email import EmailClient
+from src.scfapp.log_alerts.config import (
+    ACS_CONNECTION_STRING, ACS_SENDER_ADDRESS, EMAIL_CONCURRENCY, EMAIL_MAX_ATTEMPTS, EMAIL_RETRY_BASE_SECONDS
+)
+from src.scfapp.log_alerts.services.clients import get_email_client
+from src.scfapp.log_alerts.services.instrumentation import instrumented, span
 
-from src.scfapp.log_alerts.config import ACS_CONNECTION_STRING, ACS_SENDER_ADDRESS
+# HTTP statuses worth retrying: throttling and transient service errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
 
 
 # noinspection PyMethodMayBeStatic,PyProtectedMember
 class EmailService:
     """Service for sending emails using Azure Communication Services."""
+    def __init__(self, email_client=None):
+        self.email_client = email_client  # Defaults to the process-wide client
+
+    def get_email_client(self):
+        """Returns the ACS email client, shared across invocations on this worker."""
+        if self.email_client is None:
+            self.email_client = get_email_client()
+        return self.email_client
+
     def create_email_recipients(self, email_str_list):
         """
         Converts a comma-separated string of emails to a list of EmailAddress objects.
@@ -20,65 +38,259 @@ class EmailService:
             return []
         return [{'address': addr.strip()} for addr in email_str_list.split(',') if addr.strip()]
 
-    def send_email_with_acs(self, subject, html_body, to_recipients, cc_recipients=None):
-        """Sends an HTML email using Azure Communication Services."""
+    def build_message(self, subject, html_body, to_recipients, cc_recipients=None, attachments=None, headers=None):
+        """
+        Builds an ACS email message, or returns None (after logging why) if it can't be sent.
+
+        Args:
+            subject: Email subject.
+            html_body: HTML email body.
+            to_recipients: Comma-separated string or list of TO recipients.
+            cc_recipients: Comma-separated string or list of CC recipients.
+            attachments: A list of ACS attachment dicts ('name', 'contentType', 'contentInBase64').
+            headers: Custom email headers, e.g. {'Importance': 'High'}.
+        """
         if not ACS_CONNECTION_STRING:
             logging.error("ACS_CONNECTION_STRING is not set. Cannot send email.")
-            return
+            return None
         if not ACS_SENDER_ADDRESS:
             logging.error("ACS_SENDER_ADDRESS is not set. Cannot send email.")
-            return
+            return None
         if not to_recipients:
             logging.error("No TO_EMAIL recipients specified. Cannot send email.")
-            return
+            return None
 
-        try:
-            email_client = EmailClient.from_connection_string(ACS_CONNECTION_STRING)
-            content = {
-                "subject": subject,
-                "html": html_body
-            }
-
-            if isinstance(to_recipients, str):
-                to_list = self.create_email_recipients(to_recipients)
-            elif isinstance(to_recipients, list):
-                to_list = to_recipients
+        content = {
+            "subject": subject,
+            "html": html_body
+        }
+
+        if isinstance(to_recipients, str):
+            to_list = self.create_email_recipients(to_recipients)
+        elif isinstance(to_recipients, list):
+            to_list = to_recipients
+        else:
+            to_list = [addr.strip() for addr in to_recipients]
+
+        recipients_obj = to_list
+
+        if cc_recipients:
+            if isinstance(cc_recipients, str):
+                cc_list = self.create_email_recipients(cc_recipients)
+            elif isinstance(cc_recipients, list):
+                cc_list = cc_recipients
             else:
-                to_list = [addr.strip() for addr in to_recipients]
+                cc_list = [addr.strip() for addr in cc_recipients]
+        else:
+            cc_list = None
+
+        message = {
+            "content": content,
+            "recipients": {
+                "to": recipients_obj,
+                "cc": cc_list if cc_list else ""
+            },
+            "senderAddress": ACS_SENDER_ADDRESS
+        }
+
+        if attachments:
+            message["attachments"] = attachments
+        if headers:
+            message["headers"] = headers
+
+        return message
+
+    def create_attachment(self, name, content_type, data):
+        """
+        Builds an ACS attachment.
+
+        Args:
+            name: Attachment file name.
+            content_type: MIME type.
+            data: Attachment bytes.
+        """
+        return {
+            "name": name,
+            "contentType": content_type,
+            "contentInBase64": base64.b64encode(data).decode("ascii")
+        }
+
+    def send_email_with_acs(
+            self, subject, html_body, to_recipients, cc_recipients=None, attachments=None, headers=None
+    ):
+        """Sends an HTML email using Azure Communication Services. Returns True if it was sent."""
+        message = self.build_message(subject, html_body, to_recipients, cc_recipients, attachments, headers)
+        if message is None:
+            return False
 
-            recipients_obj = to_list
+        with span('email.send', mode='single') as stage:
+            stage.add(rows=1, nbytes=self.message_size(message))
+            try:
+                email_client = self.get_email_client()
 
-            if cc_recipients:
-                if isinstance(cc_recipients, str):
-                    cc_list = self.create_email_recipients(cc_recipients)
-                elif isinstance(cc_recipients, list):
-                    cc_list = cc_recipients
+                poller = email_client.begin_send(message)
+                result = poller.result()
+
+                if poller.done() and result:
+                    logging.info(f"Email sent successfully via ACS.")
+                    return True
                 else:
-                    cc_list = [addr.strip() for addr in cc_recipients]
-            else:
-                cc_list = None
-
-            message = {
-                "content": content,
-                "recipients": {
-                    "to": recipients_obj,
-                    "cc": cc_list if cc_list else ""
-                },
-                "senderAddress": ACS_SENDER_ADDRESS
-            }
-
-            poller = email_client.begin_send(message)
-            result = poller.result()
-
-            if poller.done() and result:
-                logging.info(f"Email sent successfully via ACS.")
-            else:
-                logging.error(
-                    f"ACS Email send operation finished, but status indicates failure or is unknown. Poller status: "
-                    f"{poller.status()}"
-                )
-                if hasattr(poller, '_operation') and hasattr(poller._operation, 'details'):
-                    logging.error(f"ACS Error details: {poller._operation.details}")
+                    logging.error(
+                        f"ACS Email send operation finished, but status indicates failure or is unknown. Poller "
+                        f"status: {poller.status()}"
+                    )
+                    if hasattr(poller, '_operation') and hasattr(poller._operation, 'details'):
+                        logging.error(f"ACS Error details: {poller._operation.details}")
+
+            except Exception as e:
+                logging.error(f"Failed to send email via ACS: {e}", exc_info=True)
+
+            stage.fail()
+
+        return False
+
+    def message_size(self, message):
+        """
+        Approximate size of a message: the HTML body plus the decoded attachments.
+
+        Args:
+            message: An ACS email message from build_message.
+        """
+        attachments = message.get("attachments") or []
+        return len(message["content"]["html"]) + sum(
+            len(attachment["contentInBase64"]) * 3 // 4 for attachment in attachments
+        )
+
+    @instrumented('email.batch', rows=len, ok=lambda results: all(r['status'] == 'Succeeded' for r in results))
+    def send_batch(self, emails):
+        """
+        Sends several emails concurrently with one shared client, retrying throttled and transient failures.
+
+        Args:
+            emails: A list of dicts with the send_email_with_acs arguments (subject, html_body, to_recipients and
+                    optionally cc_recipients and attachments).
+
+        Returns:
+            A list with one delivery result per email, in the same order: a dict with 'subject', 'status'
+            ('Succeeded', 'Failed' or 'Skipped'), 'message_id', 'attempts' and 'error'.
+        """
+        if not emails:
+            return []
 
+        with ThreadPoolExecutor(max_workers=max(min(EMAIL_CONCURRENCY, len(emails)), 1)) as executor:
+            results = list(executor.map(self.send_with_retry, emails))
+
+        delivered = sum(1 for result in results if result['status'] == 'Succeeded')
+        logging.info(f"Sent {delivered} of {len(results)} emails via ACS.")
+
+        return results
+
+    def send_with_retry(self, email):
+        """
+        Sends one email, retrying retryable submission errors with jittered exponential backoff.
+
+        Args:
+            email: A dict with the send_email_with_acs arguments.
+
+        Returns:
+            A delivery result dict (see send_batch).
+        """
+        result = {'subject': email.get('subject'), 'status': 'Skipped', 'message_id': None, 'attempts': 0,
+                  'error': None}
+
+        message = self.build_message(**email)
+        if message is None:
+            result['error'] = "Message could not be built"
+            return result
+
+        for attempt in range(1, max(EMAIL_MAX_ATTEMPTS, 1) + 1):
+            result['attempts'] = attempt
+            with span('email.send', mode='batch', attempt=attempt) as stage:
+                stage.add(rows=1, nbytes=self.message_size(message))
+                try:
+                    poller = self.get_email_client().begin_send(message)  # Submitted; polled below
+                except Exception as e:
+                    result.update(status='Failed', error=str(e))
+                    retryable, retry_after = self.classify_error(e)
+                    stage.fail()
+                else:  # Accepted, so never submitted again
+                    return self.poll_send(poller, result, email, stage)
+
+            if not retryable:
+                break
+            if attempt < EMAIL_MAX_ATTEMPTS:
+                delay = retry_after if retry_after is not None else self.backoff_delay(attempt)
+                logging.warning(f"Retrying email '{email.get('subject')}' in {delay:.1f}s: {result['error']}")
+                time.sleep(delay)
+
+        logging.error(f"Failed to send email '{email.get('subject')}' via ACS after {result['attempts']} attempts: "
+                      f"{result['error']}")
+        return result
+
+    def poll_send(self, poller, result, email, stage):
+        """
+        Waits for an accepted send to finish.
+
+        ACS has already accepted the message, so a failed status or a polling error is final: submitting it again
+        could deliver it twice.
+
+        Args:
+            poller: The LROPoller returned by begin_send.
+            result: The delivery result dict to update (see send_batch).
+            email: A dict with the send_email_with_acs arguments.
+            stage: The send's instrumentation span.
+
+        Returns:
+            The delivery result dict.
+        """
+        try:
+            send_result = poller.result()
         except Exception as e:
-            logging.error(f"Failed to send email via ACS: {e}", exc_info=True)
+            result.update(status='Failed', error=f"Accepted, but polling for the result failed: {e}")
+        else:
+            if poller.done() and send_result and send_result.get('status') == 'Succeeded':
+                result.update(status='Succeeded', message_id=send_result.get('id'), error=None)
+                return result
+            result.update(status='Failed', error=f"Send finished with status {poller.status()}: {send_result}")
+
+        stage.fail()
+        logging.error(f"Failed to send email '{email.get('subject')}' via ACS; not resending a message that was "
+                      f"accepted: {result['error']}")
+        return result
+
+    def classify_error(self, error):
+        """
+        Decides whether a send error is worth retrying.
+
+        Args:
+            error: The exception raised while sending.
+
+        Returns:
+            A (retryable, retry_after_seconds) tuple; retry_after_seconds is None if the service didn't say.
+        """
+        from azure.core.exceptions import HttpResponseError, ServiceRequestError, ServiceResponseError
+
+        if isinstance(error, (ServiceRequestError, ServiceResponseError)):  # Connection problems
+            return True, None
+
+        if isinstance(error, HttpResponseError):
+            status_code = getattr(error, 'status_code', None)
+            retry_after = None
+            response = getattr(error, 'response', None)
+            if response is not None and response.headers.get('Retry-After', '').isdigit():
+                retry_after = float(response.headers['Retry-After'])
+            return status_code in RETRYABLE_STATUS_CODES, retry_after
+
+        return False, None
+
+    def backoff_delay(self, attempt):
+        """
+        Full-jitter exponential backoff.
+
+        Args:
+            attempt: The attempt that just failed (1-based).
+
+        Returns:
+            Seconds to wait before the next attempt.
+        """
+        return random.uniform(0, EMAIL_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
@@ -0,0 +1,255 @@
+"""
+Fans error log processing out over a Storage queue
+
+ErrorLogAlert enqueues one work item per log, and ErrorLogWorker processes each item on whichever instance picks it
+up, so one large log no longer delays (or times out) the other error types' reports. A failed item is retried by the
+queue trigger and moved to the poison queue after the host's maxDequeueCount attempts.
+
+Delivery is at least once, so each log's report is guarded by an idempotency marker in the state store. Before
+reading the log, the worker claims it by creating the marker, which fails if another delivery got there first; the
+claim lasts ERRORS_QUEUE_LEASE_MINUTES, after which a later delivery may take it over (its holder having crashed). The
+marker is marked sent once the email is delivered and deleted once the log is archived. A redelivered item whose log
+was sent only archives it, one whose log is claimed by a live worker is dropped (that worker's own item is retried if
+it fails), and one whose log is already archived does nothing. A log with only a header is archived without a report.
+A failed read, send or archive raises, releasing the claim if nothing was sent, so the queue retries the item.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING
+
+from src.scfapp.log_alerts.config import ERROR_TYPES, ERRORS_QUEUE_LEASE_MINUTES, STATE_PATH
+from src.scfapp.log_alerts.services.clients import get_queue_client
+from src.scfapp.log_alerts.services.errors_service import ErrorsService
+from src.scfapp.log_alerts.services.state_store import StateStore, create_state_store
+
+if TYPE_CHECKING:  # Queue SDK is imported when the queue client is first created
+    from azure.storage.queue import QueueClient
+    from src.scfapp.log_alerts.services.error_rows import ErrorRows
+
+
+# noinspection PyMethodMayBeStatic
+class ErrorQueueService:
+    """ Service for enqueuing and processing error log work items """
+    def __init__(self, errors_service: ErrorsService | None = None):
+        self.errors_service: ErrorsService = errors_service or ErrorsService()
+        self.markers: StateStore = create_state_store(path=f"{STATE_PATH}/fanout")  # Idempotency markers
+
+    def work_items(self, error_types: list[dict], yesterday_filestring: str, earlier: bool = False) -> list[dict]:
+        """
+        One work item per non-empty log, found with a single directory listing
+
+        If the listing fails, every error type gets an item for yesterday and the worker skips the missing logs.
+
+        Args:
+            error_types (list[dict]): Error types to process
+            yesterday_filestring (str): Yesterday filestring; later (in-progress) logs are left alone
+            earlier (bool): Include unarchived logs from earlier days
+
+        Returns:
+            list[dict]: Work items ({'type', 'date', 'key'}, where the key is the log filename)
+        """
+        index: dict[str, dict[str, dict]] | None = self.errors_service.discover_error_logs()  # Logs by type and date
+        if index is None:  # Fall back to one item per error type
+            return [
+                {
+                    'type': err_type['type'],
+                    'date': yesterday_filestring,
+                    'key': self.errors_service.log_filename(err_type, yesterday_filestring)
+                }
+                for err_type in error_types
+            ]
+
+        items: list[dict] = []
+        for err_type in error_types:
+            logs: dict[str, dict] = index.get(err_type['type'], {})  # This type's logs by date
+            for date in sorted(logs):
+                if date > yesterday_filestring or (date < yesterday_filestring and not earlier):
+                    continue
+                if not logs[date]['size']:
+                    logging.info(f"Skipping empty log: {logs[date]['name']}")
+                    continue
+                items.append({'type': err_type['type'], 'date': date, 'key': logs[date]['name']})
+
+        return items
+
+    def enqueue(self, error_types: list[dict], yesterday_filestring: str, earlier: bool = False) -> int:
+        """
+        Enqueue one work item per error log
+
+        Args:
+            error_types (list[dict]): Error types to process
+            yesterday_filestring (str): Yesterday filestring
+            earlier (bool): Include unarchived logs from earlier days
+
+        Returns:
+            int: Number of items enqueued
+        """
+        from azure.core.exceptions import ResourceExistsError
+
+        items: list[dict] = self.work_items(error_types, yesterday_filestring, earlier)
+        if not items:
+            logging.info("No error logs to enqueue")
+            return 0
+
+        queue_client: QueueClient = get_queue_client()
+        try:
+            queue_client.create_queue()
+        except ResourceExistsError:
+            pass
+
+        for item in items:
+            queue_client.send_message(json.dumps(item))
+            logging.info(f"Enqueued {item['key']}")
+
+        return len(items)
+
+    def process(self, body: str) -> None:
+        """
+        Report and archive the log named by a work item
+
+        Args:
+            body (str): Work item JSON
+
+        Raises:
+            RuntimeError: The log couldn't be read, its report wasn't delivered or it couldn't be archived, so the item
+                should be retried
+        """
+        item: dict = json.loads(body)
+        err_type: dict | None = next((t for t in ERROR_TYPES if t['type'] == item['type']), None)
+        if err_type is None:  # Retrying won't help
+            logging.error(f"Unknown error type in work item, dropping it: {item['type']}")
+            return
+
+        marker: str = f"{item['key']}.json"  # Idempotency marker
+        state: dict | None = self.read_marker(marker)
+        if state is not None and 'sent' in state:
+            logging.info(f"{item['key']} was already reported; archiving it")
+        elif not self.claim(marker, state, item['key']):
+            return
+        else:
+            try:
+                reported: bool = self.report(err_type, item)
+            except BaseException:
+                self.markers.delete(marker)  # Not marked sent, so release the claim for the retry
+                raise
+            if not reported:
+                self.markers.delete(marker)
+                return
+
+        if not self.errors_service.archive_error_log(err_type, item['date']):  # Marker stays: the retry only archives
+            raise RuntimeError(f"{item['key']} was reported but not archived")
+        self.markers.delete(marker)
+
+    def read_marker(self, marker: str) -> dict | None:
+        """
+        Read a log's idempotency marker
+
+        Args:
+            marker (str): Marker name
+
+        Returns:
+            dict | None: {'sent'} once reported, {'claimed', 'expires'} while a worker holds it ({} if unreadable), or
+                None if there is no marker
+        """
+        data: bytes | None = self.markers.read(marker)
+        if data is None:
+            return None
+        try:
+            state: dict = json.loads(data)
+        except ValueError:
+            return {}
+        return state if isinstance(state, dict) else {}
+
+    def claim(self, marker: str, state: dict | None, key: str) -> bool:
+        """
+        Claim a log for this delivery before reporting it
+
+        Args:
+            marker (str): Marker name
+            state (dict | None): Marker as read (None if there was none)
+            key (str): Log filename
+
+        Returns:
+            bool: True if this delivery holds the claim, False if another delivery does
+        """
+        now: datetime = datetime.now(timezone.utc)
+        lease: bytes = json.dumps({
+            'claimed': now.isoformat(),
+            'expires': (now + timedelta(minutes=ERRORS_QUEUE_LEASE_MINUTES)).isoformat()
+        }).encode()
+
+        if state is None:
+            if self.markers.create(marker, lease):
+                return True
+            logging.info(f"{key} was just claimed by another delivery; dropping this one")
+            return False
+
+        try:
+            expires: datetime = datetime.fromisoformat(state['expires'])
+        except (KeyError, TypeError, ValueError):  # Unreadable: treat it as expired
+            expires = now
+        if expires > now:
+            logging.info(f"{key} is being reported by another delivery; dropping this one")
+            return False
+
+        logging.warning(f"Claim on {key} expired before it was reported; taking it over")
+        self.markers.write(marker, lease)
+        return True
+
+    def report(self, err_type: dict[str, str], item: dict) -> bool:
+        """
+        Email a claimed work item's log and mark it sent
+
+        Args:
+            err_type (dict[str, str]): Error type
+            item (dict): Work item
+
+        Returns:
+            bool: True if the log should now be archived (its report was sent, or it only has a header, and it's
+                marked sent), False if it was already archived
+
+        Raises:
+            RuntimeError: The log couldn't be read or its report wasn't delivered
+        """
+        errors_service: ErrorsService = self.errors_service
+        all_errors: ErrorRows | None = errors_service.get_errors(err_type, item['date'])
+
+        if all_errors is None:
+            if self.log_exists(item['key']):  # Read failed; get_errors logged why
+                raise RuntimeError(f"Failed to read {item['key']}")
+            logging.info(f"{item['key']} is already archived")  # Redelivered after it was processed
+            return False
+
+        if not all_errors:  # Header only: nothing to send, but archive it so it isn't enqueued again every run
+            logging.info(f"{item['key']} has no errors; archiving it")
+            errors_service.record_daily_volumes([err_type], item['date'])  # Record the zero
+        else:
+            email_body, attachments = errors_service.build_error_report(err_type, all_errors)
+            subject: str = (
+                f"Remote Stg App {err_type['type']} Errors - {errors_service.format_filestring(item['date'])}"
+            )
+            if not errors_service.send_error_email(err_type, subject, email_body, attachments):
+                raise RuntimeError(f"{item['key']} report was not delivered")
+
+        self.markers.write(
+            f"{item['key']}.json", json.dumps({'sent': datetime.now(timezone.utc).isoformat()}).encode()
+        )
+        return True
+
+    def log_exists(self, filename: str) -> bool:
+        """
+        Check whether a log is still waiting in REPORT_PATH
+
+        Args:
+            filename (str): Log filename
+
+        Returns:
+            bool: True if the log exists (or the listing failed, to be safe)
+        """
+        index: dict[str, dict[str, dict]] | None = self.errors_service.discover_error_logs()
+        if index is None:
+            return True
+        return any(log['name'] == filename for logs in index.values() for log in logs.values())
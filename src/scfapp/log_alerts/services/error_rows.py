@@ -0,0 +1,294 @@
+"""
+Compact, column-oriented storage for error log rows
+
+Rows are parsed once as they are read, into one list per column instead of one dict per row. An error type's
+'schema' (see ERROR_TYPES) names its timestamp and numeric columns, which are parsed into datetimes and numbers, and
+its category columns, whose repeated values share one string. Other columns are text, and share repeated values too
+for as long as most of their values are repeats. Rows are read back through ErrorRow, a read-only mapping view.
+"""
+from __future__ import annotations
+
+from collections.abc import Mapping, Sequence
+from datetime import datetime
+from itertools import repeat
+from typing import Any, Callable, Iterator, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from src.scfapp.log_alerts.services.error_summary import ErrorSummary
+
+SHARE_SAMPLE: int = 1000  # Rows read before text columns decide whether sharing repeats pays off
+SHARE_MAX_DISTINCT: float = 0.5  # Text columns with more distinct values than this fraction stop sharing them
+
+
+def schema_column(err_type: dict, kind: str) -> str | None:
+    """
+    First column of a kind in an error type's schema
+
+    Args:
+        err_type (dict): Error type
+        kind (str): Column kind, e.g. 'timestamp'
+
+    Returns:
+        str | None: Column name, or None if the schema has no such column
+    """
+    return next((column for column, column_kind in (err_type.get('schema') or {}).items() if column_kind == kind), None)
+
+
+class SharedStrings(dict):
+    """ One string per distinct value: looking up a new value stores it """
+    def __missing__(self, text: str) -> str:
+        self[text] = text
+        return text
+
+
+class TextColumn:
+    """ Text values, sharing one string per distinct value while most values are repeats """
+    __slots__ = ('values', 'shared')
+
+    def __init__(self):
+        self.values: list[Any] = []
+        self.shared: SharedStrings | None = SharedStrings()
+
+    def parser(self) -> Callable[[str | None], Any] | None:
+        """
+        Function that turns a CSV value into the stored value
+
+        Returns:
+            Callable[[str | None], Any] | None: Parser, or None to store values as they are
+        """
+        return None if self.shared is None else self.shared.__getitem__
+
+    def review(self) -> None:
+        """ Stop sharing values once a sample shows that most of them are distinct (e.g. messages with IDs in them) """
+        if self.shared is not None and len(self.shared) > len(self.values) * SHARE_MAX_DISTINCT:
+            self.shared = None
+
+
+class CategoryColumn(TextColumn):
+    """ Text values with few distinct values (e.g. handler names and statuses), always shared """
+    __slots__ = ()
+
+    def review(self) -> None:
+        pass
+
+
+class NumberColumn:
+    """
+    Integer or float values; empty values are None, and values that don't parse or wouldn't be shown the same way
+    (e.g. '2' in a float column, or '007') are kept as text so reports show them as logged
+    """
+    __slots__ = ('values', 'convert')
+
+    def __init__(self, convert: type):
+        self.values: list[Any] = []
+        self.convert: type = convert  # int or float
+
+    def parser(self) -> Callable[[str | None], Any]:
+        return self.parse
+
+    def review(self) -> None:
+        pass
+
+    def parse(self, text: str | None) -> Any:
+        """
+        Parse a CSV value
+
+        Args:
+            text (str | None): Value (None if the row was short)
+
+        Returns:
+            Any: Number, None if empty, or the text if it isn't a number
+        """
+        if not text:
+            return None
+        try:
+            value: int | float = self.convert(text)
+        except ValueError:
+            return text
+        return value if str(value) == text else text
+
+
+class TimestampColumn:
+    """
+    ISO 8601 timestamps as datetimes; empty values are None, and values that don't parse or aren't in
+    datetime.isoformat() form are kept as text so reports show them as logged
+    """
+    __slots__ = ('values',)
+
+    def __init__(self):
+        self.values: list[Any] = []
+
+    def parser(self) -> Callable[[str | None], Any]:
+        return self.parse
+
+    def review(self) -> None:
+        pass
+
+    def parse(self, text: str | None) -> Any:
+        """
+        Parse a CSV value
+
+        Args:
+            text (str | None): Value (None if the row was short)
+
+        Returns:
+            Any: Datetime, None if empty, or the text if it isn't a timestamp
+        """
+        if not text:
+            return None
+        try:
+            value: datetime = datetime.fromisoformat(text)
+        except ValueError:
+            return text
+        return value if value.isoformat() == text else text
+
+
+def create_column(kind: str | None) -> TextColumn | NumberColumn | TimestampColumn:
+    """
+    Create a column for a schema kind
+
+    Args:
+        kind (str | None): 'timestamp', 'int', 'float', 'category' or 'text' (None for a column not in the schema)
+
+    Returns:
+        TextColumn | NumberColumn | TimestampColumn: Empty column
+    """
+    if kind == 'timestamp':
+        return TimestampColumn()
+    if kind == 'int':
+        return NumberColumn(int)
+    if kind == 'float':
+        return NumberColumn(float)
+    if kind == 'category':
+        return CategoryColumn()
+    return TextColumn()
+
+
+class ErrorRow(Mapping):
+    """ Read-only mapping view of one row """
+    __slots__ = ('rows', 'index')
+
+    def __init__(self, rows: ErrorRows, index: int):
+        self.rows: ErrorRows = rows
+        self.index: int = index
+
+    def __getitem__(self, column: str) -> Any:
+        return self.rows.columns[self.rows.positions[column]].values[self.index]
+
+    def get(self, column: str, default: Any = None) -> Any:
+        position: int | None = self.rows.positions.get(column)
+        return default if position is None else self.rows.columns[position].values[self.index]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.rows.positions)
+
+    def __len__(self) -> int:
+        return len(self.rows.positions)
+
+    def __repr__(self) -> str:
+        return f"ErrorRow({dict(self)!r})"
+
+
+class ErrorRows(Sequence):
+    """
+    Error rows read from a CSV log, stored by column, with a count of rows dropped by the row cap and an optional
+    summary
+    """
+    def __init__(self, max_rows: int = 0, summary: ErrorSummary | None = None, schema: dict[str, str] | None = None):
+        self.max_rows: int = max_rows  # Row cap (0 for no cap)
+        self.truncated: int = 0  # Rows read past the cap
+        self.summary: ErrorSummary | None = summary  # Counts every row, including truncated ones
+        self.filename: str | None = None  # Source log
+        self.schema: dict[str, str] = schema or {}  # Column kinds by name
+        self.positions: dict[str, int] = {}  # Column index by name, in CSV order
+        self.columns: list[TextColumn | NumberColumn | TimestampColumn] = []
+        self.count: int = 0  # Rows kept
+        self.keys: set | None = None  # Columns of the last row, which the parsers below are set up for
+        self.appenders: list[tuple[str, Callable, Callable | None]] = []  # (column, append, parser) for each column
+        self.padding: list[Callable] = []  # Appends for columns the last row didn't have
+
+    def add(self, row: dict) -> None:
+        """
+        Parse and keep a row, or count it as truncated once the row cap is reached
+
+        Args:
+            row (dict): CSV row (the DictReader overflow key, None, is dropped)
+        """
+        if row.keys() != self.keys:  # First row, or a row with other columns
+            self.prepare(row)
+
+        if self.max_rows and self.count >= self.max_rows:
+            self.truncated += 1
+            if self.summary is not None:  # Parsed the same way, but not kept
+                self.summary.add({
+                    column: parse(row[column]) if parse else row[column] for column, _, parse in self.appenders
+                })
+            return
+
+        for column, append, parse in self.appenders:
+            append(parse(row[column]) if parse else row[column])
+        for append in self.padding:  # Columns missing from this row
+            append(None)
+        self.count += 1
+
+        if self.count == SHARE_SAMPLE:
+            for values in self.columns:
+                values.review()
+            self.keys = None  # Rebuild the parsers
+
+        if self.summary is not None:
+            self.summary.add(ErrorRow(self, self.count - 1))
+
+    def prepare(self, row: dict) -> None:
+        """
+        Set up the parsers for a row's columns, adding any column not seen before (empty for the rows already kept)
+
+        Args:
+            row (dict): CSV row
+        """
+        for column in row:
+            if column is not None and column not in self.positions:
+                values: TextColumn | NumberColumn | TimestampColumn = create_column(self.schema.get(column))
+                values.values.extend([None] * self.count)
+                self.positions[column] = len(self.columns)
+                self.columns.append(values)
+
+        self.keys = set(row)
+        self.appenders = [
+            (column, self.columns[position].values.append, self.columns[position].parser())
+            for column, position in self.positions.items() if column in self.keys
+        ]
+        self.padding = [
+            self.columns[position].values.append for column, position in self.positions.items()
+            if column not in self.keys
+        ]
+
+    def records(self, columns: list[str]) -> Iterator[tuple]:
+        """
+        Values of some columns, row by row
+
+        Args:
+            columns (list[str]): Column names (columns not in the log are None)
+
+        Returns:
+            Iterator[tuple]: One tuple of values per row
+        """
+        return zip(*(
+            self.columns[self.positions[column]].values if column in self.positions else repeat(None, self.count)
+            for column in columns
+        ))
+
+    def __getitem__(self, index: int | slice) -> ErrorRow | list[ErrorRow]:
+        if isinstance(index, slice):
+            return [ErrorRow(self, i) for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('row index out of range')
+        return ErrorRow(self, index)
+
+    def __iter__(self) -> Iterator[ErrorRow]:
+        return (ErrorRow(self, i) for i in range(self.count))
+
+    def __len__(self) -> int:
+        return self.count
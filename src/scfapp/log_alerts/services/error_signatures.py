@@ -0,0 +1,74 @@
+""" Normalizes error messages into signatures by masking the IDs, barcodes, UUIDs and timestamps in them """
+import re
+from functools import lru_cache
+
+# Default masks, tried in order at each position; earlier patterns win
+DEFAULT_SIGNATURE_PATTERNS: list[tuple[str, str]] = [
+    (r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b', '<uuid>'),
+    (r'\b\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?\b', '<timestamp>'),
+    (r'\b\d{1,2}/\d{1,2}/\d{2,4}(?: \d{1,2}:\d{2}(?::\d{2})?(?: ?[AP]M)?)?\b', '<timestamp>'),
+    (r'\b(?=[0-9a-fA-F]*[a-fA-F])(?=[0-9a-fA-F]*\d)[0-9a-fA-F]{12,}\b', '<hex>'),
+    (r'\b[A-Za-z]{0,4}\d{4,}[A-Za-z0-9]*\b', '<id>'),  # MMS IDs, barcodes, request and user IDs
+]
+SAMPLE_IDS: int = 3  # Masked values kept per signature
+
+
+class SignatureNormalizer:
+    """
+    Masks variable values in messages with one precompiled alternation, so each message is scanned once
+
+    Error types can add their own masks with a 'signature_patterns' key: a list of (regex, placeholder) pairs that
+    are tried before the defaults.
+    """
+    def __init__(self, patterns: list[tuple[str, str]]):
+        self.placeholders: list[tuple[str, str]] = []  # (group name, placeholder) in pattern order
+        alternatives: list[str] = []
+        for i, (pattern, placeholder) in enumerate(patterns):
+            re.compile(pattern)  # Fail fast on a bad per-type pattern
+            self.placeholders.append((f'sig{i}', placeholder))
+            alternatives.append(f'(?P<sig{i}>{pattern})')
+        self.pattern: re.Pattern = re.compile('|'.join(alternatives))
+        self.normalize = lru_cache(maxsize=4096)(self.normalize)  # Repeated messages are common
+
+    def normalize(self, message: str) -> tuple[str, tuple[str, ...]]:
+        """
+        Mask a message
+
+        Args:
+            message (str): Error message
+
+        Returns:
+            tuple[str, tuple[str, ...]]: Signature, and the masked values (other than timestamps) in order
+        """
+        values: list[str] = []
+
+        def mask(match: re.Match) -> str:
+            for name, placeholder in self.placeholders:
+                if match.group(name) is not None:
+                    if placeholder != '<timestamp>':  # Times aren't useful samples
+                        values.append(match.group(0))
+                    return placeholder
+            return '<?>'
+
+        return self.pattern.sub(mask, message), tuple(values)
+
+
+_normalizers: dict[str, SignatureNormalizer] = {}  # Compiled once per error type
+
+
+def get_normalizer(err_type: dict) -> SignatureNormalizer:
+    """
+    Get the signature normalizer for an error type
+
+    Args:
+        err_type (dict): Error type
+
+    Returns:
+        SignatureNormalizer: Normalizer using the type's patterns followed by the defaults
+    """
+    normalizer: SignatureNormalizer | None = _normalizers.get(err_type['type'])
+    if normalizer is None:
+        patterns: list[tuple[str, str]] = [tuple(p) for p in err_type.get('signature_patterns') or []]
+        normalizer = SignatureNormalizer(patterns + DEFAULT_SIGNATURE_PATTERNS)
+        _normalizers[err_type['type']] = normalizer
+    return normalizer
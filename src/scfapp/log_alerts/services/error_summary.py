@@ -0,0 +1,115 @@
+""" Aggregated summaries of error log rows """
+from typing import Any, Mapping
+
+from src.scfapp.log_alerts.services.error_rows import schema_column
+from src.scfapp.log_alerts.services.error_signatures import SAMPLE_IDS, SignatureNormalizer
+
+# Column-name fragments used to find the message and timestamp columns when an error type doesn't name them
+MESSAGE_COLUMN_HINTS: tuple[str, ...] = ('message', 'error', 'reason', 'detail')
+TIMESTAMP_COLUMN_HINTS: tuple[str, ...] = ('timestamp', 'time', 'date')
+MAX_MESSAGE_CHARS: int = 500  # Longer messages are shortened in the summary table
+
+
+def find_column(columns: list[str], hints: tuple[str, ...]) -> str | None:
+    """
+    Find the first column whose name contains one of the hints (hints are tried in order)
+
+    Args:
+        columns (list[str]): Column names
+        hints (tuple[str, ...]): Lower-case name fragments
+
+    Returns:
+        str | None: Column name, or None if nothing matches
+    """
+    for hint in hints:
+        for column in columns:
+            if column is not None and hint in column.lower():
+                return column
+    return None
+
+
+class ErrorSummary:
+    """
+    Counts error rows by message in a single pass, tracking when each message was first and last seen
+
+    The message and timestamp columns come from the error type's 'message_column' and 'timestamp_column' keys (or
+    its schema's timestamp column), or are guessed from the first row's column names. With a normalizer, rows are
+    grouped by message signature and a few of the masked values are kept as samples.
+    """
+    def __init__(self, err_type: dict, normalizer: SignatureNormalizer | None = None):
+        self.message_column: str | None = err_type.get('message_column')
+        self.timestamp_column: str | None = (
+            err_type.get('timestamp_column') or schema_column(err_type, 'timestamp')
+        )
+        self.normalizer: SignatureNormalizer | None = normalizer  # Optional signature grouping
+        self.columns_resolved: bool = False
+        self.groups: dict[str, list] = {}  # key -> [message, count, first seen, last seen, sample values]
+        self.rows: int = 0
+
+    def resolve_columns(self, row: Mapping) -> None:
+        """
+        Pick the message and timestamp columns from the first row
+
+        Args:
+            row (Mapping): First CSV row
+        """
+        columns: list[str] = [column for column in row if column is not None]
+        if self.message_column not in columns:
+            self.message_column = find_column(columns, MESSAGE_COLUMN_HINTS)
+        if self.timestamp_column not in columns:
+            self.timestamp_column = find_column(columns, TIMESTAMP_COLUMN_HINTS)
+        self.columns_resolved = True
+
+    def add(self, row: Mapping) -> None:
+        """
+        Count a row
+
+        Args:
+            row (Mapping): CSV row
+        """
+        if not self.columns_resolved:
+            self.resolve_columns(row)
+
+        if self.message_column:
+            message: str = row.get(self.message_column) or ''
+        else:  # No message column: the whole row (minus its timestamp) is the message
+            message = ', '.join(str(v) for k, v in row.items() if k is not None and k != self.timestamp_column)
+        timestamp: Any = (row.get(self.timestamp_column) or '') if self.timestamp_column else ''  # Parsed, or text
+        values: tuple[str, ...] = ()
+        if self.normalizer is not None:
+            message, values = self.normalizer.normalize(message)
+
+        group: list | None = self.groups.get(message)
+        if group is None:
+            self.groups[message] = group = [message, 0, timestamp, timestamp, []]
+        group[1] += 1
+        group[3] = timestamp  # Logs are appended in time order
+        samples: list[str] = group[4]
+        if len(samples) < SAMPLE_IDS:
+            samples.extend(value for value in values[:SAMPLE_IDS - len(samples)] if value not in samples)
+        self.rows += 1
+
+    def top(self, limit: int) -> list[dict]:
+        """
+        Most frequent messages
+
+        Args:
+            limit (int): Maximum number of messages (0 for all)
+
+        Returns:
+            list[dict]: Rows with 'Message', 'Count', 'First Seen' and 'Last Seen', plus 'Sample IDs' when grouped
+                by signature
+        """
+        groups: list[list] = sorted(self.groups.values(), key=lambda group: -group[1])
+        top: list[dict] = []
+        for message, count, first_seen, last_seen, samples in (groups[:limit] if limit else groups):
+            row: dict = {
+                'Message': message if len(message) <= MAX_MESSAGE_CHARS else message[:MAX_MESSAGE_CHARS] + '...',
+                'Count': count,
+                'First Seen': first_seen,
+                'Last Seen': last_seen
+            }
+            if self.normalizer is not None:
+                row['Sample IDs'] = ', '.join(samples)
+            top.append(row)
+        return top
@@ -1,18 +1,40 @@
 """ Service for parsing error data """
-import csv
-import io
+from __future__ import annotations
+
+import asyncio
 import logging
-from datetime import datetime, timedelta, timezone
+import re
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, Iterator, Mapping, Sequence, TYPE_CHECKING
 from zoneinfo import ZoneInfo
 
-import pandas as pd
-from azure.core.exceptions import ResourceNotFoundError
-from azure.storage.fileshare import ShareFileClient
-# noinspection PyProtectedMember
-from azure.storage.fileshare._download import StorageStreamDownloader
-
-from src.scfapp.log_alerts.config import STORAGE_CONNECTION_STRING, SHARE_NAME, REPORT_PATH
+from src.scfapp.log_alerts.config import (
+    STORAGE_CONNECTION_STRING, SHARE_NAME, REPORT_PATH, ERRORS_CONCURRENCY, ERRORS_MAX_ROWS, ERRORS_SUMMARY_MAX_ROWS,
+    ERRORS_SUMMARY_MAX_BYTES, ERRORS_SUMMARY_TOP, ERRORS_ATTACHMENT_MAX_BYTES, ERRORS_GROUP_SIGNATURES,
+    ERRORS_SUPPRESS_SEEN, ERRORS_SEEN_DAYS, STATE_PATH, METRICS_TRENDS, ANOMALY_DETECTION
+)
+from src.scfapp.log_alerts.services.anomaly_detector import AnomalyDetector, describe_anomaly, send_anomaly_alert
+from src.scfapp.log_alerts.services.csv_stream import aiter_csv_rows, iter_csv_rows
 from src.scfapp.log_alerts.services.email_service import EmailService
+from src.scfapp.log_alerts.services.error_rows import ErrorRows, schema_column
+from src.scfapp.log_alerts.services.error_signatures import get_normalizer
+from src.scfapp.log_alerts.services.error_summary import TIMESTAMP_COLUMN_HINTS, ErrorSummary, find_column
+from src.scfapp.log_alerts.services.html_report import HtmlReport
+from src.scfapp.log_alerts.services.instrumentation import acounted, counted, span
+from src.scfapp.log_alerts.services.log_storage import (
+    FileShareLogStorage, LogNotFoundError, LogStorage, create_log_storage
+)
+from src.scfapp.log_alerts.services.metrics_store import MetricsStore, format_trend
+from src.scfapp.log_alerts.services.seen_index import SeenIndex, content_hash, row_content
+from src.scfapp.log_alerts.services.state_store import create_state_store
+
+if TYPE_CHECKING:  # Storage SDK is imported when a method first needs it
+    from azure.storage.fileshare.aio import ShareClient as AsyncShareClient, ShareFileClient as AsyncShareFileClient
+
+# Error log filenames: {type}_log_{YYYYMMDD}.csv
+LOG_FILENAME_PATTERN: re.Pattern = re.compile(r'^(?P<type>.+)_log_(?P<date>\d{8})\.csv$')
 
 
 # noinspection PyMethodMayBeStatic
@@ -22,43 +44,306 @@ class ErrorsService:
         self.storage_connection_string = STORAGE_CONNECTION_STRING
         self.share_name = SHARE_NAME
         self.report_path = REPORT_PATH
+        self.storage: LogStorage = create_log_storage()  # File share or local directory tree
+        self.seen_indexes: dict[str, SeenIndex] = {}  # Loaded per error type when ERRORS_SUPPRESS_SEEN is set
+        self.metrics: MetricsStore | None = None  # Created on first use when METRICS_TRENDS is set
+        self.trends: dict[str, str] = {}  # Trend text by log filename, so each log is recorded once
+        self.anomaly_detector: AnomalyDetector | None = None  # Created on first use when ANOMALY_DETECTION is set
+        self.anomalies: dict[str, dict | None] = {}  # Outlier (or None) by log filename
+        self.volumes: dict[str, int] = {}  # Rows in each log read, by filename
+
+    def discover_error_logs(self) -> dict[str, dict[str, dict]] | None:
+        """
+        List REPORT_PATH once and index the error logs in it by type and date
+
+        Returns:
+            dict[str, dict[str, dict]] | None: {type: {YYYYMMDD: {'name', 'size'}}}, or None if the listing failed
+        """
+        index: dict[str, dict[str, dict]] = {}  # Logs by type and date
+
+        try:
+            for item in self.storage.list(self.report_path):  # Single listing call
+                if item['is_directory']:  # Skip OLD and other directories
+                    continue
+                match: re.Match | None = LOG_FILENAME_PATTERN.match(item['name'])
+                if not match:  # Not an error log
+                    continue
+                index.setdefault(match['type'], {})[match['date']] = {
+                    'name': item['name'],
+                    'size': item.get('size') or 0
+                }
 
-    def get_errors(self, err_type: dict[str, str], yesterday_filestring: str) -> list[dict] | None:
+        except Exception as e:  # Handle errors
+            logging.error(f"Failed to list error logs in {self.report_path}: {e}", exc_info=True)
+            return None
+
+        return index
+
+    def available_error_types(self, error_types: list[dict], yesterday_filestring: str) -> list[dict]:
         """
-        Get errors from CSV file and move file to OLD folder
+        Narrow error types to those with a non-empty log for the given day, using one directory listing
+
+        Logs from earlier days that are still waiting in REPORT_PATH are logged as a warning. If the listing fails,
+        all error types are returned so they can be fetched individually.
+
+        Args:
+            error_types (list[dict]): Error types to check
+            yesterday_filestring (str): Yesterday filestring
+
+        Returns:
+            list[dict]: Error types with a log to process
+        """
+        index: dict[str, dict[str, dict]] | None = self.discover_error_logs()  # Logs by type and date
+        if index is None:  # Fall back to fetching every error type
+            return error_types
+
+        available: list[dict] = []
+        for err_type in error_types:
+            logs: dict[str, dict] = index.get(err_type['type'], {})  # This type's logs by date
+            log: dict | None = logs.get(yesterday_filestring)
+
+            if log is None:
+                logging.info(f"No {err_type['type']} log for {yesterday_filestring}")
+            elif not log['size']:
+                logging.info(f"Skipping empty log: {log['name']}")
+            else:
+                available.append(err_type)
+
+            missed: list[str] = sorted(date for date in logs if date < yesterday_filestring)  # Unprocessed days
+            if missed:
+                logging.warning(f"Unprocessed {err_type['type']} logs from earlier days: {', '.join(missed)}")
+
+        return available
+
+    def get_errors(self, err_type: dict[str, str], yesterday_filestring: str) -> ErrorRows | None:
+        """
+        Get errors from CSV file, streaming it in chunks and keeping at most ERRORS_MAX_ROWS rows
 
         Args:
             err_type (str): Error type
             yesterday_filestring (str): Yesterday filestring
 
         """
-        all_errors: list[dict] = []  # Empty list for errors
-        filename: str = f"{err_type['type']}_log_{yesterday_filestring}.csv"  # Filename
+        filename: str = self.log_filename(err_type, yesterday_filestring)  # Filename
         filepath: str = f"{self.report_path}/{filename}"  # Filepath
 
-        try:
-            file_client: ShareFileClient = ShareFileClient.from_connection_string(  # File client
-                conn_str=self.storage_connection_string,
-                share_name=self.share_name,
-                file_path=filepath
-            )
+        with span('errors.read', type=err_type['type']) as stage:  # Download and parse
+            try:
+                chunks: Iterator[bytes] = self.storage.open_stream(filepath)  # Download file
+                all_errors: ErrorRows = self.collect_rows(  # Parse rows as they arrive
+                    iter_csv_rows(counted(chunks, stage)), err_type
+                )
+                all_errors.filename = filename
+                self.volumes[filename] = len(all_errors) + all_errors.truncated
+                stage.add(rows=self.volumes[filename])
+                self.log_truncation(filename, all_errors)
 
-            stream: StorageStreamDownloader = file_client.download_file()  # Download file
-            data: io.StringIO = io.StringIO(stream.readall().decode())  # Decode file
-            csv_reader: csv.DictReader = csv.DictReader(data)  # Convert data to dictionary
+            except LogNotFoundError:  # If file not found
+                logging.warning(f"File not found, skipping: {filename}")  # Log message
+                stage.fail('missing')
+                return None
+            except Exception as e:  # Handle other errors
+                logging.error(f"An unexpected error occurred while processing {filename}: {e}")  # Log error
+                stage.fail()
+                return None
 
-            for row in csv_reader:  # Iterate through each row
-                all_errors.append(row)  # Add error dictionary to list
+        return all_errors
 
-        except ResourceNotFoundError:  # If file not found
-            logging.warning(f"File not found, skipping: {filename}")  # Log message
-            return None
-        except Exception as e:  # Handle other errors
-            logging.error(f"An unexpected error occurred while processing {filename}: {e}")  # Log error
-            return None
+    async def get_errors_async(
+            self, share_client: AsyncShareClient, err_type: dict[str, str], yesterday_filestring: str
+    ) -> ErrorRows | None:
+        """
+        Get errors from CSV file using a shared async share client, streaming it in chunks
+
+        Args:
+            share_client (AsyncShareClient): Share-level async client
+            err_type (str): Error type
+            yesterday_filestring (str): Yesterday filestring
+
+        """
+        from azure.core.exceptions import ResourceNotFoundError
+
+        filename: str = self.log_filename(err_type, yesterday_filestring)  # Filename
+        filepath: str = f"{self.report_path}/{filename}"  # Filepath
+
+        with span('errors.read', type=err_type['type']) as stage:  # Download and parse
+            try:
+                file_client: AsyncShareFileClient = share_client.get_file_client(filepath)  # Shares the pool
+                stream = await file_client.download_file()  # Download file
+                all_errors: ErrorRows = self.new_error_rows(err_type)  # Parsed rows
+                async for row in aiter_csv_rows(acounted(stream.chunks(), stage)):  # Parse rows as they arrive
+                    all_errors.add(row)
+                all_errors.filename = filename
+                self.volumes[filename] = len(all_errors) + all_errors.truncated
+                stage.add(rows=self.volumes[filename])
+                self.log_truncation(filename, all_errors)
+
+            except ResourceNotFoundError:  # If file not found
+                logging.warning(f"File not found, skipping: {filename}")  # Log message
+                stage.fail('missing')
+                return None
+            except Exception as e:  # Handle other errors
+                logging.error(f"An unexpected error occurred while processing {filename}: {e}")  # Log error
+                stage.fail()
+                return None
+
+        return all_errors
+
+    async def process_errors_async(self, error_types: list[dict], yesterday_filestring: str) -> None:
+        """
+        Fetch, parse, email and archive every error type concurrently
+
+        One share-level client (and its connection pool) is used for all files, and at most ERRORS_CONCURRENCY
+        error types are processed at once. A failure for one error type doesn't affect the others. Logs in local
+        storage are processed with the regular methods on worker threads.
+
+        Args:
+            error_types (list[dict]): Error types to process
+            yesterday_filestring (str): Yesterday filestring
+        """
+        from azure.storage.fileshare.aio import ShareClient as AsyncShareClient
+
+        semaphore: asyncio.Semaphore = asyncio.Semaphore(max(ERRORS_CONCURRENCY, 1))  # Concurrency limit
+
+        if not isinstance(self.storage, FileShareLogStorage):  # No async client for local storage
+            await asyncio.gather(*(
+                self.process_error_type_threaded(semaphore, err_type, yesterday_filestring)
+                for err_type in error_types
+            ))
+            return
+
+        async with AsyncShareClient.from_connection_string(  # Share client
+            conn_str=self.storage_connection_string,
+            share_name=self.share_name
+        ) as share_client:
+            await asyncio.gather(*(
+                self.process_error_type_async(share_client, semaphore, err_type, yesterday_filestring)
+                for err_type in error_types
+            ))
+
+    async def process_error_type_threaded(
+            self, semaphore: asyncio.Semaphore, err_type: dict[str, str], yesterday_filestring: str
+    ) -> None:
+        """
+        Fetch, email and archive a single error type's log on a worker thread, archiving it only once the email is
+        delivered
+
+        Args:
+            semaphore (asyncio.Semaphore): Concurrency limit
+            err_type (str): Error type
+            yesterday_filestring (str): Yesterday filestring
+        """
+        async with semaphore:
+            try:
+                all_errors: ErrorRows | None = await asyncio.to_thread(  # Get all errors
+                    self.get_errors, err_type, yesterday_filestring
+                )
+
+                if not all_errors:  # If no errors found, skip
+                    return
+
+                if not await asyncio.to_thread(self.send_email_wrapper, err_type, all_errors):  # Send email
+                    logging.error(f"{err_type['type']} report was not delivered; leaving its log for the next run")
+                    return
+
+                await asyncio.to_thread(self.archive_error_log, err_type, yesterday_filestring)  # Archive error log
+
+            except Exception as e:  # Keep failures isolated to this error type
+                logging.error(f"Failed to process {err_type['type']} errors: {e}", exc_info=True)
+
+    async def process_error_type_async(
+            self,
+            share_client: AsyncShareClient,
+            semaphore: asyncio.Semaphore,
+            err_type: dict[str, str],
+            yesterday_filestring: str
+    ) -> None:
+        """
+        Fetch, email and archive a single error type's log, archiving it only once the email is delivered
+
+        Args:
+            share_client (AsyncShareClient): Share-level async client
+            semaphore (asyncio.Semaphore): Concurrency limit
+            err_type (str): Error type
+            yesterday_filestring (str): Yesterday filestring
+        """
+        async with semaphore:
+            try:
+                all_errors: ErrorRows | None = await self.get_errors_async(  # Get all errors
+                    share_client, err_type, yesterday_filestring
+                )
+
+                if not all_errors:  # If no errors found, skip
+                    return
+
+                if not await asyncio.to_thread(self.send_email_wrapper, err_type, all_errors):  # Send email
+                    logging.error(f"{err_type['type']} report was not delivered; leaving its log for the next run")
+                    return
+
+                await self.archive_error_log_async(err_type, yesterday_filestring)  # Archive error log
+
+            except Exception as e:  # Keep failures isolated to this error type
+                logging.error(f"Failed to process {err_type['type']} errors: {e}", exc_info=True)
+
+    def log_filename(self, err_type: dict[str, str], filestring: str) -> str:
+        """
+        Get the CSV log filename for an error type and date
+
+        Args:
+            err_type (str): Error type
+            filestring (str): Date string (YYYYMMDD)
+
+        Returns:
+            str: Filename
+        """
+        return f"{err_type['type']}_log_{filestring}.csv"
 
+    def new_error_rows(self, err_type: dict[str, str]) -> ErrorRows:
+        """
+        Create an empty row collection for the error type's schema, summarizing rows as they are added if reports
+        are grouped by signature, or if oversized reports are summarized and rows past ERRORS_MAX_ROWS would
+        otherwise be missing from the summary. Other logs are only summarized once they turn out to be oversized.
+
+        Args:
+            err_type (str): Error type
+
+        Returns:
+            ErrorRows: Empty rows
+        """
+        schema: dict[str, str] | None = err_type.get('schema')  # Column kinds
+        if ERRORS_GROUP_SIGNATURES:
+            return ErrorRows(ERRORS_MAX_ROWS, ErrorSummary(err_type, get_normalizer(err_type)), schema)
+        if ERRORS_MAX_ROWS and (ERRORS_SUMMARY_MAX_ROWS or ERRORS_SUMMARY_MAX_BYTES):  # Truncated rows are seen once
+            return ErrorRows(ERRORS_MAX_ROWS, ErrorSummary(err_type), schema)
+        return ErrorRows(ERRORS_MAX_ROWS, schema=schema)
+
+    def collect_rows(self, rows: Iterable[dict], err_type: dict[str, str]) -> ErrorRows:
+        """
+        Collect streamed CSV rows, keeping at most ERRORS_MAX_ROWS of them
+
+        Args:
+            rows (Iterable[dict]): CSV rows
+            err_type (str): Error type
+
+        Returns:
+            ErrorRows: Kept rows and the number truncated
+        """
+        all_errors: ErrorRows = self.new_error_rows(err_type)
+        for row in rows:
+            all_errors.add(row)
         return all_errors
 
+    def log_truncation(self, filename: str, all_errors: ErrorRows) -> None:
+        """
+        Log a warning if rows were dropped by the row cap
+
+        Args:
+            filename (str): Log filename
+            all_errors (ErrorRows): Parsed rows
+        """
+        if all_errors.truncated:
+            logging.warning(f"{filename}: kept {len(all_errors)} rows, {all_errors.truncated} more rows truncated")
+
     def set_filestring(self) -> str:
         """
         Set yesterday date string for file name
@@ -73,115 +358,752 @@ class ErrorsService:
 
         return yesterday_filestring
 
-    def generate_email_body(self, error_type: dict[str, str], scfapp_errors: list[dict]):
+    def generate_email_body(self, error_type: dict[str, str], scfapp_errors: Sequence[Mapping]):
         """
-        Parses request data to generate a plain text email body.
+        Renders error rows as an HTML email body.
 
         Args:
             error_type (str): Error type
-            scfapp_errors (list[dict]): A list of dictionaries, each containing an error
+            scfapp_errors (Sequence[Mapping]): A list of dictionaries, each containing an error
 
         Returns:
             str: A string containing the formatted email body.
         """
-        df = pd.DataFrame(scfapp_errors)
-        html_table = df.to_html(index=False, border=0, classes="error-table")
-
-        html_body = f"""
-        <html>
-        <head>
-        <style>
-            body {{ font-family: sans-serif; }}
-            .error-table {{
-                border-collapse: collapse;
-                width: 100%;
-                font-size: 12px;
-            }}
-            .error-table th, .error-table td {{
-                border: 1px solid #dddddd;
-                text-align: left;
-                padding: 8px;
-            }}
-            .error-table th {{
-                background-color: #f2f2f2;
-                font-weight: bold;
-            }}
-            .error-table tr:nth-child(even) {{
-                background-color: #f9f9f9;
-            }}
-        </style>
-        </head>
-        <body>
-            <p>RSA {error_type['type']} logged ERRORS yesterday</p>
-            {html_table}
-        </body>
-        </html>
-        """
+        with span('errors.render', type=error_type['type']) as stage:
+            report: HtmlReport = HtmlReport()  # Single output buffer
+            report.paragraph(f"RSA {error_type['type']} logged ERRORS yesterday")
+            self.write_volume(report, error_type, scfapp_errors)
+            self.write_rows(report, error_type, scfapp_errors)
+
+            html_body: str = report.render()
+            stage.add(rows=len(scfapp_errors), nbytes=len(html_body))
 
         return html_body
 
-    def send_email_wrapper(self, err_type: dict[str, str], all_errors: list[dict]) -> None:
+    def write_rows(self, report: HtmlReport, err_type: dict[str, str], all_errors: Sequence[Mapping]) -> None:
+        """
+        Write error rows as a table, collapsing rows already reported on earlier days if ERRORS_SUPPRESS_SEEN is set
+
+        Args:
+            report (HtmlReport): Report being written
+            err_type (str): Error type
+            all_errors (Sequence[Mapping]): Parsed rows
+        """
+        seen_index: SeenIndex | None = self.seen_index(err_type)
+        if seen_index is None or not all_errors:
+            report.table(all_errors)  # Rows are written straight into the buffer
+        else:
+            columns: list[str] = [column for column in all_errors[0] if column is not None]
+            skip_column: str | None = (  # Differs every day, so left out of the row hash
+                err_type.get('timestamp_column') or schema_column(err_type, 'timestamp')
+                or find_column(columns, TIMESTAMP_COLUMN_HINTS)
+            )
+            new_rows: list[Mapping] = []
+            still_occurring: int = 0
+            for row in all_errors:
+                if seen_index.seen(content_hash(row_content(row, skip_column))):
+                    still_occurring += 1
+                else:
+                    new_rows.append(row)
+
+            report.table(new_rows, columns)
+            if still_occurring:
+                report.paragraph(f"Still occurring ({still_occurring}): rows already reported on earlier days")
+
+        truncated: int = getattr(all_errors, 'truncated', 0)  # Rows dropped by the row cap
+        if truncated:
+            report.paragraph(f"{truncated} more rows truncated")
+
+    def write_volume(self, report: HtmlReport, err_type: dict[str, str], all_errors: Sequence[Mapping]) -> None:
+        """
+        Write the log's error count against its 7- and 30-day averages (METRICS_TRENDS) and flag it if it's an
+        outlier (ANOMALY_DETECTION)
+
+        Args:
+            report (HtmlReport): Report being written
+            err_type (str): Error type
+            all_errors (Sequence[Mapping]): Parsed rows
+        """
+        filename: str | None = getattr(all_errors, 'filename', None)  # Source log
+        match: re.Match | None = LOG_FILENAME_PATTERN.match(filename) if filename else None
+        if match is None:  # Date unknown
+            return
+        count: int = len(all_errors) + getattr(all_errors, 'truncated', 0)  # Rows in the log
+
+        anomaly: dict | None = self.check_error_anomaly(err_type, match['date'], count)
+        if anomaly is not None:
+            report.paragraph(f"Unusual volume: {describe_anomaly(anomaly)}")
+
+        trend: str = self.record_error_count(err_type, match['date'], count)
+        if trend:
+            report.paragraph(trend)
+
+    def check_error_anomaly(self, err_type: dict[str, str], yesterday_filestring: str, count: int) -> dict | None:
+        """
+        Score an error type's count for a day against its baseline, sending an alert if it's an outlier
+
+        Each day is folded into the baseline once: observing it again (a re-rendered report, or a later run
+        reporting the same log) returns the stored result without updating the baseline or alerting again.
+
+        Args:
+            err_type (str): Error type
+            yesterday_filestring (str): Date string (YYYYMMDD)
+            count (int): Rows in the day's log (0 if there was none)
+
+        Returns:
+            dict | None: Outlier, or None if it isn't one (or ANOMALY_DETECTION isn't set)
+        """
+        filename: str = self.log_filename(err_type, yesterday_filestring)
+        if not ANOMALY_DETECTION:
+            return None
+        if filename in self.anomalies:  # Already scored
+            return self.anomalies[filename]
+
+        day: date = datetime.strptime(yesterday_filestring, '%Y%m%d').date()
+        series: str = f"{err_type['type']} errors"
+        anomaly: dict | None = None
+        try:
+            if self.anomaly_detector is None:
+                self.anomaly_detector = AnomalyDetector(
+                    create_state_store(path=f"{STATE_PATH}/metrics"), "anomaly_errors.json"
+                )
+            observed: bool = self.anomaly_detector.observed(series, day)  # Alerted when it was first observed
+            anomaly = self.anomaly_detector.observe(series, day, count)
+            if anomaly is not None and not observed:
+                send_anomaly_alert([anomaly], self.format_filestring(yesterday_filestring))
+        except Exception as e:  # Detection is optional
+            logging.warning(f"Failed to check {filename} for unusual volume: {e}")
+
+        self.anomalies[filename] = anomaly
+        return anomaly
+
+    def record_error_count(
+            self, err_type: dict[str, str], yesterday_filestring: str, count: int, overwrite: bool = True
+    ) -> str:
+        """
+        Record an error type's count for a day in the metrics store and describe its trend
+
+        Args:
+            err_type (str): Error type
+            yesterday_filestring (str): Date string (YYYYMMDD)
+            count (int): Rows in the day's log (0 if there was none)
+            overwrite (bool): Replace a count already recorded for the day; if False, only fill an empty day
+
+        Returns:
+            str: Trend text, or '' if METRICS_TRENDS isn't set
+        """
+        filename: str = self.log_filename(err_type, yesterday_filestring)
+        if not METRICS_TRENDS:
+            return ''
+        if filename in self.trends:  # Already recorded (e.g. the report was re-rendered as a summary)
+            return self.trends[filename]
+
+        day: date = datetime.strptime(yesterday_filestring, '%Y%m%d').date()
+        series: str = f"errors/{err_type['type']}"
+        trend: str = ''
+        try:
+            if self.metrics is None:
+                self.metrics = MetricsStore(create_state_store(path=f"{STATE_PATH}/metrics"))
+            text: str = format_trend(count, self.metrics.trend(series, day))
+            self.metrics.record(series, day, count, overwrite)
+            if text:
+                trend = f"{count} errors; {text}"
+        except Exception as e:  # Trends are optional
+            logging.warning(f"Failed to update error metrics for {filename}: {e}")
+
+        self.trends[filename] = trend
+        return trend
+
+    def record_daily_volumes(self, error_types: list[dict], yesterday_filestring: str) -> None:
+        """
+        Record one count per error type for the day, including zeros, in the metrics store and the anomaly baselines,
+        so "no errors" isn't mistaken for "not run" and quiet days pull the baselines down
+
+        Logs rendered in this run were recorded as they were written. Every other error type is recorded with the
+        rows read from its log (a header-only log has none) or, if it has no log for the day, 0. Both writes are
+        idempotent by day: a zero only fills a day without a count, and the anomaly baselines take each day once, so a
+        log reported by an earlier run keeps its count. An error type whose log is still waiting unread (its download
+        failed, or another function instance has it) is left alone.
+
+        Args:
+            error_types (list[dict]): Error types to record
+            yesterday_filestring (str): Yesterday filestring
+        """
+        if not METRICS_TRENDS and not ANOMALY_DETECTION:
+            return
+
+        index: dict[str, dict[str, dict]] | None = None  # Listed the first time an unread error type needs it
+        for err_type in error_types:
+            filename: str = self.log_filename(err_type, yesterday_filestring)
+            recorded: bool = (not METRICS_TRENDS or filename in self.trends) and (
+                not ANOMALY_DETECTION or filename in self.anomalies
+            )
+            if recorded:  # When its report was written
+                continue
+
+            count: int | None = self.volumes.get(filename)  # Rows read in this run
+            if count is None:
+                if index is None:
+                    index = self.discover_error_logs()
+                    if index is None:  # Can't tell a missing log from an unread one
+                        logging.warning(f"Not recording error counts for {yesterday_filestring}: listing failed")
+                        return
+                log: dict | None = index.get(err_type['type'], {}).get(yesterday_filestring)
+                if log is not None and log['size']:  # Still waiting to be read
+                    continue
+                count = 0
+
+            self.check_error_anomaly(err_type, yesterday_filestring, count)
+            self.record_error_count(err_type, yesterday_filestring, count, overwrite=False)
+
+    def seen_index(self, err_type: dict[str, str]) -> SeenIndex | None:
+        """
+        Get the error type's index of previously reported rows and signatures
+
+        Args:
+            err_type (str): Error type
+
+        Returns:
+            SeenIndex | None: Index, or None if ERRORS_SUPPRESS_SEEN isn't set
+        """
+        if not ERRORS_SUPPRESS_SEEN:
+            return None
+
+        seen_index: SeenIndex | None = self.seen_indexes.get(err_type['type'])
+        if seen_index is None:
+            store = create_state_store(path=f"{STATE_PATH}/seen")
+            seen_index = SeenIndex(store, f"seen_{err_type['type']}.bin", ERRORS_SEEN_DAYS)
+            self.seen_indexes[err_type['type']] = seen_index
+        return seen_index
+
+    def finish_seen_index(self, err_type: dict[str, str], delivered: bool) -> None:
+        """
+        Save the rows and signatures just reported, or forget them if the report wasn't delivered
+
+        Args:
+            err_type (str): Error type
+            delivered (bool): Whether the report was sent
+        """
+        seen_index: SeenIndex | None = self.seen_indexes.get(err_type['type'])
+        if seen_index is None:
+            return
+        if delivered:
+            seen_index.save()
+        else:
+            seen_index.discard()
+
+    def build_error_report(self, err_type: dict[str, str], all_errors: Sequence[Mapping]) -> tuple[str, list[dict]]:
+        """
+        Render an error report, switching to a summary with the full log attached if it would be oversized or
+        reports are grouped by signature
+
+        Args:
+            err_type (str): Error type
+            all_errors (Sequence[Mapping]): A list of dictionaries, each containing an error
+
+        Returns:
+            tuple[str, list[dict]]: HTML email body and ACS attachments
+        """
+        if not ERRORS_GROUP_SIGNATURES and not self.exceeds_summary_rows(all_errors):
+            email_body: str = self.generate_email_body(err_type, all_errors)  # Full report
+            if not self.exceeds_summary_bytes(email_body):
+                return email_body, []
+
+        with span('errors.summarize', type=err_type['type']) as stage:
+            attachments: list[dict] = []
+            attachment: dict | None = self.log_attachment(all_errors, ERRORS_ATTACHMENT_MAX_BYTES)
+            if attachment is not None:
+                attachments.append(attachment)
+
+            report: HtmlReport = HtmlReport()  # Single output buffer
+            report.paragraph(f"RSA {err_type['type']} logged ERRORS yesterday")
+            self.write_volume(report, err_type, all_errors)
+            self.write_summary(report, err_type, all_errors, attachment)
+
+            html_body: str = report.render()
+            stage.add(rows=len(all_errors), nbytes=len(html_body))
+
+        return html_body, attachments
+
+    def exceeds_summary_rows(self, all_errors: Sequence[Mapping]) -> bool:
+        """
+        Check whether a log has too many rows to report in full
+
+        Args:
+            all_errors (Sequence[Mapping]): Parsed rows
+
+        Returns:
+            bool: True if the log should be summarized
+        """
+        total: int = len(all_errors) + getattr(all_errors, 'truncated', 0)  # Rows in the log
+        return bool(ERRORS_SUMMARY_MAX_ROWS) and total > ERRORS_SUMMARY_MAX_ROWS
+
+    def exceeds_summary_bytes(self, email_body: str) -> bool:
+        """
+        Check whether a rendered report is too large to send in full
+
+        Args:
+            email_body (str): HTML email body
+
+        Returns:
+            bool: True if the report should be summarized
+        """
+        return bool(ERRORS_SUMMARY_MAX_BYTES) and len(email_body.encode()) > ERRORS_SUMMARY_MAX_BYTES
+
+    def write_summary(
+            self, report: HtmlReport, err_type: dict[str, str], all_errors: Sequence[Mapping], attachment: dict | None
+    ) -> None:
+        """
+        Write the most frequent messages in a log, and where to find the full log
+
+        Args:
+            report (HtmlReport): Report being written
+            err_type (str): Error type
+            all_errors (Sequence[Mapping]): Parsed rows
+            attachment (dict | None): The full log's attachment, if it was attached
+        """
+        summary: ErrorSummary | None = getattr(all_errors, 'summary', None)
+        if summary is None:  # Rows weren't summarized as they were read
+            summary = ErrorSummary(err_type, get_normalizer(err_type) if ERRORS_GROUP_SIGNATURES else None)
+            for row in all_errors:
+                summary.add(row)
+
+        kind: str = "distinct problems" if summary.normalizer is not None else "distinct messages"
+        seen_index: SeenIndex | None = self.seen_index(err_type)
+        if seen_index is None:
+            top: list[dict] = summary.top(ERRORS_SUMMARY_TOP)  # Most frequent messages
+            report.paragraph(
+                f"{summary.rows} errors with {len(summary.groups)} {kind}; the {len(top)} most frequent are listed "
+                f"below"
+            )
+            report.table(top)
+        else:
+            new_groups: list[dict] = []
+            seen_groups: list[dict] = []
+            for group in summary.top(0):  # Every group, most frequent first
+                (seen_groups if seen_index.seen(content_hash(group['Message'])) else new_groups).append(group)
+
+            report.paragraph(
+                f"{summary.rows} errors with {len(summary.groups)} {kind}; {len(new_groups)} not reported before, "
+                f"the {min(len(new_groups), ERRORS_SUMMARY_TOP)} most frequent are listed below"
+            )
+            report.table(new_groups[:ERRORS_SUMMARY_TOP] if ERRORS_SUMMARY_TOP else new_groups)
+            if seen_groups:
+                report.paragraph(
+                    f"Still occurring ({sum(group['Count'] for group in seen_groups)}): "
+                    f"{len(seen_groups)} {kind} already reported on earlier days"
+                )
+                report.table(
+                    seen_groups[:ERRORS_SUMMARY_TOP] if ERRORS_SUMMARY_TOP else seen_groups, ['Message', 'Count']
+                )
+
+        filename: str | None = getattr(all_errors, 'filename', None)  # Source log
+        if attachment is not None:
+            report.paragraph(f"The full log is attached as {attachment['name']}")
+        elif filename:
+            report.paragraph(f"The full log was too large to attach; it is archived as OLD/{filename}")
+
+    def log_attachment(self, all_errors: Sequence[Mapping], max_bytes: int) -> dict | None:
+        """
+        Compress a full error log for attaching to a summary report
+
+        The log is streamed from the share through a gzip compressor, so only the compressed copy is held in memory.
+
+        Args:
+            all_errors (Sequence[Mapping]): Parsed rows, naming their source log
+            max_bytes (int): Largest compressed size to attach
+
+        Returns:
+            dict | None: ACS attachment, or None if the log is unknown, unreadable or too large
+        """
+        filename: str | None = getattr(all_errors, 'filename', None)  # Source log
+        if not filename or max_bytes <= 0:
+            return None
+
+        compressor = zlib.compressobj(wbits=31)  # gzip container
+        parts: list[bytes] = []
+        size: int = 0
+
+        try:
+            for chunk in self.storage.open_stream(f"{self.report_path}/{filename}"):
+                parts.append(compressor.compress(chunk))
+                size += len(parts[-1])
+                if size > max_bytes:
+                    logging.warning(f"{filename} is over {max_bytes} bytes compressed; not attaching it")
+                    return None
+            parts.append(compressor.flush())
+
+        except Exception as e:  # The summary is still worth sending
+            logging.error(f"Failed to compress {filename} for attaching: {e}")
+            return None
+
+        data: bytes = b''.join(parts)
+        if len(data) > max_bytes:
+            logging.warning(f"{filename} is over {max_bytes} bytes compressed; not attaching it")
+            return None
+
+        return EmailService().create_attachment(f"{filename}.gz", 'application/gzip', data)
+
+    def send_email_wrapper(self, err_type: dict[str, str], all_errors: Sequence[Mapping]) -> bool:
         """
         Construct and send email
 
         Args:
             err_type (str): Error type
-            all_errors (list[dict]): A list of dictionaries, each containing an error
+            all_errors (Sequence[Mapping]): A list of dictionaries, each containing an error
+
+        Returns:
+            bool: True if the email was sent, so the log can be archived
         """
         report_date: str = (datetime.now(timezone.utc).date() - timedelta(days=1)).strftime('%Y-%m-%d')  # Report date
-        email_body = self.generate_email_body(err_type, all_errors)  # Email body
+        email_body, attachments = self.build_error_report(err_type, all_errors)  # Email body and attachments
+        subject: str = f"Remote Stg App {err_type['type']} Errors - {report_date}"  # Email subject
 
+        return self.send_error_email(err_type, subject, email_body, attachments)
+
+    def send_error_email(
+            self, err_type: dict[str, str], subject: str, email_body: str, attachments: list[dict] | None = None
+    ) -> bool:
+        """
+        Send an error report to the error type's recipients
+
+        Args:
+            err_type (str): Error type
+            subject (str): Email subject
+            email_body (str): HTML email body
+            attachments (list[dict] | None): ACS attachments
+
+        Returns:
+            bool: True if the email was sent
+        """
+        sent: bool = False
         if email_body:
             logging.info("Generated email body. Preparing to send email.")  # Log message
 
             email_service: EmailService = EmailService()  # Create email service instance
 
+            sent = email_service.send_email_with_acs(  # Send email using ACS
+                **self.error_email(err_type, subject, email_body, email_service, attachments)
+            )
+        else:
+            logging.info("Email body is empty. Skipping email.")
+
+        self.finish_seen_index(err_type, sent)
+
+        return sent
+
+    def error_email(
+            self,
+            err_type: dict[str, str],
+            subject: str,
+            email_body: str,
+            email_service: EmailService,
+            attachments: list[dict] | None = None
+    ) -> dict:
+        """
+        Build the send_email_with_acs arguments for an error report
+
+        Args:
+            err_type (str): Error type
+            subject (str): Email subject
+            email_body (str): HTML email body
+            email_service (EmailService): Email service
+            attachments (list[dict] | None): ACS attachments
+
+        Returns:
+            dict: Subject, body, recipients and any attachments
+        """
+        to_recipients_list: list[str] = email_service.create_email_recipients(err_type['to'])
+
+        if err_type['cc']:
+            cc_list_final: list[str] | None = email_service.create_email_recipients(err_type['cc'])
+
+        else:
+            cc_list_final = None
+
+        email: dict = {
+            'subject': subject,
+            'html_body': email_body,
+            'to_recipients': to_recipients_list,
+            'cc_recipients': cc_list_final
+        }
+        if attachments:
+            email['attachments'] = attachments
+
+        return email
+
+    def process_errors_batched(self, error_types: list[dict], yesterday_filestring: str) -> list[dict]:
+        """
+        Fetch every error type's log, send all reports as one concurrent batch, and archive the delivered ones
+
+        Logs whose email could not be delivered are left in REPORT_PATH so a later (or catch-up) run can resend them.
+
+        Args:
+            error_types (list[dict]): Error types to process
+            yesterday_filestring (str): Yesterday filestring
+
+        Returns:
+            list[dict]: Delivery result for each email sent
+        """
+        report_date: str = (datetime.now(timezone.utc).date() - timedelta(days=1)).strftime('%Y-%m-%d')  # Report date
+        email_service: EmailService = EmailService()  # One client for the whole batch
+
+        reported: list[dict] = []  # Error types with an email in the batch
+        emails: list[dict] = []
+        for err_type in error_types:
+            all_errors: ErrorRows | None = self.get_errors(err_type, yesterday_filestring)  # Get all errors
+            if not all_errors:  # If no errors found, skip
+                continue
+
             subject: str = f"Remote Stg App {err_type['type']} Errors - {report_date}"  # Email subject
-            html_body: str = email_body
-            to_recipients_list: list[str] = email_service.create_email_recipients(err_type['to'])
+            email_body, attachments = self.build_error_report(err_type, all_errors)  # Email body and attachments
+            emails.append(self.error_email(err_type, subject, email_body, email_service, attachments))
+            reported.append(err_type)
 
-            if err_type['cc']:
-                cc_list_final: list[str] | None = email_service.create_email_recipients(err_type['cc'])
+        results: list[dict] = email_service.send_batch(emails)  # Send concurrently
 
+        for err_type, result in zip(reported, results):
+            self.finish_seen_index(err_type, result['status'] == 'Succeeded')
+            if result['status'] == 'Succeeded':
+                self.archive_error_log(err_type, yesterday_filestring)  # Archive error log
             else:
-                cc_list_final = None
+                logging.error(f"{err_type['type']} report was not delivered; leaving its log for the next run")
+
+        return results
+
+    def process_catchup(self, error_types: list[dict], yesterday_filestring: str) -> None:
+        """
+        Report and archive every unarchived log up to yesterday, one email per error type
+
+        Logs are found with a single directory listing and downloaded concurrently. Each error type's logs are merged
+        into one email with a section per date, and they are archived once it's delivered. Logs that fail to download,
+        or whose email isn't delivered, stay in REPORT_PATH for the next run.
+
+        Args:
+            error_types (list[dict]): Error types to process
+            yesterday_filestring (str): Yesterday filestring; later (in-progress) logs are left alone
+        """
+        index: dict[str, dict[str, dict]] | None = self.discover_error_logs()  # Logs by type and date
+        if index is None:  # Listing failed, nothing to catch up on
+            logging.error("Could not list error logs; skipping catch-up run.")
+            return
 
-            email_service.send_email_with_acs(  # Send email using ACS
-                subject=subject,
-                html_body=html_body,
-                to_recipients=to_recipients_list,
-                cc_recipients=cc_list_final
+        pending: dict[str, list[str]] = {  # Dates to process for each error type
+            err_type['type']: sorted(
+                date for date in index.get(err_type['type'], {}) if date <= yesterday_filestring
             )
+            for err_type in error_types
+        }
+
+        with ThreadPoolExecutor(max_workers=max(ERRORS_CONCURRENCY, 1)) as executor:
+            futures: dict[tuple[str, str], Future] = {  # Download every pending log concurrently
+                (err_type['type'], date): executor.submit(self.get_errors, err_type, date)
+                for err_type in error_types
+                for date in pending[err_type['type']]
+                if index[err_type['type']][date]['size']  # Empty logs have nothing to download
+            }
+
+            for err_type in error_types:
+                dates: list[str] = pending[err_type['type']]
+                if not dates:
+                    continue
+
+                sections: dict[str, ErrorRows] = {}  # Rows by date
+                processed: list[str] = []  # Dates that can be archived
+                for date in dates:
+                    future: Future | None = futures.get((err_type['type'], date))
+                    if future is None:  # Empty log
+                        processed.append(date)
+                        continue
+                    try:
+                        all_errors: ErrorRows | None = future.result()
+                    except Exception as e:  # Keep failures isolated to this log
+                        logging.error(f"Failed to read {self.log_filename(err_type, date)}: {e}", exc_info=True)
+                        continue
+                    if all_errors is None:  # Download failed; retry next run
+                        continue
+                    if all_errors:
+                        sections[date] = all_errors
+                    processed.append(date)
+
+                delivered: bool = not sections  # Nothing to send
+                if sections:
+                    try:
+                        delivered = self.send_catchup_email(err_type, sections)
+                    except Exception as e:  # Keep failures isolated to this error type
+                        logging.error(f"Failed to send {err_type['type']} catch-up email: {e}", exc_info=True)
+                if not delivered:  # Only archive the logs that had nothing to send
+                    logging.error(f"{err_type['type']} catch-up report was not delivered; leaving its logs for the "
+                                  f"next run")
+                    processed = [date for date in processed if date not in sections]
+
+                self.archive_error_logs(err_type, processed, executor)
+
+    def send_catchup_email(self, err_type: dict[str, str], sections: dict[str, ErrorRows]) -> bool:
+        """
+        Send one email covering several days of an error type's logs
+
+        Args:
+            err_type (str): Error type
+            sections (dict[str, ErrorRows]): Rows by date (YYYYMMDD)
+
+        Returns:
+            bool: True if the email was sent
+        """
+        dates: list[str] = sorted(sections)
+        if len(dates) == 1:  # Same email as a regular run
+            report_dates: str = self.format_filestring(dates[0])
+            email_body, attachments = self.build_error_report(err_type, sections[dates[0]])
         else:
-            logging.info("Email body is empty. Skipping email.")
+            report_dates = f"{self.format_filestring(dates[0])} to {self.format_filestring(dates[-1])}"
+            summarized: set[str] = {
+                date for date in dates if ERRORS_GROUP_SIGNATURES or self.exceeds_summary_rows(sections[date])
+            }
+            email_body, attachments = self.generate_catchup_email_body(err_type, sections, summarized)
+            if self.exceeds_summary_bytes(email_body):  # Summarize every day instead
+                email_body, attachments = self.generate_catchup_email_body(err_type, sections, set(dates))
+
+        subject: str = f"Remote Stg App {err_type['type']} Errors - {report_dates}"  # Email subject
+
+        return self.send_error_email(err_type, subject, email_body, attachments)
+
+    def generate_catchup_email_body(
+            self, error_type: dict[str, str], sections: dict[str, ErrorRows], summarized: set[str] | None = None
+    ) -> tuple[str, list[dict]]:
+        """
+        Renders several days of error rows as one HTML email body with a section per date.
+
+        Args:
+            error_type (str): Error type
+            sections (dict[str, ErrorRows]): Rows by date (YYYYMMDD)
+            summarized (set[str] | None): Dates to render as a summary with the full log attached
 
-    def archive_error_log(self, err_type: dict[str, str], yesterday_filestring: str) -> None:
+        Returns:
+            tuple[str, list[dict]]: A string containing the formatted email body, and ACS attachments.
+        """
+        with span('errors.render', type=error_type['type'], days=len(sections)) as stage:
+            report: HtmlReport = HtmlReport()  # Single output buffer
+            report.paragraph(f"RSA {error_type['type']} logged ERRORS on {len(sections)} days")
+            attachments: list[dict] = []
+            attachment_budget: int = ERRORS_ATTACHMENT_MAX_BYTES  # Shared by all of the email's attachments
+
+            for date in sorted(sections):
+                report.raw(f"            <h3>{self.format_filestring(date)}</h3>\n")
+                attachment: dict | None = self.write_section(
+                    report, error_type, sections[date], bool(summarized and date in summarized), attachment_budget
+                )
+                if attachment is not None:
+                    attachments.append(attachment)
+                    attachment_budget -= len(attachment['contentInBase64']) * 3 // 4  # Compressed size
+
+            html_body: str = report.render()
+            stage.add(rows=sum(len(rows) for rows in sections.values()), nbytes=len(html_body))
+
+        return html_body, attachments
+
+    def write_section(
+            self,
+            report: HtmlReport,
+            err_type: dict[str, str],
+            all_errors: Sequence[Mapping],
+            summarize: bool,
+            attachment_budget: int
+    ) -> dict | None:
+        """
+        Write one log's volume and its rows, or its summary with the full log attached
+
+        Args:
+            report (HtmlReport): Report being written
+            err_type (str): Error type
+            all_errors (Sequence[Mapping]): Parsed rows, naming their source log
+            summarize (bool): Write a summary instead of the rows
+            attachment_budget (int): Largest compressed log to attach
+
+        Returns:
+            dict | None: The full log's attachment, if it was summarized and attached
+        """
+        self.write_volume(report, err_type, all_errors)
+
+        if not summarize:
+            self.write_rows(report, err_type, all_errors)
+            return None
+
+        attachment: dict | None = self.log_attachment(all_errors, attachment_budget)
+        self.write_summary(report, err_type, all_errors, attachment)
+        return attachment
+
+    def format_filestring(self, filestring: str) -> str:
+        """
+        Format a YYYYMMDD filestring as YYYY-MM-DD
+
+        Args:
+            filestring (str): Date string (YYYYMMDD)
+
+        Returns:
+            str: Date string (YYYY-MM-DD)
+        """
+        return f"{filestring[:4]}-{filestring[4:6]}-{filestring[6:]}"
+
+    def archive_error_logs(
+            self, err_type: dict[str, str], filestrings: list[str], executor: ThreadPoolExecutor | None = None
+    ) -> None:
+        """
+        Moves several processed error log files to the 'OLD' directory.
+
+        Args:
+            err_type (str): The type of error log to move.
+            filestrings (list[str]): The date strings for the log files.
+            executor (ThreadPoolExecutor | None): Executor to run the moves on concurrently
+        """
+        if executor is None:
+            for filestring in filestrings:
+                self.archive_error_log(err_type, filestring)
+            return
+
+        for future in [executor.submit(self.archive_error_log, err_type, date) for date in filestrings]:
+            future.result()  # archive_error_log logs its own failures
+
+    def archive_error_log(self, err_type: dict[str, str], yesterday_filestring: str) -> bool:
         """
         Moves a processed error log file to the 'OLD' directory within the same share.
 
         Args:
             err_type (str): The type of error log to move.
             yesterday_filestring (str): The date string for the log file.
+
+        Returns:
+            bool: True if the log was moved or was already gone, False if the move failed
         """
-        source_filename = f"{err_type['type']}_log_{yesterday_filestring}.csv"
+        source_filename = self.log_filename(err_type, yesterday_filestring)
         source_filepath = f"{self.report_path}/{source_filename}"
         destination_filepath = f"{self.report_path}/OLD/{source_filename}"
 
         logging.info(f"Attempting to move {source_filepath} to {destination_filepath}")
-        try:
-            file_client = ShareFileClient.from_connection_string(
-                conn_str=self.storage_connection_string,
-                share_name=self.share_name,
-                file_path=source_filepath
-            )
-            # rename_file with a new path acts as a "move" operation.
-            file_client.rename_file(new_name=destination_filepath)
-            logging.info(f"Successfully moved log file.")
+        with span('errors.archive', type=err_type['type']) as stage:
+            try:
+                self.storage.move(source_filepath, destination_filepath)
+                logging.info(f"Successfully moved log file.")
+
+            except LogNotFoundError:
+                # This can happen if the file was already moved or never existed.
+                logging.warning(f"Could not find file to move: {source_filepath}")
+                stage.fail('missing')
+            except Exception as e:
+                logging.error(f"Failed to move file {source_filepath}: {e}", exc_info=True)
+                stage.fail()
+                return False
 
-        except ResourceNotFoundError:
-            # This can happen if the file was already moved or never existed.
-            logging.warning(f"Could not find file to move: {source_filepath}")
-        except Exception as e:
-            logging.error(f"Failed to move file {source_filepath}: {e}", exc_info=True)
+        return True
+
+    async def archive_error_log_async(self, err_type: dict[str, str], yesterday_filestring: str) -> bool:
+        """
+        Moves a processed error log file to the 'OLD' directory through the log storage, on a worker thread.
 
+        Args:
+            err_type (str): The type of error log to move.
+            yesterday_filestring (str): The date string for the log file.
 
+        Returns:
+            bool: True if the log was moved or was already gone, False if the move failed
+        """
+        return await asyncio.to_thread(self.archive_error_log, err_type, yesterday_filestring)
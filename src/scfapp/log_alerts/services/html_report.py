@@ -0,0 +1,150 @@
+""" Lightweight HTML email rendering without pandas """
+import io
+from datetime import datetime
+from html import escape
+from itertools import chain
+from string import Template
+from typing import Callable, Iterable, Iterator, Mapping
+
+# Page template, split once at import into the text before and after the body
+PAGE_TEMPLATE: Template = Template("""
+        <html>
+        <head>
+        <style>
+            body { font-family: sans-serif; }
+            .error-table {
+                border-collapse: collapse;
+                width: 100%;
+                font-size: 12px;
+            }
+            .error-table th, .error-table td {
+                border: 1px solid #dddddd;
+                text-align: left;
+                padding: 8px;
+            }
+            .error-table th {
+                background-color: #f2f2f2;
+                font-weight: bold;
+            }
+            .error-table tr:nth-child(even) {
+                background-color: #f9f9f9;
+            }
+        </style>
+        </head>
+        <body>
+$body
+        </body>
+        </html>
+        """)
+PAGE_HEAD, PAGE_TAIL = PAGE_TEMPLATE.substitute(body='\0').split('\0')
+
+
+class HtmlReport:
+    """ Writes an HTML email page into a single buffer """
+    def __init__(self):
+        self.buffer: io.StringIO = io.StringIO()  # Output buffer
+        self.buffer.write(PAGE_HEAD)
+
+    def paragraph(self, text: str) -> None:
+        """
+        Write an escaped paragraph
+
+        Args:
+            text (str): Paragraph text
+        """
+        self.buffer.write(f"            <p>{escape(text)}</p>\n")
+
+    def table(self, rows: Iterable[Mapping], columns: list[str] | None = None, css_class: str = "error-table") -> int:
+        """
+        Write an escaped table straight from a row iterator
+
+        Args:
+            rows (Iterable[Mapping]): Table rows; columnar rows with a records(columns) method (ErrorRows) are read
+                column by column
+            columns (list[str] | None): Column names; defaults to the keys of the first row
+            css_class (str): Table CSS class
+
+        Returns:
+            int: Number of rows written
+        """
+        write = self.buffer.write  # Local alias for the row loop
+        count: int = 0
+
+        columnar: Callable[[list[str]], Iterator[Iterable]] | None = getattr(rows, 'records', None)
+        if columnar is not None:  # No per-row view needed
+            if columns is None:
+                if not rows:  # Nothing to render
+                    return 0
+                columns = [col for col in rows[0] if col is not None]
+            records: Iterator[Iterable] = columnar(columns)
+        else:
+            row_iter: Iterator[Mapping] = iter(rows)
+            if columns is None:
+                first_row: Mapping | None = next(row_iter, None)
+                if first_row is None:  # Nothing to render
+                    return 0
+                columns = [col for col in first_row if col is not None]  # Skip DictReader overflow key
+                row_iter = chain((first_row,), row_iter)  # Put the first row back
+            records = (map(row.get, columns) for row in row_iter)
+
+        write(f'<table class="dataframe {css_class}">\n  <thead>\n    <tr style="text-align: right;">\n')
+        write(''.join(f"      <th>{escape(str(col), quote=False)}</th>\n" for col in columns))
+        write("    </tr>\n  </thead>\n  <tbody>\n")
+
+        for record in records:
+            write("    <tr>\n")
+            write(''.join(f"      <td>{_cell(value)}</td>\n" for value in record))
+            write("    </tr>\n")
+            count += 1
+
+        write("  </tbody>\n</table>\n")
+
+        return count
+
+    def raw(self, html: str) -> None:
+        """
+        Write pre-rendered HTML
+
+        Args:
+            html (str): HTML fragment
+        """
+        self.buffer.write(html)
+
+    def fragment(self) -> str:
+        """
+        Body written so far, without the page head and tail, for embedding in another report
+
+        Returns:
+            str: HTML fragment
+        """
+        return self.buffer.getvalue()[len(PAGE_HEAD):]
+
+    def render(self) -> str:
+        """
+        Close the page and return its HTML
+
+        Returns:
+            str: Complete HTML page
+        """
+        self.buffer.write(PAGE_TAIL)
+        return self.buffer.getvalue()
+
+
+def _cell(value) -> str:
+    """
+    Escape a table cell value the way DataFrame.to_html does (quotes are left as they are)
+
+    Args:
+        value: Cell value
+
+    Returns:
+        str: Escaped text
+    """
+    if isinstance(value, str):
+        return escape(value, quote=False)
+    if value is None:
+        return ""
+    if isinstance(value, datetime):  # Parsed log timestamps are shown as ISO 8601, as they were logged
+        return value.isoformat()
+    return escape(str(value), quote=False)
+
@@ -0,0 +1,342 @@
+"""
+Per-stage timing and volume metrics
+
+Stages are wrapped in spans (the span() context manager or the instrumented() decorator) that record the duration,
+rows, bytes and outcome, and hand one record per stage to the exporter chosen by INSTRUMENTATION. With the default
+'none' exporter, span() yields a shared no-op span and nothing is timed or exported. Only the 'otel' exporter
+produces Application Insights custom metrics; 'log' writes traces.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, AsyncIterator, Callable, Iterator, Protocol
+
+from src.scfapp.log_alerts.config import (
+    INSTRUMENTATION, INSTRUMENTATION_LOG_LEVEL, APPLICATIONINSIGHTS_CONNECTION_STRING
+)
+
+METER_NAME: str = 'scfapp.log_alerts'
+
+
+class Span:
+    """ One run of a stage """
+    __slots__ = ('stage', 'attributes', 'rows', 'bytes', 'outcome')
+
+    def __init__(self, stage: str, attributes: dict[str, Any]):
+        self.stage: str = stage
+        self.attributes: dict[str, Any] = attributes  # Dimensions, e.g. {'type': 'RequestHandler'}
+        self.rows: int = 0
+        self.bytes: int = 0
+        self.outcome: str = 'ok'
+
+    def add(self, rows: int = 0, nbytes: int = 0) -> None:
+        """
+        Count rows and bytes
+
+        Args:
+            rows (int): Rows
+            nbytes (int): Bytes
+        """
+        self.rows += rows
+        self.bytes += nbytes
+
+    def fail(self, outcome: str = 'failed') -> None:
+        """
+        Mark the stage as not successful (exceptions that escape the span are recorded as 'error')
+
+        Args:
+            outcome (str): Outcome, e.g. 'failed' or 'missing'
+        """
+        self.outcome = outcome
+
+    def record(self, duration_ms: float) -> dict[str, Any]:
+        """
+        Exported form of the span
+
+        Args:
+            duration_ms (float): Duration in milliseconds
+
+        Returns:
+            dict[str, Any]: Stage, duration, rows, bytes, outcome and attributes
+        """
+        return {
+            'stage': self.stage, 'duration_ms': round(duration_ms, 3), 'rows': self.rows, 'bytes': self.bytes,
+            'outcome': self.outcome, **self.attributes
+        }
+
+
+class NoopSpan(Span):
+    """ Span used when instrumentation is off; ignores everything """
+    __slots__ = ()
+
+    def add(self, rows: int = 0, nbytes: int = 0) -> None:
+        pass
+
+    def fail(self, outcome: str = 'failed') -> None:
+        pass
+
+
+NOOP_SPAN: NoopSpan = NoopSpan('', {})
+
+
+class Exporter(Protocol):
+    """ Receives one record per finished span """
+    def export(self, record: dict[str, Any]) -> None: ...
+
+
+class MemoryExporter:
+    """ Keeps records in process, for tests and benchmarks """
+    def __init__(self):
+        self.records: list[dict[str, Any]] = []
+        self.lock: threading.Lock = threading.Lock()  # Stages may finish on several threads
+
+    def export(self, record: dict[str, Any]) -> None:
+        with self.lock:
+            self.records.append(record)
+
+    def stage(self, name: str) -> list[dict[str, Any]]:
+        """
+        Records for one stage
+
+        Args:
+            name (str): Stage name
+
+        Returns:
+            list[dict[str, Any]]: Records, oldest first
+        """
+        with self.lock:
+            return [record for record in self.records if record['stage'] == name]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.records.clear()
+
+
+class LogExporter:
+    """
+    Writes each record as a 'METRIC {json}' trace. These are ordinary traces, not custom metrics; Application Insights
+    stores them with the other traces, so they are queried there:
+
+        traces | where message startswith "METRIC " | extend metric = parse_json(substring(message, 7))
+    """
+    def __init__(self, level: str = INSTRUMENTATION_LOG_LEVEL):
+        number: int | str = logging.getLevelName(level.strip().upper())  # Level number, or a string if unknown
+        self.level: int = number if isinstance(number, int) else logging.WARNING
+
+    def export(self, record: dict[str, Any]) -> None:
+        logging.log(self.level, f"METRIC {json.dumps(record, default=str)}")
+
+
+class OtelExporter:
+    """
+    Records spans on OpenTelemetry meters (stage duration histogram, row and byte counters), which the Azure Monitor
+    exporter set up by configure_azure_monitor() sends to Application Insights as custom metrics
+    """
+    def __init__(self, meter_provider: Any = None):
+        from opentelemetry import metrics
+
+        meter = (meter_provider or metrics.get_meter_provider()).get_meter(METER_NAME)  # Global provider by default
+        self.duration = meter.create_histogram('stage.duration', unit='ms', description="Stage duration")
+        self.rows = meter.create_counter('stage.rows', description="Rows processed by a stage")
+        self.bytes = meter.create_counter('stage.bytes', unit='By', description="Bytes processed by a stage")
+
+    def export(self, record: dict[str, Any]) -> None:
+        attributes: dict[str, Any] = {
+            key: value for key, value in record.items() if key not in ('duration_ms', 'rows', 'bytes')
+        }
+        self.duration.record(record['duration_ms'], attributes)
+        if record['rows']:
+            self.rows.add(record['rows'], attributes)
+        if record['bytes']:
+            self.bytes.add(record['bytes'], attributes)
+
+
+def configure_azure_monitor(connection_string: str | None = APPLICATIONINSIGHTS_CONNECTION_STRING) -> bool:
+    """
+    Set up the Azure Monitor OpenTelemetry distro so meters are exported to Application Insights
+
+    Called once, when the 'otel' exporter is first created rather than at startup, so the distro's imports stay out
+    of cold starts. The Functions host already sends logs, so the distro only collects from this module's meter
+    logger (which nothing writes to), and live metrics and performance counters are left off.
+
+    Args:
+        connection_string (str | None): Application Insights connection string
+
+    Returns:
+        bool: True if the distro was configured
+    """
+    if not connection_string:
+        logging.warning("INSTRUMENTATION is 'otel' but APPLICATIONINSIGHTS_CONNECTION_STRING isn't set; "
+                        "metrics won't be exported")
+        return False
+
+    from azure.monitor.opentelemetry import configure_azure_monitor as configure_distro
+
+    configure_distro(
+        connection_string=connection_string,
+        logger_name=METER_NAME,
+        enable_live_metrics=False,
+        enable_performance_counters=False
+    )
+    return True
+
+
+_exporter: Exporter | None = None  # Created on first use
+_configured: bool = False
+_lock: threading.Lock = threading.Lock()
+
+
+def create_exporter(kind: str = INSTRUMENTATION) -> Exporter | None:
+    """
+    Create the configured exporter
+
+    Args:
+        kind (str): 'none', 'log', 'otel' or 'memory'
+
+    Returns:
+        Exporter | None: Exporter, or None if instrumentation is off
+    """
+    kind = (kind or 'none').strip().lower()
+    if kind == 'none':
+        return None
+    if kind == 'memory':
+        return MemoryExporter()
+    if kind == 'otel':
+        try:
+            configure_azure_monitor()
+            return OtelExporter()
+        except ImportError:
+            logging.warning("INSTRUMENTATION is 'otel' but azure-monitor-opentelemetry isn't installed, using 'log'")
+            return LogExporter()
+    if kind != 'log':
+        logging.warning(f"Unknown INSTRUMENTATION '{kind}', using 'log'")
+    return LogExporter()
+
+
+def get_exporter() -> Exporter | None:
+    """
+    Get the process-wide exporter, creating it on first use
+
+    Returns:
+        Exporter | None: Exporter, or None if instrumentation is off
+    """
+    global _exporter, _configured
+    if not _configured:
+        with _lock:
+            if not _configured:
+                _exporter = create_exporter()
+                _configured = True
+    return _exporter
+
+
+def set_exporter(exporter: Exporter | None) -> None:
+    """
+    Replace the process-wide exporter (e.g. with a MemoryExporter in tests), or turn instrumentation off with None
+
+    Args:
+        exporter (Exporter | None): Exporter
+    """
+    global _exporter, _configured
+    with _lock:
+        _exporter = exporter
+        _configured = True
+
+
+@contextmanager
+def span(stage: str, **attributes: Any) -> Iterator[Span]:
+    """
+    Time a stage; exceptions propagate and are recorded with the outcome 'error'
+
+    Args:
+        stage (str): Stage name, e.g. 'errors.read'
+        **attributes (Any): Dimensions, e.g. type='RequestHandler'
+
+    Yields:
+        Span: Span to count rows and bytes on
+    """
+    exporter: Exporter | None = get_exporter()
+    if exporter is None:
+        yield NOOP_SPAN
+        return
+
+    current: Span = Span(stage, attributes)
+    start: float = time.perf_counter()
+    try:
+        yield current
+    except BaseException:
+        current.outcome = 'error'
+        raise
+    finally:
+        try:
+            exporter.export(current.record((time.perf_counter() - start) * 1000))
+        except Exception as e:  # Metrics never break a report
+            logging.warning(f"Failed to export {stage} metrics: {e}")
+
+
+def instrumented(
+        stage: str,
+        rows: Callable[[Any], int] | None = None,
+        nbytes: Callable[[Any], int] | None = None,
+        ok: Callable[[Any], bool] | None = None
+) -> Callable:
+    """
+    Decorator that runs a function in a span, measuring its result
+
+    Args:
+        stage (str): Stage name
+        rows (Callable[[Any], int] | None): Rows in the result
+        nbytes (Callable[[Any], int] | None): Bytes in the result
+        ok (Callable[[Any], bool] | None): Whether the result is a success; the outcome is 'failed' if not
+
+    Returns:
+        Callable: Decorator
+    """
+    def decorator(function: Callable) -> Callable:
+        @wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(stage) as current:
+                result: Any = function(*args, **kwargs)
+                if current is not NOOP_SPAN:
+                    current.add(rows(result) if rows else 0, nbytes(result) if nbytes else 0)
+                    if ok is not None and not ok(result):
+                        current.fail()
+                return result
+        return wrapper
+    return decorator
+
+
+def counted(chunks: Iterator[bytes], current: Span) -> Iterator[bytes]:
+    """
+    Pass chunks through, counting their bytes on a span
+
+    Args:
+        chunks (Iterator[bytes]): Chunks
+        current (Span): Span
+
+    Yields:
+        bytes: The same chunks
+    """
+    for chunk in chunks:
+        current.add(nbytes=len(chunk))
+        yield chunk
+
+
+async def acounted(chunks: AsyncIterator[bytes], current: Span) -> AsyncIterator[bytes]:
+    """
+    Pass async chunks through, counting their bytes on a span
+
+    Args:
+        chunks (AsyncIterator[bytes]): Chunks
+        current (Span): Span
+
+    Yields:
+        bytes: The same chunks
+    """
+    async for chunk in chunks:
+        current.add(nbytes=len(chunk))
+        yield chunk
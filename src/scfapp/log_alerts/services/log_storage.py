@@ -0,0 +1,327 @@
+""" Where the handler error logs live: the Azure File Share, or a local directory tree for replays and benchmarks """
+from __future__ import annotations
+
+import logging
+import mmap
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Iterator, TYPE_CHECKING
+
+from src.scfapp.log_alerts.config import ERRORS_STORAGE_BACKEND, ERRORS_STORAGE_PATH
+from src.scfapp.log_alerts.services.clients import get_share_directory_client, get_share_file_client
+
+if TYPE_CHECKING:  # Storage SDK is imported when the file share backend is first used
+    from azure.storage.fileshare import ShareDirectoryClient, ShareFileClient
+
+CHUNK_SIZE: int = 4 * 1024 * 1024  # Bytes per chunk from open_stream
+MMAP_THRESHOLD: int = 1024 * 1024  # Local files at least this large are memory-mapped
+RANGE_LIMIT: int = 4 * 1024 * 1024  # Largest range a single upload_range call accepts
+
+
+class LogNotFoundError(Exception):
+    """ A log (or directory) doesn't exist """
+
+
+class LogStorage(ABC):
+    """ Base class for a tree of log files addressed by '/'-separated paths (e.g. 'logs/OLD/x.csv') """
+    @abstractmethod
+    def list(self, directory: str) -> list[dict]:
+        """
+        List a directory
+
+        Args:
+            directory (str): Directory path
+
+        Returns:
+            list[dict]: One {'name', 'is_directory', 'size'} per entry
+
+        Raises:
+            LogNotFoundError: The directory doesn't exist
+        """
+
+    @abstractmethod
+    def open_stream(self, path: str) -> Iterator[bytes]:
+        """
+        Open a file as a stream of byte chunks
+
+        Args:
+            path (str): File path
+
+        Returns:
+            Iterator[bytes]: Chunks, in order
+
+        Raises:
+            LogNotFoundError: The file doesn't exist
+        """
+
+    @abstractmethod
+    def read_range(self, path: str, offset: int, length: int) -> bytes:
+        """
+        Read part of a file
+
+        Args:
+            path (str): File path
+            offset (int): First byte
+            length (int): Number of bytes
+
+        Returns:
+            bytes: Bytes read (fewer past the end of the file)
+
+        Raises:
+            LogNotFoundError: The file doesn't exist
+        """
+
+    @abstractmethod
+    def move(self, source: str, destination: str) -> None:
+        """
+        Move a file atomically, replacing any file at the destination
+
+        Args:
+            source (str): Current path
+            destination (str): New path; its directory must exist
+
+        Raises:
+            LogNotFoundError: The source doesn't exist
+        """
+
+    @abstractmethod
+    def write(self, path: str, data: bytes) -> None:
+        """
+        Create or replace a file
+
+        Args:
+            path (str): File path; its directory must exist
+            data (bytes): File contents
+        """
+
+    @abstractmethod
+    def write_at(self, path: str, offset: int, data: bytes) -> None:
+        """
+        Write data at an offset, replacing everything from there to the end of the file (creating it if needed)
+
+        Args:
+            path (str): File path; its directory must exist
+            offset (int): First byte, at most the file's size
+            data (bytes): Bytes to write
+        """
+
+    @abstractmethod
+    def delete(self, path: str) -> None:
+        """
+        Delete a file
+
+        Args:
+            path (str): File path
+
+        Raises:
+            LogNotFoundError: The file doesn't exist
+        """
+
+    @abstractmethod
+    def make_directory(self, directory: str) -> None:
+        """
+        Create a directory if it doesn't exist
+
+        Args:
+            directory (str): Directory path; its parent must exist
+        """
+
+
+class FileShareLogStorage(LogStorage):
+    """ Logs on the Azure File Share, through the shared client registry """
+    def list(self, directory: str) -> list[dict]:
+        from azure.core.exceptions import ResourceNotFoundError
+
+        directory_client: ShareDirectoryClient = get_share_directory_client(directory)
+        try:
+            return [
+                {'name': item['name'], 'is_directory': item['is_directory'], 'size': item.get('size') or 0}
+                for item in directory_client.list_directories_and_files()
+            ]
+        except ResourceNotFoundError as e:
+            raise LogNotFoundError(directory) from e
+
+    def open_stream(self, path: str) -> Iterator[bytes]:
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            return get_share_file_client(path).download_file().chunks()  # Download starts here
+        except ResourceNotFoundError as e:
+            raise LogNotFoundError(path) from e
+
+    def read_range(self, path: str, offset: int, length: int) -> bytes:
+        from azure.core.exceptions import HttpResponseError, ResourceNotFoundError
+
+        try:
+            return get_share_file_client(path).download_file(offset=offset, length=length).readall()
+        except ResourceNotFoundError as e:
+            raise LogNotFoundError(path) from e
+        except HttpResponseError as e:
+            if e.status_code == 416:  # Range starts past the end of the file
+                return b''
+            raise
+
+    def move(self, source: str, destination: str) -> None:
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            get_share_file_client(source).rename_file(new_name=destination, overwrite=True)  # Server-side, atomic
+        except ResourceNotFoundError as e:
+            raise LogNotFoundError(source) from e
+
+    def write(self, path: str, data: bytes) -> None:
+        get_share_file_client(path).upload_file(data)
+
+    def write_at(self, path: str, offset: int, data: bytes) -> None:
+        from azure.core.exceptions import ResourceNotFoundError
+
+        file_client: ShareFileClient = get_share_file_client(path)
+        size: int = offset + len(data)
+        try:
+            file_client.resize_file(size)  # Drops anything past the new data
+        except ResourceNotFoundError:
+            file_client.create_file(size)
+
+        for start in range(0, len(data), RANGE_LIMIT):
+            part: bytes = data[start:start + RANGE_LIMIT]
+            file_client.upload_range(part, offset=offset + start, length=len(part))
+
+    def delete(self, path: str) -> None:
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            get_share_file_client(path).delete_file()
+        except ResourceNotFoundError as e:
+            raise LogNotFoundError(path) from e
+
+    def make_directory(self, directory: str) -> None:
+        from azure.core.exceptions import ResourceExistsError
+
+        try:
+            get_share_directory_client(directory).create_directory()
+        except ResourceExistsError:
+            pass
+
+
+class LocalLogStorage(LogStorage):
+    """ Logs in a local directory tree; large files are read through a memory map instead of buffered reads """
+    def __init__(self, root: str):
+        self.root: str = root
+
+    def local_path(self, path: str) -> str:
+        """
+        Local path for a storage path
+
+        Args:
+            path (str): Storage path
+
+        Returns:
+            str: Path under the root
+        """
+        return os.path.join(self.root, *path.strip('/').split('/'))
+
+    def list(self, directory: str) -> list[dict]:
+        try:
+            with os.scandir(self.local_path(directory)) as entries:
+                return [
+                    {
+                        'name': entry.name,
+                        'is_directory': entry.is_dir(),
+                        'size': 0 if entry.is_dir() else entry.stat().st_size
+                    }
+                    for entry in entries
+                ]
+        except FileNotFoundError as e:
+            raise LogNotFoundError(directory) from e
+
+    def open_stream(self, path: str) -> Iterator[bytes]:
+        try:
+            f = open(self.local_path(path), 'rb')  # Opened now, so a missing file fails here
+        except FileNotFoundError as e:
+            raise LogNotFoundError(path) from e
+        return self.chunks(f)
+
+    def chunks(self, f) -> Iterator[bytes]:
+        """
+        Read an open file in chunks, memory-mapping it if it's large, and close it
+
+        Args:
+            f: Binary file
+
+        Yields:
+            bytes: Chunks
+        """
+        with f:
+            size: int = os.fstat(f.fileno()).st_size
+            if size < MMAP_THRESHOLD:
+                data: bytes = f.read()
+                if data:
+                    yield data
+                return
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for start in range(0, size, CHUNK_SIZE):
+                    yield mapped[start:start + CHUNK_SIZE]  # Copied straight from the page cache
+
+    def read_range(self, path: str, offset: int, length: int) -> bytes:
+        try:
+            with open(self.local_path(path), 'rb') as f:
+                f.seek(offset)
+                return f.read(length)
+        except FileNotFoundError as e:
+            raise LogNotFoundError(path) from e
+
+    def move(self, source: str, destination: str) -> None:
+        try:
+            os.replace(self.local_path(source), self.local_path(destination))  # Atomic within a filesystem
+        except FileNotFoundError as e:
+            if os.path.exists(self.local_path(source)):  # Destination directory is missing
+                raise
+            raise LogNotFoundError(source) from e
+
+    def write(self, path: str, data: bytes) -> None:
+        local_path: str = self.local_path(path)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(local_path), prefix='.tmp.')  # Beside the target
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, local_path)  # Atomic rename
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def write_at(self, path: str, offset: int, data: bytes) -> None:
+        local_path: str = self.local_path(path)
+        with open(local_path, 'r+b' if os.path.exists(local_path) else 'wb') as f:
+            f.seek(offset)
+            f.write(data)
+            f.truncate()  # Drops anything past the new data
+
+    def delete(self, path: str) -> None:
+        try:
+            os.remove(self.local_path(path))
+        except FileNotFoundError as e:
+            raise LogNotFoundError(path) from e
+
+    def make_directory(self, directory: str) -> None:
+        os.makedirs(self.local_path(directory), exist_ok=True)
+
+
+def create_log_storage(kind: str = ERRORS_STORAGE_BACKEND, root: str = ERRORS_STORAGE_PATH) -> LogStorage:
+    """
+    Create the configured log storage backend
+
+    Args:
+        kind (str): 'share' or 'local'
+        root (str): Local directory that log paths are relative to (local backend only)
+
+    Returns:
+        LogStorage: Log storage
+    """
+    kind = (kind or 'share').strip().lower()
+    if kind == 'local':
+        return LocalLogStorage(root)
+    if kind != 'share':
+        logging.warning(f"Unknown ERRORS_STORAGE_BACKEND '{kind}', using the file share")
+    return FileShareLogStorage()
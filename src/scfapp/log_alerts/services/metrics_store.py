@@ -0,0 +1,179 @@
+""" Rolling daily counts per request type and error type, for trends in the reports """
+import logging
+import re
+import struct
+import sys
+from array import array
+from datetime import date, timedelta
+
+from src.scfapp.log_alerts.services.state_store import StateStore
+
+HEADER: struct.Struct = struct.Struct('<4sI')  # Magic, day ordinal of the first slot
+MAGIC: bytes = b'MTRC'
+SLOT: int = 4  # Bytes per day
+BACKFILL_DAYS: int = 366  # Days before the first record a new series can still hold
+
+
+class MetricsStore:
+    """
+    One file per series: a header followed by a fixed-width uint32 slot per day
+
+    A slot holds count + 1, so a zero slot (never written, or zero-filled when the file was extended) means no data
+    for that day, while a recorded count of 0 means the day ran and had none. A day's slot is at a fixed offset, so
+    recording a day or reading the last N days is a single range write or read however long the history is.
+    """
+    def __init__(self, store: StateStore):
+        self.store: StateStore = store
+        self.bases: dict[str, int] = {}  # Day ordinal of each series' first slot
+
+    def series_name(self, series: str) -> str:
+        """
+        State file name for a series
+
+        Args:
+            series (str): Series name, e.g. 'requests/Physical Item'
+
+        Returns:
+            str: File name
+        """
+        return f"metrics_{re.sub(r'[^A-Za-z0-9]+', '_', series).strip('_')}.bin"
+
+    def base(self, series: str, create_for: date | None = None) -> int | None:
+        """
+        Get a series' first slot day, creating the series if asked
+
+        Args:
+            series (str): Series name
+            create_for (date | None): First day being recorded, if the series should be created
+
+        Returns:
+            int | None: Day ordinal, or None if the series doesn't exist
+        """
+        if series in self.bases:
+            return self.bases[series]
+
+        name: str = self.series_name(series)
+        header: bytes | None = self.store.read_range(name, 0, HEADER.size)
+        if header and len(header) == HEADER.size:
+            magic, base = HEADER.unpack(header)
+            if magic == MAGIC:
+                self.bases[series] = base
+                return base
+            logging.warning(f"Replacing unreadable metrics series {name}")
+
+        if create_for is None:
+            return None
+
+        base = create_for.toordinal() - BACKFILL_DAYS
+        self.store.write(name, HEADER.pack(MAGIC, base))
+        self.bases[series] = base
+        return base
+
+    def record(self, series: str, day: date, count: int, overwrite: bool = True) -> None:
+        """
+        Record (or overwrite) a day's count
+
+        Args:
+            series (str): Series name
+            day (date): Day
+            count (int): Count
+            overwrite (bool): Replace a count already recorded for the day; if False, only fill an empty slot
+        """
+        base: int = self.base(series, create_for=day)
+        if day.toordinal() < base:
+            logging.warning(f"Not recording {series} for {day}: before the start of the series")
+            return
+
+        name: str = self.series_name(series)
+        offset: int = HEADER.size + (day.toordinal() - base) * SLOT
+        if not overwrite and (self.store.read_range(name, offset, SLOT) or bytes(SLOT)) != bytes(SLOT):
+            return  # Already recorded
+
+        self.store.write_range(name, offset, struct.pack('<I', count + 1))
+
+    def history(self, series: str, end: date, days: int) -> list[int | None]:
+        """
+        Read the counts for the days up to and including end
+
+        Args:
+            series (str): Series name
+            end (date): Last day
+            days (int): Number of days
+
+        Returns:
+            list[int | None]: Counts, oldest first; None for days without data
+        """
+        counts: list[int | None] = [None] * days
+        base: int | None = self.base(series)
+        if base is None:
+            return counts
+
+        first: int = max(end.toordinal() - days + 1, base)  # First day with a slot
+        if first > end.toordinal():
+            return counts
+
+        data: bytes = self.store.read_range(
+            self.series_name(series), HEADER.size + (first - base) * SLOT, (end.toordinal() - first + 1) * SLOT
+        ) or b''
+        slots: array = array('I')
+        slots.frombytes(data[:len(data) - len(data) % SLOT])
+        if sys.byteorder == 'big':  # Stored little-endian
+            slots.byteswap()
+
+        skipped: int = first - (end.toordinal() - days + 1)  # Days before the series started
+        for i, slot in enumerate(slots):
+            if slot:
+                counts[skipped + i] = slot - 1
+        return counts
+
+    def trend(self, series: str, day: date) -> dict:
+        """
+        7- and 30-day averages of the days before a day
+
+        Args:
+            series (str): Series name
+            day (date): Day being reported (not included in the averages)
+
+        Returns:
+            dict: 'avg_7' and 'avg_30' (None without data)
+        """
+        history: list[int | None] = self.history(series, day - timedelta(days=1), 30)
+        return {'avg_7': _average(history[-7:]), 'avg_30': _average(history)}
+
+
+def _average(counts: list[int | None]) -> float | None:
+    """
+    Average of the days with data
+
+    Args:
+        counts (list[int | None]): Counts
+
+    Returns:
+        float | None: Average, or None if no day has data
+    """
+    known: list[int] = [count for count in counts if count is not None]
+    return sum(known) / len(known) if known else None
+
+
+def format_trend(count: int, trend: dict) -> str:
+    """
+    Describe a count against its averages, e.g. '7-day avg 12.3 (+22%), 30-day avg 10.1 (+49%)'
+
+    Args:
+        count (int): Count being reported
+        trend (dict): MetricsStore.trend result
+
+    Returns:
+        str: Description, or '' without history
+    """
+    parts: list[str] = []
+    for label, key in (('7-day', 'avg_7'), ('30-day', 'avg_30')):
+        average: float | None = trend.get(key)
+        if average is None:
+            continue
+        if average:
+            delta: str = f"{(count - average) / average:+.0%}"
+        else:
+            delta = "up from 0" if count else "no change"
+        parts.append(f"{label} avg {average:.1f} ({delta})")
+    return ', '.join(parts)
@@ -0,0 +1,261 @@
+""" Persistent cache for Application Insights (Log Analytics) query results """
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, TYPE_CHECKING
+
+from src.scfapp.log_alerts.config import QUERY_CACHE_TTL_MINUTES, QUERY_CACHE_MAX_MB, REQUESTS_INGEST_LAG_MINUTES
+from src.scfapp.log_alerts.services.state_store import StateStore
+
+if TYPE_CHECKING:  # Query SDK is imported when a query is first run
+    from azure.monitor.query import LogsQueryClient, LogsQueryResult, LogsQueryPartialResult
+
+INDEX_NAME: str = "querycache_index.json"  # Entry sizes and ages, for eviction
+
+
+class CachedLogsTable:
+    """ Result table restored from the cache, with the same attributes the services read from LogsTable """
+    def __init__(self, name: str, columns: list[str], columns_types: list[str], rows: list[list[Any]]):
+        self.name: str = name
+        self.columns: list[str] = columns
+        self.columns_types: list[str] = columns_types
+        self.rows: list[list[Any]] = rows
+
+
+class CachedLogsQueryResult:
+    """ Successful query result restored from the cache """
+    def __init__(self, tables: list[CachedLogsTable]):
+        from azure.monitor.query import LogsQueryStatus
+
+        self.tables: list[CachedLogsTable] = tables
+        self.status: LogsQueryStatus = LogsQueryStatus.SUCCESS
+        self.statistics: dict | None = None
+        self.visualization: dict | None = None
+
+
+class QueryCache:
+    """
+    Stores successful query results as gzip'd JSON, keyed by (query text, timespan, resource id)
+
+    Entries for windows that had already closed when they were stored (ended more than REQUESTS_INGEST_LAG_MINUTES
+    earlier) can't change and are always served. Other entries expire after the TTL. When the cache grows past its
+    size limit the oldest entries are evicted.
+    """
+    def __init__(
+            self,
+            store: StateStore,
+            ttl: timedelta = timedelta(minutes=QUERY_CACHE_TTL_MINUTES),
+            max_bytes: int = QUERY_CACHE_MAX_MB * 1024 * 1024
+    ):
+        self.store: StateStore = store
+        self.ttl: timedelta = ttl
+        self.max_bytes: int = max_bytes
+        self.hits: int = 0
+        self.misses: int = 0
+        self.lock: threading.Lock = threading.Lock()  # Guards the index and counters
+        self.index: dict[str, dict] | None = None  # Loaded on first use
+
+    def get(self, resource_id: str, query: str, timespan: tuple[datetime, datetime]) -> CachedLogsQueryResult | None:
+        """
+        Look up a query result
+
+        Args:
+            resource_id (str): Application Insights resource ID
+            query (str): KQL query
+            timespan (tuple[datetime, datetime]): Query time span
+
+        Returns:
+            CachedLogsQueryResult | None: Cached result, or None on a miss
+        """
+        key: str = self.key(resource_id, query, timespan)
+        entry: dict | None = None
+
+        try:
+            data: bytes | None = self.store.read(self.entry_name(key))
+            if data is not None:
+                entry = json.loads(gzip.decompress(data), object_hook=_decode_value)
+        except Exception as e:  # A corrupt entry is just a miss
+            logging.warning(f"Ignoring unreadable query cache entry {key}: {e}")
+
+        if entry is not None and not entry['closed'] and time.time() - entry['stored_at'] > self.ttl.total_seconds():
+            entry = None  # Expired
+
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return CachedLogsQueryResult([CachedLogsTable(**table) for table in entry['tables']])
+
+    def put(self, resource_id: str, query: str, timespan: tuple[datetime, datetime], tables: list) -> None:
+        """
+        Store a successful query result and evict old entries if the cache is over its size limit
+
+        Args:
+            resource_id (str): Application Insights resource ID
+            query (str): KQL query
+            timespan (tuple[datetime, datetime]): Query time span
+            tables (list): Result tables (LogsTable)
+        """
+        key: str = self.key(resource_id, query, timespan)
+        closed_before: datetime = datetime.now(timezone.utc) - timedelta(minutes=REQUESTS_INGEST_LAG_MINUTES)
+        entry: dict = {
+            'stored_at': time.time(),
+            'closed': timespan[1] <= closed_before,  # Historical window, never expires
+            'tables': [
+                {
+                    'name': table.name,
+                    'columns': list(table.columns),
+                    'columns_types': [str(column_type) for column_type in table.columns_types],
+                    'rows': [list(row) for row in table.rows]
+                }
+                for table in tables
+            ]
+        }
+        data: bytes = gzip.compress(json.dumps(entry, default=_encode_value, separators=(',', ':')).encode())
+
+        try:
+            self.store.write(self.entry_name(key), data)
+            with self.lock:
+                index: dict[str, dict] = self.load_index()
+                index[key] = {'size': len(data), 'stored_at': entry['stored_at']}
+                self.evict(index)
+                self.store.write(INDEX_NAME, json.dumps(index).encode())
+        except Exception as e:  # Caching is best-effort
+            logging.warning(f"Failed to store query cache entry {key}: {e}")
+
+    def load_index(self) -> dict[str, dict]:
+        """
+        Load the entry index (caller holds the lock)
+
+        Returns:
+            dict[str, dict]: {key: {'size', 'stored_at'}}
+        """
+        if self.index is None:
+            data: bytes | None = self.store.read(INDEX_NAME)
+            self.index = json.loads(data) if data else {}
+        return self.index
+
+    def evict(self, index: dict[str, dict]) -> None:
+        """
+        Delete the oldest entries until the cache fits its size limit (caller holds the lock)
+
+        Args:
+            index (dict[str, dict]): Entry index, updated in place
+        """
+        total: int = sum(item['size'] for item in index.values())
+        for key in sorted(index, key=lambda k: index[k]['stored_at']):
+            if total <= self.max_bytes:
+                break
+            total -= index.pop(key)['size']
+            self.store.delete(self.entry_name(key))
+            logging.info(f"Evicted query cache entry {key}")
+
+    def log_stats(self) -> None:
+        """ Log hit and miss counts """
+        logging.info(f"Query cache: {self.hits} hits, {self.misses} misses")
+
+    def key(self, resource_id: str, query: str, timespan: tuple[datetime, datetime]) -> str:
+        """
+        Cache key for a query
+
+        Args:
+            resource_id (str): Application Insights resource ID
+            query (str): KQL query
+            timespan (tuple[datetime, datetime]): Query time span
+
+        Returns:
+            str: Hex digest
+        """
+        start, end = (value.astimezone(timezone.utc).isoformat() for value in timespan)
+        return hashlib.sha256(json.dumps([query, start, end, resource_id]).encode()).hexdigest()[:32]
+
+    def entry_name(self, key: str) -> str:
+        """
+        State file name for a cache entry
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            str: File name
+        """
+        return f"querycache_{key}.json.gz"
+
+
+class CachingLogsQueryClient:
+    """ Wraps LogsQueryClient.query_resource with a QueryCache; only complete results are cached """
+    def __init__(self, client: LogsQueryClient, cache: QueryCache):
+        self.client: LogsQueryClient = client
+        self.cache: QueryCache = cache
+
+    def query_resource(
+            self, resource_id: str, query: str, *, timespan: tuple[datetime, datetime], **kwargs: Any
+    ) -> LogsQueryResult | LogsQueryPartialResult | CachedLogsQueryResult:
+        """
+        Serve a query from the cache, or run it and cache a successful result
+
+        Args:
+            resource_id (str): Application Insights resource ID
+            query (str): KQL query
+            timespan (tuple[datetime, datetime]): Query time span
+            **kwargs: Passed through to LogsQueryClient.query_resource
+
+        Returns:
+            LogsQueryResult | LogsQueryPartialResult | CachedLogsQueryResult: Query result
+        """
+        from azure.monitor.query import LogsQueryStatus
+
+        cached: CachedLogsQueryResult | None = self.cache.get(resource_id, query, timespan)
+        if cached is not None:
+            return cached
+
+        response: LogsQueryResult | LogsQueryPartialResult = self.client.query_resource(
+            resource_id, query, timespan=timespan, **kwargs
+        )
+        if response.status == LogsQueryStatus.SUCCESS:
+            self.cache.put(resource_id, query, timespan, response.tables)
+
+        return response
+
+
+def _encode_value(value: Any) -> Any:
+    """
+    JSON encoder for values json can't serialize natively
+
+    Args:
+        value (Any): Cell value
+
+    Returns:
+        Any: JSON-serializable value
+    """
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, timedelta):
+        return {'$td': value.total_seconds()}
+    return str(value)
+
+
+def _decode_value(obj: dict) -> Any:
+    """
+    JSON object hook restoring values encoded by _encode_value
+
+    Args:
+        obj (dict): Decoded JSON object
+
+    Returns:
+        Any: Restored value
+    """
+    if len(obj) == 1:
+        if '$dt' in obj:
+            return datetime.fromisoformat(obj['$dt'])
+        if '$td' in obj:
+            return timedelta(seconds=obj['$td'])
+    return obj
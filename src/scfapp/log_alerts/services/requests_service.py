@@ -1,19 +1,33 @@
 """ Service for parsing request data """
-from datetime import timedelta, datetime, timezone
+from __future__ import annotations
+
+from datetime import date, timedelta, datetime, timezone
+import json
 import logging
+from typing import Callable, TYPE_CHECKING
 from zoneinfo import ZoneInfo
 
-from azure.core.exceptions import HttpResponseError
-from azure.identity import DefaultAzureCredential
-from azure.monitor.query import (
-    LogsQueryClient, LogsQueryStatus, LogsQueryResult, LogsQueryPartialResult, LogsTable, LogsQueryError
-)
-from pandas import DataFrame
-
 from src.scfapp.log_alerts.config import (
-    LOGS_RESOURCE_ID, REQUEST_TYPES, REQUESTS_TO_EMAIL_STR, REQUESTS_CC_EMAIL_BASE_STR
+    LOGS_RESOURCE_ID, REQUEST_TYPES, REQUESTS_TO_EMAIL_STR, REQUESTS_CC_EMAIL_BASE_STR, REQUESTS_BATCHED_QUERY,
+    REQUESTS_SUMMARIZED_QUERY, REQUESTS_SLICED_QUERY, REQUESTS_INCREMENTAL, REQUESTS_INGEST_LAG_MINUTES, QUERY_CACHE,
+    STATE_PATH, METRICS_TRENDS, ANOMALY_DETECTION
 )
+from src.scfapp.log_alerts.services.clients import get_logs_query_client
+from src.scfapp.log_alerts.services.anomaly_detector import AnomalyDetector, describe_anomaly, send_anomaly_alert
 from src.scfapp.log_alerts.services.email_service import EmailService
+from src.scfapp.log_alerts.services.instrumentation import instrumented, span
+from src.scfapp.log_alerts.services.metrics_store import MetricsStore, format_trend
+from src.scfapp.log_alerts.services.query_cache import (
+    CachedLogsQueryResult, CachedLogsTable, CachingLogsQueryClient, QueryCache
+)
+from src.scfapp.log_alerts.services.sliced_query import SlicedQueryExecutor, SlicedQueryPartialResult
+from src.scfapp.log_alerts.services.state_store import StateStore, create_state_store
+
+if TYPE_CHECKING:  # Query SDK and pandas are imported when a method first needs them
+    from azure.monitor.query import (
+        LogsQueryClient, LogsQueryResult, LogsQueryPartialResult, LogsTable, LogsQueryError
+    )
+    from pandas import DataFrame
 
 
 # noinspection PyMethodMayBeStatic
@@ -21,74 +35,620 @@ class RequestsService:
     """ Service for parsing request data """
     def __init__(self):
         self.request_types: list[dict] = REQUEST_TYPES
+        self.incomplete: bool = False  # A query only returned partial data, so counts may be low
 
-    def get_requests(self) -> DataFrame | None:
+    def get_requests(self) -> list[dict] | None:
         """
         Get the previous day's requests
 
+        """
+        query_timespan: tuple[datetime, datetime] = self.get_query_timespan()  # Yesterday time span
+
+        client: LogsQueryClient = self.create_query_client()  # Application Insights query client
+
+        if REQUESTS_INCREMENTAL:  # Ingest since the last watermark and report the running tally
+            scfapp_requests: list[dict] = self.get_requests_incremental(client, query_timespan, create_state_store())
+        elif REQUESTS_SUMMARIZED_QUERY:  # Server-side ID extraction and counts
+            scfapp_requests = self.get_requests_summarized(client, query_timespan)
+        elif REQUESTS_BATCHED_QUERY:  # Single round-trip for all request types
+            scfapp_requests = self.get_requests_batched(client, query_timespan)
+        else:  # One query per request type
+            scfapp_requests = self.get_requests_per_type(client, query_timespan)
+
+        if isinstance(client, CachingLogsQueryClient):
+            client.cache.log_stats()  # Hit and miss counts
+
+        if not scfapp_requests:  # If no request data found
+            logging.info("No request data found in the specified timespan.")  # Log message
+            return None
+
+        return scfapp_requests  # Return request data
+
+    def create_query_client(self) -> LogsQueryClient | CachingLogsQueryClient:
+        """
+        Create the Application Insights query client, wrapped in the persistent result cache if QUERY_CACHE is set
+
+        Returns:
+            LogsQueryClient | CachingLogsQueryClient: Query client
+        """
+        client: LogsQueryClient = get_logs_query_client()  # Shared Application Insights query client
+
+        if QUERY_CACHE:  # Serve repeated and historical queries from the cache
+            return CachingLogsQueryClient(client, QueryCache(create_state_store(path=f"{STATE_PATH}/query-cache")))
+
+        return client
+
+    def get_query_timespan(self) -> tuple[datetime, datetime]:
+        """
+        Get the midnight-to-midnight New York time span for yesterday
+
+        Returns:
+            tuple[datetime, datetime]: Start and end of yesterday
         """
         ny_timezone: ZoneInfo = ZoneInfo('America/New_York')  # New York timezone
         today_start_ny: datetime = datetime.now(ny_timezone).replace(hour=0, minute=0, second=0, microsecond=0)  # Today
         yesterday_start_ny: datetime = today_start_ny - timedelta(days=1)  # Yesterday
-        query_timespan: tuple[datetime, datetime] = (yesterday_start_ny, today_start_ny)  # Yesterday time span
 
-        scfapp_requests: list[dict] = []  # List to store request data
+        return yesterday_start_ny, today_start_ny
+
+    def ingest_recent_requests(self) -> None:
+        """
+        Ingest requests since the last watermark for yesterday (if still open) and today
 
-        credential: DefaultAzureCredential = DefaultAzureCredential()  # Azure credential
-        # noinspection PyTypeChecker
-        client: LogsQueryClient = LogsQueryClient(credential)  # Application Insights query client
+        Intended for a polling schedule: each run only queries the delta since the previous successful run.
+        """
+        yesterday_start, today_start = self.get_query_timespan()  # Day boundaries
+        store: StateStore = create_state_store()  # Watermark store
 
-        for rtype in self.request_types:  # Iterate through each request type
-            try:
-                query: str = f"traces | where message has '{rtype['query_string']}'"  # Set query
+        client: LogsQueryClient = self.create_query_client()  # Application Insights query client
 
+        self.ingest_requests(client, store, yesterday_start, today_start)  # Finish yesterday
+        self.ingest_requests(client, store, today_start, today_start + timedelta(days=1))  # Today so far
+
+    def get_requests_incremental(
+            self, client: LogsQueryClient, query_timespan: tuple[datetime, datetime], store: StateStore
+    ) -> list[dict]:
+        """
+        Bring the day's running tally up to date and return it as per-type summaries
+
+        Args:
+            client (LogsQueryClient): Application Insights query client
+            query_timespan (tuple[datetime, datetime]): Day to report on
+            store (StateStore): Watermark store
+
+        Returns:
+            list[dict]: A list of dictionaries, each containing a request type and its (ID, count) pairs
+        """
+        day_start, day_end = query_timespan
+        tally: dict | None = self.ingest_requests(client, store, day_start, day_end)  # Query only the delta
+        if tally is None:  # Query failed; the watermark wasn't advanced
+            return []
+
+        watermarks: list[datetime] = [
+            datetime.fromisoformat(tally['types'][rtype['type']]['watermark']) for rtype in self.request_types
+        ]
+        if any(watermark < day_end for watermark in watermarks):
+            logging.warning(f"Request tally for {tally['day']} is not complete yet; reporting it so far")
+
+        return [
+            {'type': rtype['type'], 'ids': [tuple(pair) for pair in tally['types'][rtype['type']]['ids']]}
+            for rtype in self.request_types
+        ]
+
+    def ingest_requests(
+            self, client: LogsQueryClient, store: StateStore, day_start: datetime, day_end: datetime
+    ) -> dict | None:
+        """
+        Query requests since each type's watermark and add them to the day's running tally
+
+        The window for each type runs from its watermark (or the start of the day) to the earlier of the end of the
+        day and now minus REQUESTS_INGEST_LAG_MINUTES, as a half-open interval so consecutive windows never overlap.
+        The tally and watermarks are saved together only after a complete, successful query, so a failed or retried
+        run never double-counts.
+
+        Args:
+            client (LogsQueryClient): Application Insights query client
+            store (StateStore): Watermark store
+            day_start (datetime): Start of the day
+            day_end (datetime): End of the day
+
+        Returns:
+            dict | None: The day's tally, or None if the query failed
+        """
+        from azure.core.exceptions import HttpResponseError
+        from azure.monitor.query import LogsQueryStatus
+
+        tally: dict = self.load_tally(store, day_start)  # Running tally and watermarks
+        window_end: datetime = min(
+            day_end, datetime.now(day_start.tzinfo) - timedelta(minutes=REQUESTS_INGEST_LAG_MINUTES)
+        )  # Leave time for late-arriving traces
+
+        starts: dict[str, datetime] = {  # Each type's window start
+            rtype['type']: max(day_start, datetime.fromisoformat(tally['types'][rtype['type']]['watermark']))
+            for rtype in self.request_types
+        }
+        if all(start >= window_end for start in starts.values()):  # Nothing new to ingest
+            return tally
+
+        since: str = ", ".join(
+            f"request_type == {self.kql_string(req_type)}, {self.kql_datetime(start)}"
+            for req_type, start in starts.items()
+        )
+        query: str = self.build_summarized_query([  # Per-type half-open windows
+            f"| where timestamp >= case({since}, {self.kql_datetime(day_start)})",
+            f"| where timestamp < {self.kql_datetime(window_end)}"
+        ])
+
+        with span('requests.query', mode='incremental') as stage:
+            try:
                 response: LogsQueryResult | LogsQueryPartialResult = client.query_resource(
                     # Query Application Insights
                     LOGS_RESOURCE_ID,
                     query,
-                    timespan=query_timespan
+                    timespan=(min(starts.values()), window_end)
                 )
+            except HttpResponseError as e:  # Handle HTTP errors
+                logging.error(f"HTTP error while ingesting requests for {tally['day']}: {e}")
+                stage.fail()
+                return None
+            except Exception as e:  # Handle other errors
+                logging.error(f"An unexpected error occurred while ingesting requests for {tally['day']}: {e}",
+                              exc_info=True)
+                stage.fail()
+                return None
+
+            if response.status != LogsQueryStatus.SUCCESS:  # Don't advance watermarks past incomplete data
+                logging.error(f"Request ingestion for {tally['day']} failed with error: {response.partial_error}")
+                stage.fail()
+                return None
+
+            table: LogsTable | None = response.tables[0] if response.tables else None
+            stage.add(rows=len(table.rows) if table else 0)
+
+        for summary in self.summaries_from_rows(table.columns if table else [], table.rows if table else []):
+            type_tally: dict = tally['types'][summary['type']]
+            if starts[summary['type']] >= window_end:  # Already ingested this window
+                continue
+
+            counts: dict[str, int] = dict((req_id, req_count) for req_id, req_count in type_tally['ids'])
+            for req_id, req_count in summary['ids']:  # Add to the running tally
+                counts[req_id] = counts.get(req_id, 0) + req_count
+            type_tally['ids'] = [[req_id, req_count] for req_id, req_count in counts.items()]
+            type_tally['watermark'] = window_end.isoformat()
+
+        self.save_tally(store, day_start, tally)
+        logging.info(f"Ingested requests for {tally['day']} up to {window_end.isoformat()}")
 
-                df: DataFrame = DataFrame()  # Default to empty dataframe
-                if response.status == LogsQueryStatus.SUCCESS:  # If query was successful
-                    if response.tables:  # If there's data
-                        table: LogsTable = response.tables[0]  # Get first table
-                        df: DataFrame = DataFrame(data=table.rows, columns=table.columns)  # Convert to dataframe
-                else:  # If query failed
-                    error: LogsQueryError = response.partial_error  # Get error
-                    logging.error(f"Query for '{rtype['type']}' failed with error: {error}")  # Log errir
-                    if response.partial_data:  # If there's partial data, use it
-                        table: LogsTable = response.partial_data[0]  # Get first table
-                        df: DataFrame = DataFrame(data=table.rows, columns=table.columns)  # Convert to dataframe
-
-                request_summary: dict[str, DataFrame] = {  # Create request summary
-                    'type': rtype['type'],  # Request type
-                    'data': df  # Request data
-                }
-                scfapp_requests.append(request_summary)  # Add request summary to list
+        return tally
+
+    def load_tally(self, store: StateStore, day_start: datetime) -> dict:
+        """
+        Load the running tally and watermarks for a day
+
+        Args:
+            store (StateStore): Watermark store
+            day_start (datetime): Start of the day
+
+        Returns:
+            dict: {'day', 'types': {type: {'watermark', 'ids': [[id, count], ...]}}}
+        """
+        data: bytes | None = store.read(self.tally_name(day_start))
+        tally: dict = json.loads(data) if data else {'day': day_start.date().isoformat(), 'types': {}}
+
+        for rtype in self.request_types:  # Types added since the tally was started begin at midnight
+            tally['types'].setdefault(rtype['type'], {'watermark': day_start.isoformat(), 'ids': []})
+
+        return tally
+
+    def save_tally(self, store: StateStore, day_start: datetime, tally: dict) -> None:
+        """
+        Save the running tally and watermarks for a day
+
+        Args:
+            store (StateStore): Watermark store
+            day_start (datetime): Start of the day
+            tally (dict): Running tally
+        """
+        store.write(self.tally_name(day_start), json.dumps(tally, separators=(',', ':')).encode())
+
+    def tally_name(self, day_start: datetime) -> str:
+        """
+        State file name for a day's request tally
+
+        Args:
+            day_start (datetime): Start of the day
+
+        Returns:
+            str: File name
+        """
+        return f"requests_{day_start.strftime('%Y%m%d')}.json"
+
+    def kql_datetime(self, value: datetime) -> str:
+        """
+        Format a datetime as a KQL UTC datetime literal
+
+        Args:
+            value (datetime): Timezone-aware datetime
+
+        Returns:
+            str: KQL datetime literal
+        """
+        return f"datetime({value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')})"
+
+    def get_requests_per_type(self, client: LogsQueryClient, query_timespan: tuple[datetime, datetime]) -> list[dict]:
+        """
+        Query Application Insights once for each request type
+
+        Args:
+            client (LogsQueryClient): Application Insights query client
+            query_timespan (tuple[datetime, datetime]): Time span to query
+
+        Returns:
+            list[dict]: A list of dictionaries, each containing a request type and its DataFrame
+        """
+        from azure.core.exceptions import HttpResponseError
+
+        scfapp_requests: list[dict] = []  # List to store request data
+
+        for rtype in self.request_types:  # Iterate through each request type
+            with span('requests.query', mode='per_type', type=rtype['type']) as stage:
+                try:
+                    query: str = f"traces | where message has '{rtype['query_string']}'"  # Set query
+
+                    response: LogsQueryResult | LogsQueryPartialResult = self.execute_query(
+                        # Query Application Insights
+                        client,
+                        query,
+                        query_timespan,
+                        rtype['type'],
+                        lambda start, end, base=query: f"{base}\n{self.window_filter(start, end)}"
+                    )
+
+                    request_summary: dict[str, DataFrame] = {  # Create request summary
+                        'type': rtype['type'],  # Request type
+                        'data': self.response_to_dataframe(response, rtype['type'])  # Request data
+                    }
+                    stage.add(rows=len(request_summary['data']))
+                    scfapp_requests.append(request_summary)  # Add request summary to list
+
+                except HttpResponseError as e:  # Handle HTTP errors
+                    logging.error(f"HTTP error while querying for '{rtype['type']}': {e}")
+                    stage.fail()
+                    continue
+
+                except Exception as e:  # Handle other errors
+                    logging.error(f"An unexpected error occurred for '{rtype['type']}': {e}", exc_info=True)
+                    stage.fail()
+                    continue
+
+        return scfapp_requests
+
+    def get_requests_batched(self, client: LogsQueryClient, query_timespan: tuple[datetime, datetime]) -> list[dict]:
+        """
+        Query Application Insights once for all request types and split the result back out by type
+
+        Args:
+            client (LogsQueryClient): Application Insights query client
+            query_timespan (tuple[datetime, datetime]): Time span to query
+
+        Returns:
+            list[dict]: A list of dictionaries, each containing a request type and its DataFrame
+        """
+        from azure.core.exceptions import HttpResponseError
+        from pandas import DataFrame
+
+        with span('requests.query', mode='batched') as stage:
+            try:
+                response: LogsQueryResult | LogsQueryPartialResult = self.execute_query(
+                    # Query Application Insights
+                    client,
+                    self.build_batched_query(),
+                    query_timespan,
+                    'batched request types',
+                    lambda start, end: f"{self.build_batched_query()}\n{self.window_filter(start, end)}"
+                )
+                df: DataFrame = self.response_to_dataframe(response, 'batched request types')  # All request types
+                stage.add(rows=len(df))
 
             except HttpResponseError as e:  # Handle HTTP errors
-                logging.error(f"HTTP error while querying for '{rtype['type']}': {e}")
-                continue
+                logging.error(f"HTTP error while querying for batched request types: {e}")
+                stage.fail()
+                return []
 
             except Exception as e:  # Handle other errors
-                logging.error(f"An unexpected error occurred for '{rtype['type']}': {e}", exc_info=True)
+                logging.error(f"An unexpected error occurred for batched request types: {e}", exc_info=True)
+                stage.fail()
+                return []
+
+        scfapp_requests: list[dict] = []  # List to store request data
+
+        for rtype in self.request_types:  # Split rows back out by request type
+            if not df.empty and 'request_type' in df.columns:
+                type_df: DataFrame = df[df['request_type'] == rtype['type']].reset_index(drop=True)
+            else:
+                type_df = DataFrame(columns=['request_type', 'timestamp', 'message'])  # No rows for this type
+
+            scfapp_requests.append({
+                'type': rtype['type'],  # Request type
+                'data': type_df  # Request data
+            })
+
+        return scfapp_requests
+
+    def get_requests_summarized(
+            self, client: LogsQueryClient, query_timespan: tuple[datetime, datetime]
+    ) -> list[dict]:
+        """
+        Query Application Insights once for per-type request ID counts
+
+        Args:
+            client (LogsQueryClient): Application Insights query client
+            query_timespan (tuple[datetime, datetime]): Time span to query
+
+        Returns:
+            list[dict]: A list of dictionaries, each containing a request type and its (ID, count) pairs
+        """
+        from azure.core.exceptions import HttpResponseError
+
+        with span('requests.query', mode='summarized') as stage:
+            try:
+                response: LogsQueryResult | LogsQueryPartialResult = self.execute_query(
+                    # Query Application Insights
+                    client,
+                    self.build_summarized_query(),
+                    query_timespan,
+                    'summarized request types',
+                    lambda start, end: self.build_summarized_query([self.window_filter(start, end)]),
+                    timestamp_column=None  # Counts are per slice; combined below
+                )
+                columns, rows = self.response_rows(response, 'summarized request types')  # Compact result rows
+                if REQUESTS_SLICED_QUERY:
+                    rows = self.combine_summarized_rows(columns, rows)
+                stage.add(rows=len(rows))
+
+            except HttpResponseError as e:  # Handle HTTP errors
+                logging.error(f"HTTP error while querying for summarized request types: {e}")
+                stage.fail()
+                return []
+
+            except Exception as e:  # Handle other errors
+                logging.error(f"An unexpected error occurred for summarized request types: {e}", exc_info=True)
+                stage.fail()
+                return []
+
+        return self.summaries_from_rows(columns, rows)
+
+    def execute_query(
+            self,
+            client: LogsQueryClient,
+            query: str,
+            query_timespan: tuple[datetime, datetime],
+            label: str,
+            slice_query: Callable[[datetime, datetime], str],
+            timestamp_column: str | None = 'timestamp'
+    ) -> LogsQueryResult | LogsQueryPartialResult | CachedLogsQueryResult | SlicedQueryPartialResult:
+        """
+        Run a query over the whole time span, or as concurrent time slices if REQUESTS_SLICED_QUERY is set
+
+        Args:
+            client (LogsQueryClient): Application Insights query client
+            query (str): Query for the whole time span
+            query_timespan (tuple[datetime, datetime]): Time span to query
+            label (str): Name of the query, for logging
+            slice_query (Callable[[datetime, datetime], str]): Builds the query for one half-open slice
+            timestamp_column (str | None): Column to merge slices in order of, or None for aggregated results
+
+        Returns:
+            LogsQueryResult | LogsQueryPartialResult | CachedLogsQueryResult | SlicedQueryPartialResult: Query
+                response, partial if any slice was still partial at the minimum slice length
+        """
+        if not REQUESTS_SLICED_QUERY:
+            return client.query_resource(LOGS_RESOURCE_ID, query, timespan=query_timespan)
+
+        executor: SlicedQueryExecutor = SlicedQueryExecutor(client)
+        columns, rows = executor.query(slice_query, query_timespan, label, timestamp_column)
+        tables: list[CachedLogsTable] = [CachedLogsTable('PrimaryResult', columns, [], rows)] if columns else []
+        if not executor.complete:  # Undercounted, so not reported as a success (partial slices are never cached)
+            return SlicedQueryPartialResult(tables, executor.partial_windows)
+        return CachedLogsQueryResult(tables)
+
+    def window_filter(self, start: datetime, end: datetime) -> str:
+        """
+        KQL line keeping traces in a half-open window, so adjacent slices never both count a boundary trace
+
+        Args:
+            start (datetime): Window start (included)
+            end (datetime): Window end (excluded)
+
+        Returns:
+            str: KQL line
+        """
+        return f"| where timestamp >= {self.kql_datetime(start)} and timestamp < {self.kql_datetime(end)}"
+
+    def combine_summarized_rows(self, columns: list[str] | None, rows: list) -> list:
+        """
+        Combine per-slice (request_type, request_id, request_count, first_seen) rows into one row per ID
+
+        Args:
+            columns (list[str] | None): Result column names
+            rows (list): Rows from every slice
+
+        Returns:
+            list: Rows with counts summed and the earliest first_seen, ordered by type and first appearance
+        """
+        if not rows:
+            return rows
+
+        type_col: int = columns.index('request_type')  # Column positions
+        id_col: int = columns.index('request_id')
+        count_col: int = columns.index('request_count')
+        seen_col: int = columns.index('first_seen')
+
+        combined: dict[tuple[str, str], list] = {}
+        for row in rows:
+            key: tuple[str, str] = (row[type_col], row[id_col])
+            if key not in combined:
+                combined[key] = list(row)
                 continue
+            merged: list = combined[key]
+            merged[count_col] = int(merged[count_col]) + int(row[count_col])
+            merged[seen_col] = min(merged[seen_col], row[seen_col])
 
-        if not scfapp_requests:  # If no request data found
-            logging.info("No request data found in the specified timespan.")  # Log message
-            return None
+        return sorted(combined.values(), key=lambda row: (row[type_col], row[seen_col]))
 
-        return scfapp_requests  # Return request data
+    def summaries_from_rows(self, columns: list[str], rows: list) -> list[dict]:
+        """
+        Group (request_type, request_id, request_count) rows into per-type summaries
+
+        Args:
+            columns (list[str]): Result column names
+            rows (list): Result rows
+
+        Returns:
+            list[dict]: A list of dictionaries, each containing a request type and its (ID, count) pairs
+        """
+        ids_by_type: dict[str, list[tuple[str, int]]] = {rtype['type']: [] for rtype in self.request_types}
+
+        if rows:
+            type_col: int = columns.index('request_type')  # Column positions
+            id_col: int = columns.index('request_id')
+            count_col: int = columns.index('request_count')
+
+            for row in rows:  # Rows arrive ordered by type and first appearance
+                if row[type_col] in ids_by_type:
+                    ids_by_type[row[type_col]].append((row[id_col], int(row[count_col])))
+
+        return [{'type': req_type, 'ids': ids} for req_type, ids in ids_by_type.items()]
 
-    def generate_email_body(self, scfapp_requests: list[dict], report_date: str) -> str:
+    def build_batched_query(self) -> str:
+        """
+        Build a single KQL statement that classifies each trace into its request type server-side
+
+        Each trace is assigned to the first request type whose query string it matches, and only the columns
+        needed for the report are returned.
+
+        Returns:
+            str: KQL query
+        """
+        return "\n".join(self.classify_query_lines() + ["| project request_type, timestamp, message"])
+
+    def build_summarized_query(self, filters: list[str] | None = None) -> str:
+        """
+        Build a single KQL statement that extracts request IDs and counts them server-side
+
+        The ID is the text after the last colon in the trace message, matching the extraction in
+        generate_email_body. One row is returned per request type and ID.
+
+        Args:
+            filters (list[str] | None): Extra KQL lines applied after classification
+
+        Returns:
+            str: KQL query
+        """
+        return "\n".join(self.classify_query_lines() + (filters or []) + [
+            '| extend request_id = trim(@"\\s+", extract(@"([^:]*)$", 1, message))',
+            "| summarize request_count = count(), first_seen = min(timestamp) by request_type, request_id",
+            "| order by request_type asc, first_seen asc"
+        ])
+
+    def classify_query_lines(self) -> list[str]:
+        """
+        KQL lines selecting request traces and tagging each with a request_type column
+
+        Returns:
+            list[str]: KQL query lines
+        """
+        terms: list[str] = [
+            self.kql_string(rtype['query_string']) for rtype in self.request_types
+        ]  # Escaped query strings
+        case_args: list[str] = [
+            f"message has {term}, {self.kql_string(rtype['type'])}" for term, rtype in zip(terms, self.request_types)
+        ]  # case() predicate/value pairs
+
+        return [
+            "traces",
+            f"| where {' or '.join(f'message has {term}' for term in terms)}",
+            f"| extend request_type = case({', '.join(case_args)}, '')",
+            "| where isnotempty(request_type)"
+        ]
+
+    def kql_string(self, value: str) -> str:
+        """
+        Quote a value as a KQL string literal
+
+        Args:
+            value (str): Value to quote
+
+        Returns:
+            str: Single-quoted, escaped KQL string literal
+        """
+        return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+    def response_to_dataframe(self, response: LogsQueryResult | LogsQueryPartialResult, label: str) -> DataFrame:
+        """
+        Convert a Log Analytics query response to a DataFrame, falling back to partial data on failure
+
+        Args:
+            response (LogsQueryResult | LogsQueryPartialResult): Query response
+            label (str): Name of the query, for logging
+
+        Returns:
+            DataFrame: Query results
+        """
+        from pandas import DataFrame
+
+        columns, rows = self.response_rows(response, label)  # Result table
+        if columns is None:  # No data
+            return DataFrame()  # Default to empty dataframe
+
+        return DataFrame(data=rows, columns=columns)  # Convert to dataframe
+
+    def response_rows(
+            self, response: LogsQueryResult | LogsQueryPartialResult, label: str
+    ) -> tuple[list[str] | None, list]:
+        """
+        Get the columns and rows of the first result table, falling back to partial data on failure
+
+        Args:
+            response (LogsQueryResult | LogsQueryPartialResult): Query response
+            label (str): Name of the query, for logging
+
+        Returns:
+            tuple[list[str] | None, list]: Column names (None if there's no data) and rows
+        """
+        from azure.monitor.query import LogsQueryStatus
+
+        if response.status == LogsQueryStatus.SUCCESS:  # If query was successful
+            if response.tables:  # If there's data
+                table: LogsTable = response.tables[0]  # Get first table
+                return table.columns, table.rows
+        else:  # If query failed
+            self.incomplete = True
+            error: LogsQueryError = response.partial_error  # Get error
+            logging.error(f"Query for '{label}' failed with error: {error}")  # Log error
+            if response.partial_data:  # If there's partial data, use it
+                table: LogsTable = response.partial_data[0]  # Get first table
+                return table.columns, table.rows
+
+        return None, []
+
+    @instrumented('requests.render', nbytes=len)
+    def generate_email_body(
+            self,
+            scfapp_requests: list[dict],
+            report_date: str,
+            trends: dict[str, dict] | None = None,
+            anomalies: list[dict] | None = None
+    ) -> str:
         """
         Parses request data to generate a plain text email body.
 
         Args:
             scfapp_requests: A list of dictionaries, each containing a request type
-                             and its corresponding DataFrame.
+                             and either its DataFrame ('data') or its (ID, count) pairs ('ids').
             report_date: The date for the report title.
+            trends: Optional 7- and 30-day averages by request type (and 'Total'), from record_metrics.
+            anomalies: Optional unusual volumes, from detect_anomalies.
 
         Returns:
             A string containing the formatted email body.
@@ -98,30 +658,26 @@ class RequestsService:
 
         # Process each request type's data
         for request_info in scfapp_requests:
-            req_type = request_info['type']
-            df = request_info['data']
-            count = len(df)
-            total_requests += count
-
-            ids = []
-            if not df.empty and 'message' in df.columns:
-                # Extract identifier from the end of the message string
-                ids = df['message'].str.split(':').str[-1].str.strip().tolist()
-
-            summary_data[req_type] = {
-                'count': count,
-                'ids': ids
-            }
+            summary = self.summarize_request(request_info)
+            total_requests += summary['count']
+            summary_data[request_info['type']] = summary
 
         # Build the email body
         body_lines = [f"Remote Storage App Requests for {report_date}\n"]
 
+        if anomalies:  # Outliers first, so they aren't missed
+            body_lines.append("Unusual volumes:")
+            for anomaly in anomalies:
+                body_lines.append(f"    {describe_anomaly(anomaly)}")
+            body_lines.append("")
+
         # Summary section
         for req_type, data in summary_data.items():
-            body_lines.append(f"{data['count']} - {req_type} Requests")
+            trend: str = self.trend_suffix(data['count'], trends, req_type)  # Empty without METRICS_TRENDS
+            body_lines.append(f"{data['count']} - {req_type} Requests{trend}")
 
         body_lines.append("----")
-        body_lines.append(f"{total_requests} - Total\n")
+        body_lines.append(f"{total_requests} - Total{self.trend_suffix(total_requests, trends, 'Total')}\n")
 
         # Details section
         for req_type, data in summary_data.items():
@@ -141,8 +697,144 @@ class RequestsService:
                     body_lines.append(f"    {req_id}")
                 body_lines.append("")  # Add a blank line for spacing
 
+                if data['repeated']:  # IDs requested more than once
+                    body_lines.append(f"{req_type} Request {id_name} Requested More Than Once:")
+                    for req_id, req_count in data['repeated']:
+                        body_lines.append(f"    {req_id} ({req_count})")
+                    body_lines.append("")  # Add a blank line for spacing
+
         return "\n".join(body_lines).strip()
 
+    def trend_suffix(self, count: int, trends: dict[str, dict] | None, series: str) -> str:
+        """
+        Trend text to append to a summary line
+
+        Args:
+            count (int): Count being reported
+            trends (dict[str, dict] | None): Averages by request type
+            series (str): Request type or 'Total'
+
+        Returns:
+            str: ' (7-day avg ..., 30-day avg ...)' or ''
+        """
+        text: str = format_trend(count, trends[series]) if trends and series in trends else ''
+        return f" ({text})" if text else ''
+
+    def record_metrics(self, scfapp_requests: list[dict], report_day: date) -> dict[str, dict]:
+        """
+        Record the day's count for each request type and the total, and get their trends
+
+        Args:
+            scfapp_requests (list[dict]): Request data
+            report_day (date): Day being reported
+
+        Returns:
+            dict[str, dict]: 7- and 30-day averages by request type and 'Total'
+        """
+        metrics: MetricsStore = MetricsStore(create_state_store(path=f"{STATE_PATH}/metrics"))
+        counts: dict[str, int] = self.request_counts(scfapp_requests)
+
+        trends: dict[str, dict] = {}
+        for series, count in counts.items():
+            try:
+                trends[series] = metrics.trend(f"requests/{series}", report_day)
+                metrics.record(f"requests/{series}", report_day, count)
+            except Exception as e:  # Trends are optional
+                logging.warning(f"Failed to update request metrics for {series}: {e}")
+
+        return trends
+
+    def detect_anomalies(self, scfapp_requests: list[dict], report_day: date) -> tuple[list[dict], list[dict]]:
+        """
+        Score the day's count for each request type and the total against their baselines
+
+        Args:
+            scfapp_requests (list[dict]): Request data
+            report_day (date): Day being reported
+
+        Returns:
+            tuple[list[dict], list[dict]]: Outliers, and those first observed on this run (not yet alerted)
+        """
+        detector: AnomalyDetector = AnomalyDetector(
+            create_state_store(path=f"{STATE_PATH}/metrics"), "anomaly_requests.json"
+        )
+        anomalies: list[dict] = []
+        new_anomalies: list[dict] = []
+        for series, count in self.request_counts(scfapp_requests).items():
+            observed: bool = detector.observed(f"{series} requests", report_day)  # Alerted when it was first observed
+            anomaly: dict | None = detector.observe(f"{series} requests", report_day, count)
+            if anomaly is not None:
+                anomalies.append(anomaly)
+                if not observed:
+                    new_anomalies.append(anomaly)
+        return anomalies, new_anomalies
+
+    def request_counts(self, scfapp_requests: list[dict]) -> dict[str, int]:
+        """
+        Count each request type's requests
+
+        Args:
+            scfapp_requests (list[dict]): Request data
+
+        Returns:
+            dict[str, int]: Count by request type, plus 'Total'
+        """
+        counts: dict[str, int] = {
+            request_info['type']: self.summarize_request(request_info)['count'] for request_info in scfapp_requests
+        }
+        counts['Total'] = sum(counts.values())
+        return counts
+
+    def summarize_request(self, request_info: dict) -> dict:
+        """
+        Get the count, IDs and repeated IDs for one request type
+
+        Args:
+            request_info (dict): Request type with either its DataFrame ('data') or its (ID, count) pairs ('ids')
+
+        Returns:
+            dict: Total count, IDs in report order (repeated once per request) and, from server-side counts only, IDs
+                requested more than once (the DataFrame modes keep the original report unchanged)
+        """
+        if 'ids' in request_info:  # Already summarized server-side
+            id_counts: list[tuple[str, int]] = request_info['ids']
+            ids: list[str] = [req_id for req_id, req_count in id_counts for _ in range(req_count)]
+            repeated: list[tuple[str, int]] = [(req_id, req_count) for req_id, req_count in id_counts if req_count > 1]
+            return {'count': len(ids), 'ids': ids, 'repeated': repeated}
+
+        df = request_info['data']
+        ids = []
+        if not df.empty and 'message' in df.columns:
+            # Extract identifier from the end of the message string
+            ids = df['message'].str.split(':').str[-1].str.strip().tolist()
+
+        return {'count': len(df), 'ids': ids, 'repeated': []}
+
+    def build_report(self, scfapp_requests: list[dict]) -> tuple[str, str]:
+        """
+        Record the day's metrics, flag unusual volumes and render the report text
+
+        Metrics and anomaly detection are skipped if any query only returned partial data.
+
+        Args:
+            scfapp_requests (list[dict]): Request data
+
+        Returns:
+            tuple[str, str]: Report date (YYYY-MM-DD) and plain text report
+        """
+        report_date: str = (datetime.now(timezone.utc).date() - timedelta(days=1)).strftime('%Y-%m-%d')  # Report date
+        if self.incomplete and (METRICS_TRENDS or ANOMALY_DETECTION):  # Don't store or score undercounted volumes
+            logging.warning(f"Request data for {report_date} is incomplete; skipping metrics and anomaly detection")
+        trends: dict[str, dict] | None = None  # 7- and 30-day averages
+        if METRICS_TRENDS and not self.incomplete:
+            trends = self.record_metrics(scfapp_requests, date.fromisoformat(report_date))
+        anomalies: list[dict] | None = None  # Unusual volumes
+        if ANOMALY_DETECTION and not self.incomplete:
+            anomalies, new_anomalies = self.detect_anomalies(scfapp_requests, date.fromisoformat(report_date))
+            send_anomaly_alert(new_anomalies, report_date)  # Reruns still report them, but don't alert again
+
+        return report_date, self.generate_email_body(scfapp_requests, report_date, trends, anomalies)
+
     def send_email_wrapper(self, scfapp_requests: list[dict]) -> None:
         """
         Construct and send email
@@ -150,8 +842,7 @@ class RequestsService:
         Args:
             scfapp_requests: A list of dictionaries, each containing a request type and its corresponding DataFrame.
         """
-        report_date: str = (datetime.now(timezone.utc).date() - timedelta(days=1)).strftime('%Y-%m-%d')  # Report date
-        email_body_text: str = self.generate_email_body(scfapp_requests, report_date)  # Create email body
+        report_date, email_body_text = self.build_report(scfapp_requests)  # Report date and email body
 
         if email_body_text:  # If email body is not empty
             logging.info("Generated email body. Preparing to send email.")  # Log message
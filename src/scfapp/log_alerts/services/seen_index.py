@@ -0,0 +1,121 @@
+""" Persisted index of content hashes already reported, for collapsing errors that keep recurring """
+import hashlib
+import logging
+import struct
+import sys
+from array import array
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from src.scfapp.log_alerts.services.state_store import StateStore
+
+HEADER: struct.Struct = struct.Struct('<4sI')  # Magic, entry count
+MAGIC: bytes = b'SEEN'
+
+
+def content_hash(text: str) -> int:
+    """
+    64-bit hash of a row or signature
+
+    Args:
+        text (str): Content to hash
+
+    Returns:
+        int: Hash
+    """
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'little')
+
+
+def row_content(row: dict, skip_column: str | None = None) -> str:
+    """
+    A row's content for hashing, leaving out its timestamp so the same failure on another day matches
+
+    Args:
+        row (dict): CSV row
+        skip_column (str | None): Column to leave out
+
+    Returns:
+        str: Row content
+    """
+    return '\x1f'.join(str(value) for column, value in row.items() if column is not None and column != skip_column)
+
+
+class SeenIndex:
+    """
+    Hashes reported for one error type, with the day each was last reported
+
+    Stored as two sorted parallel arrays (uint64 hashes, uint32 day ordinals), 12 bytes per entry, and loaded into a
+    dict for O(1) lookups. Entries not reported for max_days are dropped when the index is loaded. New hashes are
+    only written back with save() once the report has gone out.
+    """
+    def __init__(self, store: StateStore, name: str, max_days: int, today: date | None = None):
+        self.store: StateStore = store
+        self.name: str = name
+        self.max_days: int = max_days
+        self.today: int = (today or datetime.now(ZoneInfo('America/New_York')).date()).toordinal()  # Report day
+        self.entries: dict[int, int] = {}  # hash -> day last reported
+        self.pending: set[int] = set()  # Reported in this run, saved once delivered
+        self.load()
+
+    def load(self) -> None:
+        """ Read the index, dropping expired entries; an unreadable index starts empty """
+        try:
+            data: bytes | None = self.store.read(self.name)
+            if not data:
+                return
+            magic, count = HEADER.unpack_from(data)
+            if magic != MAGIC:
+                raise ValueError("bad header")
+
+            hashes: array = array('Q')
+            days: array = array('I')
+            hashes.frombytes(data[HEADER.size:HEADER.size + count * 8])
+            days.frombytes(data[HEADER.size + count * 8:HEADER.size + count * 12])
+            if sys.byteorder == 'big':  # Stored little-endian
+                hashes.byteswap()
+                days.byteswap()
+
+            oldest: int = self.today - self.max_days
+            self.entries = {h: day for h, day in zip(hashes, days) if day >= oldest}
+
+        except Exception as e:  # Worst case, recurring errors are reported again
+            logging.warning(f"Ignoring unreadable seen index {self.name}: {e}")
+            self.entries = {}
+
+    def seen(self, content: int) -> bool:
+        """
+        Check whether a hash was reported on an earlier day, and remember it as reported today
+
+        Args:
+            content (int): Content hash
+
+        Returns:
+            bool: True if it was reported before today
+        """
+        self.pending.add(content)
+        day: int | None = self.entries.get(content)
+        return day is not None and day < self.today
+
+    def save(self) -> None:
+        """ Record this run's hashes as reported today and write the index """
+        if not self.pending:
+            return
+
+        for content in self.pending:
+            self.entries[content] = self.today
+        self.pending.clear()
+
+        hashes: array = array('Q', sorted(self.entries))
+        days: array = array('I', (self.entries[h] for h in hashes))
+        if sys.byteorder == 'big':
+            hashes.byteswap()
+            days.byteswap()
+
+        try:
+            self.store.write(self.name, HEADER.pack(MAGIC, len(hashes)) + hashes.tobytes() + days.tobytes())
+        except Exception as e:
+            logging.error(f"Failed to save seen index {self.name}: {e}")
+
+    def discard(self) -> None:
+        """ Forget this run's hashes (the report wasn't delivered) """
+        self.pending.clear()
@@ -0,0 +1,186 @@
+""" Runs a Log Analytics query as concurrent time slices so no single result hits the service's row and size limits """
+from __future__ import annotations
+
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Any, Callable, TYPE_CHECKING
+
+from src.scfapp.log_alerts.config import (
+    LOGS_RESOURCE_ID, REQUESTS_QUERY_SLICES, REQUESTS_QUERY_CONCURRENCY, REQUESTS_QUERY_MIN_SLICE_MINUTES
+)
+from src.scfapp.log_alerts.services.instrumentation import span
+
+if TYPE_CHECKING:  # Query SDK is imported when a method first needs it
+    from azure.monitor.query import LogsQueryClient, LogsQueryResult, LogsQueryPartialResult, LogsTable
+    from src.scfapp.log_alerts.services.query_cache import CachedLogsTable
+
+
+class SlicedQueryPartialResult:
+    """
+    Merged result of a sliced query with slices that were still partial at the minimum length, shaped like
+    LogsQueryPartialResult so callers fall back to the partial data and log the error the way they do for any other
+    partial result
+    """
+    def __init__(self, tables: list[CachedLogsTable], partial_windows: list[tuple[datetime, datetime]]):
+        from azure.monitor.query import LogsQueryStatus
+
+        self.partial_data: list[CachedLogsTable] = tables
+        self.partial_error: str = "Results are incomplete for " + ", ".join(
+            f"{start.isoformat()} to {end.isoformat()}" for start, end in sorted(partial_windows)
+        )
+        self.status: LogsQueryStatus = LogsQueryStatus.PARTIAL
+        self.statistics: dict | None = None
+        self.visualization: dict | None = None
+
+
+class SlicedQueryExecutor:
+    """
+    Splits a time span into equal half-open slices, queries them concurrently, and splits any slice that comes back
+    partial (e.g. over the result row or size limit) in half again until it's complete or as short as
+    REQUESTS_QUERY_MIN_SLICE_MINUTES allows. Each slice's query filters on its own half-open window, so a trace on a
+    boundary is only counted once.
+    """
+    def __init__(
+            self,
+            client: LogsQueryClient,
+            slices: int = REQUESTS_QUERY_SLICES,
+            concurrency: int = REQUESTS_QUERY_CONCURRENCY,
+            min_slice: timedelta = timedelta(minutes=REQUESTS_QUERY_MIN_SLICE_MINUTES)
+    ):
+        self.client: LogsQueryClient = client
+        self.slices: int = max(slices, 1)
+        self.concurrency: int = max(concurrency, 1)
+        self.min_slice: timedelta = max(min_slice, timedelta(seconds=1))
+        self.partial_windows: list[tuple[datetime, datetime]] = []  # Slices still partial at the minimum length
+
+    def query(
+            self,
+            build_query: Callable[[datetime, datetime], str],
+            timespan: tuple[datetime, datetime],
+            label: str,
+            timestamp_column: str | None = 'timestamp'
+    ) -> tuple[list[str] | None, list[list[Any]]]:
+        """
+        Run a query over every slice of a time span and merge the results
+
+        Args:
+            build_query (Callable[[datetime, datetime], str]): Builds the query for a slice, filtering on
+                start <= timestamp < end
+            timespan (tuple[datetime, datetime]): Whole time span
+            label (str): Name of the query, for logging
+            timestamp_column (str | None): Column to order rows by, or None for aggregated results, which are
+                returned slice by slice for the caller to combine
+
+        Returns:
+            tuple[list[str] | None, list[list[Any]]]: Column names (None if no slice returned a table) and rows
+        """
+        start, end = timespan
+        step: timedelta = (end - start) / self.slices
+        windows: list[tuple[datetime, datetime]] = [
+            (start + step * i, end if i == self.slices - 1 else start + step * (i + 1)) for i in range(self.slices)
+        ]
+
+        results: dict[tuple[datetime, datetime], tuple[list[str] | None, list[list[Any]]]] = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending: dict[Future, tuple[datetime, datetime]] = {
+                executor.submit(self.query_slice, build_query, window, label): window for window in windows
+            }
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    window: tuple[datetime, datetime] = pending.pop(future)
+                    complete, columns, rows = future.result()  # Query errors propagate to the caller
+                    if complete or window[1] - window[0] < self.min_slice * 2:
+                        if not complete:
+                            self.partial_windows.append(window)
+                            logging.error(f"Query for '{label}' is still partial for {window[0].isoformat()} to "
+                                          f"{window[1].isoformat()} at the minimum slice length")
+                        results[window] = (columns, rows)
+                        continue
+
+                    middle: datetime = window[0] + (window[1] - window[0]) / 2
+                    logging.info(f"Query for '{label}' was partial for {window[0].isoformat()} to "
+                                 f"{window[1].isoformat()}; splitting it")
+                    for half in ((window[0], middle), (middle, window[1])):
+                        pending[executor.submit(self.query_slice, build_query, half, label)] = half
+
+        return self.merge(results, timestamp_column)
+
+    @property
+    def complete(self) -> bool:
+        """ Whether every slice of the last query came back complete """
+        return not self.partial_windows
+
+    def query_slice(
+            self, build_query: Callable[[datetime, datetime], str], window: tuple[datetime, datetime], label: str
+    ) -> tuple[bool, list[str] | None, list[list[Any]]]:
+        """
+        Query one slice
+
+        Args:
+            build_query (Callable[[datetime, datetime], str]): Builds the query for a slice
+            window (tuple[datetime, datetime]): Slice
+            label (str): Name of the query, for logging
+
+        Returns:
+            tuple[bool, list[str] | None, list[list[Any]]]: Whether the result is complete, column names and rows
+        """
+        from azure.monitor.query import LogsQueryStatus
+
+        with span('requests.slice', label=label) as stage:
+            response: LogsQueryResult | LogsQueryPartialResult = self.client.query_resource(
+                LOGS_RESOURCE_ID,
+                build_query(*window),
+                timespan=window
+            )
+
+            if response.status == LogsQueryStatus.SUCCESS:
+                tables: list[LogsTable] = response.tables
+            else:
+                stage.fail('partial')
+                tables = response.partial_data or []
+
+            if not tables:
+                return response.status == LogsQueryStatus.SUCCESS, None, []
+
+            stage.add(rows=len(tables[0].rows))
+            return response.status == LogsQueryStatus.SUCCESS, tables[0].columns, tables[0].rows
+
+    def merge(
+            self,
+            results: dict[tuple[datetime, datetime], tuple[list[str] | None, list[list[Any]]]],
+            timestamp_column: str | None
+    ) -> tuple[list[str] | None, list[list[Any]]]:
+        """
+        Concatenate slice results in time order, dropping any row outside its slice's half-open window
+
+        Args:
+            results (dict): Columns and rows by slice
+            timestamp_column (str | None): Column to order rows by within a slice, or None to keep them as returned
+
+        Returns:
+            tuple[list[str] | None, list[list[Any]]]: Column names and rows
+        """
+        columns: list[str] | None = None
+        merged: list[list[Any]] = []
+
+        for window in sorted(results):
+            slice_columns, rows = results[window]
+            if slice_columns is None:
+                continue
+            columns = columns or slice_columns
+
+            if timestamp_column is None or timestamp_column not in slice_columns:
+                merged.extend(rows)
+                continue
+
+            position: int = slice_columns.index(timestamp_column)
+            kept: list[list[Any]] = [
+                row for row in rows
+                if not isinstance(row[position], datetime) or window[0] <= row[position] < window[1]
+            ]
+            kept.sort(key=lambda row: row[position] if isinstance(row[position], datetime) else window[0])
+            merged.extend(kept)
+
+        return columns, merged
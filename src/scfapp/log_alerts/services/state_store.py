@@ -0,0 +1,302 @@
+""" Small persisted state files (watermarks, caches, indexes, metrics) on the file share, local disk or in memory """
+from __future__ import annotations
+
+import logging
+import os
+import tempfile
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+from src.scfapp.log_alerts.config import STATE_STORE, STATE_PATH
+from src.scfapp.log_alerts.services.clients import get_share_directory_client, get_share_file_client
+
+if TYPE_CHECKING:  # Storage SDK is imported when the file share store is first used
+    from azure.storage.fileshare import ShareFileClient
+
+_memory_stores: dict[str, MemoryStateStore] = {}  # One in-memory store per path for the life of the process
+_memory_lock: threading.Lock = threading.Lock()  # Guards creation
+
+
+class StateStore(ABC):
+    """ Base class for a flat namespace of small binary state files """
+    @abstractmethod
+    def read(self, name: str) -> bytes | None:
+        """
+        Read a state file
+
+        Args:
+            name (str): File name
+
+        Returns:
+            bytes | None: File contents, or None if it doesn't exist
+        """
+
+    @abstractmethod
+    def write(self, name: str, data: bytes) -> None:
+        """
+        Create or replace a state file
+
+        Args:
+            name (str): File name
+            data (bytes): File contents
+        """
+
+    @abstractmethod
+    def create(self, name: str, data: bytes) -> bool:
+        """
+        Create a state file only if it doesn't exist, atomically, so concurrent callers can't both create it
+
+        Args:
+            name (str): File name
+            data (bytes): File contents
+
+        Returns:
+            bool: True if it was created, False if it already existed
+        """
+
+    @abstractmethod
+    def delete(self, name: str) -> None:
+        """
+        Delete a state file if it exists
+
+        Args:
+            name (str): File name
+        """
+
+    def read_range(self, name: str, offset: int, length: int) -> bytes | None:
+        """
+        Read part of a state file
+
+        Args:
+            name (str): File name
+            offset (int): First byte
+            length (int): Number of bytes
+
+        Returns:
+            bytes | None: Bytes read (fewer past the end of the file), or None if it doesn't exist
+        """
+        data: bytes | None = self.read(name)
+        return None if data is None else data[offset:offset + length]
+
+    def write_range(self, name: str, offset: int, data: bytes) -> None:
+        """
+        Overwrite part of a state file, creating or zero-extending it as needed
+
+        Args:
+            name (str): File name
+            offset (int): First byte
+            data (bytes): Bytes to write
+        """
+        current: bytes = self.read(name) or b''
+        if len(current) < offset:
+            current += bytes(offset - len(current))
+        self.write(name, current[:offset] + data + current[offset + len(data):])
+
+
+class MemoryStateStore(StateStore):
+    """ In-process state store, for tests and local runs; create_state_store shares one per path """
+    def __init__(self):
+        self.files: dict[str, bytes] = {}
+        self.lock: threading.Lock = threading.Lock()  # Guards create
+
+    def read(self, name: str) -> bytes | None:
+        return self.files.get(name)
+
+    def write(self, name: str, data: bytes) -> None:
+        self.files[name] = bytes(data)
+
+    def create(self, name: str, data: bytes) -> bool:
+        with self.lock:
+            if name in self.files:
+                return False
+            self.files[name] = bytes(data)
+            return True
+
+    def delete(self, name: str) -> None:
+        self.files.pop(name, None)
+
+
+class LocalStateStore(StateStore):
+    """ State files in a local directory, replaced atomically on write """
+    def __init__(self, root: str):
+        self.root: str = root
+        os.makedirs(root, exist_ok=True)
+
+    def read(self, name: str) -> bytes | None:
+        try:
+            with open(os.path.join(self.root, name), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, name: str, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=f".{name}.")  # Temp file beside the target
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, os.path.join(self.root, name))  # Atomic rename
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def create(self, name: str, data: bytes) -> bool:
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=f".{name}.")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.link(tmp_path, os.path.join(self.root, name))  # Atomic, and fails if the target exists
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.unlink(tmp_path)
+
+    def delete(self, name: str) -> None:
+        try:
+            os.remove(os.path.join(self.root, name))
+        except FileNotFoundError:
+            pass
+
+    def read_range(self, name: str, offset: int, length: int) -> bytes | None:
+        try:
+            with open(os.path.join(self.root, name), 'rb') as f:
+                f.seek(offset)
+                return f.read(length)
+        except FileNotFoundError:
+            return None
+
+    def write_range(self, name: str, offset: int, data: bytes) -> None:
+        path: str = os.path.join(self.root, name)
+        with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+            f.seek(offset)  # Writing past the end zero-fills the gap
+            f.write(data)
+
+
+# noinspection PyMethodMayBeStatic
+class FileShareStateStore(StateStore):
+    """ State files in a directory on the Azure File Share, replaced by renaming a temp file over them on write """
+    def __init__(self, directory: str):
+        self.directory: str = directory.strip('/')
+        self.directory_ready: bool = False  # Directory has been created (or found)
+
+    def file_client(self, name: str) -> ShareFileClient:
+        """
+        Get a client for a state file
+
+        Args:
+            name (str): File name
+
+        Returns:
+            ShareFileClient: File client
+        """
+        return get_share_file_client(f"{self.directory}/{name}")
+
+    def ensure_directory(self) -> None:
+        """ Create the state directory (and its parents) on first write """
+        from azure.core.exceptions import ResourceExistsError
+
+        if self.directory_ready:
+            return
+
+        path: str = ''
+        for part in self.directory.split('/'):
+            path = f"{path}/{part}" if path else part
+            try:
+                get_share_directory_client(path).create_directory()
+            except ResourceExistsError:
+                pass
+
+        self.directory_ready = True
+
+    def read(self, name: str) -> bytes | None:
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            return self.file_client(name).download_file().readall()
+        except ResourceNotFoundError:
+            return None
+
+    def write(self, name: str, data: bytes) -> None:
+        self.ensure_directory()
+        tmp_path: str = f"{self.directory}/.{name}.{uuid.uuid4().hex}"  # Temp file beside the target
+        tmp_client: ShareFileClient = get_share_file_client(tmp_path)
+        tmp_client.upload_file(data)
+        try:
+            tmp_client.rename_file(new_name=f"{self.directory}/{name}", overwrite=True)  # Server-side, atomic
+        except BaseException:
+            tmp_client.delete_file()
+            raise
+
+    def create(self, name: str, data: bytes) -> bool:
+        from azure.core.exceptions import ResourceExistsError
+
+        self.ensure_directory()
+        tmp_path: str = f"{self.directory}/.{name}.{uuid.uuid4().hex}"
+        tmp_client: ShareFileClient = get_share_file_client(tmp_path)
+        tmp_client.upload_file(data)
+        try:
+            tmp_client.rename_file(new_name=f"{self.directory}/{name}", overwrite=False)  # Fails if the target exists
+            return True
+        except ResourceExistsError:
+            tmp_client.delete_file()
+            return False
+        except BaseException:
+            tmp_client.delete_file()
+            raise
+
+    def delete(self, name: str) -> None:
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            self.file_client(name).delete_file()
+        except ResourceNotFoundError:
+            pass
+
+    def read_range(self, name: str, offset: int, length: int) -> bytes | None:
+        from azure.core.exceptions import HttpResponseError, ResourceNotFoundError
+
+        try:
+            return self.file_client(name).download_file(offset=offset, length=length).readall()
+        except ResourceNotFoundError:
+            return None
+        except HttpResponseError as e:
+            if e.status_code == 416:  # Range starts past the end of the file
+                return b''
+            raise
+
+    def write_range(self, name: str, offset: int, data: bytes) -> None:
+        from azure.core.exceptions import ResourceNotFoundError
+
+        self.ensure_directory()
+        file_client: ShareFileClient = self.file_client(name)
+        end: int = offset + len(data)
+        try:
+            if file_client.get_file_properties().size < end:
+                file_client.resize_file(end)  # Zero-fills
+        except ResourceNotFoundError:
+            file_client.create_file(end)
+        file_client.upload_range(data, offset=offset, length=len(data))
+
+
+def create_state_store(kind: str = STATE_STORE, path: str = STATE_PATH) -> StateStore:
+    """
+    Create the configured state store
+
+    Args:
+        kind (str): 'share', 'local' or 'memory'
+        path (str): Directory on the share or local disk
+
+    Returns:
+        StateStore: State store
+    """
+    kind = (kind or 'share').strip().lower()
+    if kind == 'memory':  # Shared, so services see each other's state
+        with _memory_lock:
+            return _memory_stores.setdefault(path, MemoryStateStore())
+    if kind == 'local':
+        return LocalStateStore(path)
+    if kind != 'share':
+        logging.warning(f"Unknown STATE_STORE '{kind}', using the file share")
+    return FileShareStateStore(path)
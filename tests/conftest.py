@@ -0,0 +1,27 @@
+"""
+Shared test setup
+
+Settings are read from the environment when config is first imported, so the defaults the tests rely on are set
+here, before any test module imports the services. State stays in memory and no email is sent anywhere but the fakes.
+"""
+import os
+
+import pytest
+
+os.environ.setdefault('STATE_STORE', 'memory')
+os.environ.setdefault('REPORT_PATH', 'logs')
+os.environ.setdefault('LOGS_RESOURCE_ID', '/subscriptions/test')
+os.environ.setdefault('ACS_CONNECTION_STRING', 'endpoint=https://test/;accesskey=test')
+os.environ.setdefault('ACS_SENDER_ADDRESS', 'alerts@example.org')
+for prefix in ('RH', 'IH', 'LRH', 'RC'):  # Error type recipients
+    os.environ.setdefault(f'{prefix}_ERRORS_TO_EMAIL_STR', 'errors@example.org')
+
+
+@pytest.fixture
+def fakes():
+    """ Fresh client fakes and empty in-memory state stores for one test """
+    from benchmarks.fakes import install_fakes
+    from src.scfapp.log_alerts.services import state_store
+
+    state_store._memory_stores.clear()
+    return install_fakes()
@@ -0,0 +1,54 @@
+""" Tests for the per-series anomaly baselines """
+import json
+from datetime import date, datetime, timedelta, timezone
+
+from src.scfapp.log_alerts.config import REQUEST_TYPES, STATE_PATH
+from src.scfapp.log_alerts.services import anomaly_detector, requests_service
+from src.scfapp.log_alerts.services.anomaly_detector import AnomalyDetector
+from src.scfapp.log_alerts.services.state_store import MemoryStateStore, create_state_store
+
+DAY: date = date(2026, 10, 16)
+
+
+def test_anomaly_waits_for_warmup_then_flags_outliers():
+    detector: AnomalyDetector = AnomalyDetector(MemoryStateStore(), 'anomaly.json', threshold=3, alpha=0.2, warmup=3)
+    for offset in range(3, 0, -1):
+        assert detector.observe('A errors', DAY - timedelta(days=offset), 100) is None
+
+    anomaly: dict | None = detector.observe('A errors', DAY, 0)
+
+    assert anomaly is not None
+    assert anomaly['count'] == 0 and anomaly['expected'] == 100.0 and anomaly['score'] < 0
+
+
+def test_anomaly_observes_each_day_once():
+    store: MemoryStateStore = MemoryStateStore()
+    detector: AnomalyDetector = AnomalyDetector(store, 'anomaly.json', threshold=3, alpha=0.2, warmup=1)
+    detector.observe('A errors', DAY - timedelta(days=1), 10)
+    assert not detector.observed('A errors', DAY)
+
+    first: dict | None = detector.observe('A errors', DAY, 50)
+    saved: bytes = store.read('anomaly.json')
+
+    assert detector.observed('A errors', DAY)
+    assert AnomalyDetector(store, 'anomaly.json', warmup=1).observe('A errors', DAY, 50) == first
+    assert detector.observe('A errors', DAY - timedelta(days=1), 10) is None  # Out of order
+    assert store.read('anomaly.json') == saved
+
+
+def test_request_report_alerts_once_per_day(fakes, monkeypatch):
+    monkeypatch.setattr(requests_service, 'ANOMALY_DETECTION', True)
+    monkeypatch.setattr(requests_service, 'METRICS_TRENDS', False)
+    monkeypatch.setattr(anomaly_detector, 'ANOMALY_ALERT_TO_EMAIL_STR', 'ops@example.org')
+    report_day: date = datetime.now(timezone.utc).date() - timedelta(days=1)
+    baseline: dict = {'mean': 100.0, 'var': 25.0, 'n': 30, 'day': report_day.toordinal() - 1, 'last': None}
+    create_state_store(path=f"{STATE_PATH}/metrics").write(
+        'anomaly_requests.json', json.dumps({'Total requests': baseline}).encode()
+    )
+    scfapp_requests: list[dict] = [{'type': REQUEST_TYPES[0]['type'], 'ids': [('991234567890104106', 2)]}]
+
+    reports: list[str] = [requests_service.RequestsService().build_report(scfapp_requests)[1] for _ in range(2)]
+
+    alerts: list[dict] = [message for message in fakes[2].sent if 'ALERT' in message['content']['subject']]
+    assert len(alerts) == 1  # The rerun doesn't alert again
+    assert all('Total requests: 2 (unusually low' in report for report in reports)  # But still reports it
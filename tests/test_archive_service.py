@@ -0,0 +1,135 @@
+""" Tests for compacting archived error logs into monthly bundles """
+import gzip
+import json
+from datetime import datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from src.scfapp.log_alerts.services.archive_service import ArchiveService
+from src.scfapp.log_alerts.services.log_storage import LocalLogStorage
+
+DAYS: list[str] = ['20260105', '20260106', '20260107']
+MANIFEST: str = 'logs/OLD/ARCHIVE/RequestHandler_202601.json'
+BUNDLE: str = 'logs/OLD/ARCHIVE/RequestHandler_202601.csv.gz'
+
+
+def daily_log(date: str, rows: int) -> bytes:
+    body: str = ''.join(f'{date}T09:00:{row:02d},"Request {row} failed,\nretrying"\n' for row in range(rows))
+    return f'Timestamp,Message\n{body}'.encode()
+
+
+class InterruptingStorage(LocalLogStorage):
+    """ Fails the manifest write once the given number of days have been appended to the bundle """
+    def __init__(self, root: str, fail_after_appends: int):
+        super().__init__(root)
+        self.appends_left: int = fail_after_appends
+
+    def write_at(self, path: str, offset: int, data: bytes) -> None:
+        super().write_at(path, offset, data)
+        self.appends_left -= 1
+
+    def write(self, path: str, data: bytes) -> None:
+        if self.appends_left == 0:
+            self.appends_left = -1
+            raise OSError("Connection reset")
+        super().write(path, data)
+
+
+@pytest.fixture
+def root(tmp_path: Path) -> Path:
+    (tmp_path / 'logs' / 'OLD').mkdir(parents=True)
+    for rows, date in enumerate(DAYS, start=2):
+        (tmp_path / f'logs/OLD/RequestHandler_log_{date}.csv').write_bytes(daily_log(date, rows))
+    return tmp_path
+
+
+def old_logs(root: Path) -> list[str]:
+    return sorted(path.name for path in (root / 'logs' / 'OLD').iterdir() if path.is_file())
+
+
+def test_compaction_bundles_closed_months_and_reads_days_back(root):
+    current: str = datetime.now(ZoneInfo('America/New_York')).strftime('%Y%m%d')
+    (root / f'logs/OLD/RequestHandler_log_{current}.csv').write_bytes(daily_log(current, 1))
+    service: ArchiveService = ArchiveService(LocalLogStorage(str(root)))
+
+    service.compact_closed_months()
+
+    assert old_logs(root) == [f'RequestHandler_log_{current}.csv']  # The current month is still being archived
+    manifest: dict = json.loads((root / MANIFEST).read_bytes())
+    assert sorted(manifest['days']) == DAYS
+    assert [manifest['days'][date]['rows'] for date in DAYS] == [2, 3, 4]  # Quoted newlines don't split rows
+    assert manifest['size'] == (root / BUNDLE).stat().st_size
+    assert gzip.decompress((root / BUNDLE).read_bytes()) == b''.join(
+        daily_log(date, rows) for rows, date in enumerate(DAYS, start=2)
+    )
+    for rows, date in enumerate(DAYS, start=2):
+        assert service.read_day('RequestHandler', date) == daily_log(date, rows)
+    assert service.read_day('RequestHandler', '20260108') is None
+
+
+def test_read_day_downloads_only_its_range(root):
+    service: ArchiveService = ArchiveService(LocalLogStorage(str(root)))
+    service.compact_closed_months()
+    ranges: list[tuple[str, int, int]] = []
+    read_range = service.storage.read_range
+    service.storage.read_range = lambda path, offset, length: ranges.append((path, offset, length)) or read_range(
+        path, offset, length
+    )
+
+    service.read_day('RequestHandler', DAYS[1])
+
+    day: dict = json.loads((root / MANIFEST).read_bytes())['days'][DAYS[1]]
+    assert ranges == [(BUNDLE, day['offset'], day['length'])]
+
+
+def test_interrupted_compaction_resumes(root):
+    service: ArchiveService = ArchiveService(InterruptingStorage(str(root), fail_after_appends=3))
+
+    service.compact_closed_months()  # Last day appended, but its manifest write fails
+
+    manifest: dict = json.loads((root / MANIFEST).read_bytes())
+    assert sorted(manifest['days']) == DAYS[:2]
+    assert manifest['size'] < (root / BUNDLE).stat().st_size  # Uncommitted tail
+    assert old_logs(root) == [f'RequestHandler_log_{DAYS[2]}.csv']
+
+    service.compact_closed_months()
+    service.compact_closed_months()  # Nothing left to do
+
+    manifest = json.loads((root / MANIFEST).read_bytes())
+    assert sorted(manifest['days']) == DAYS
+    assert manifest['size'] == (root / BUNDLE).stat().st_size
+    assert old_logs(root) == []
+    for rows, date in enumerate(DAYS, start=2):
+        assert service.read_day('RequestHandler', date) == daily_log(date, rows)
+
+
+def test_unreadable_manifest_is_rebuilt_from_the_bundle(root):
+    service: ArchiveService = ArchiveService(LocalLogStorage(str(root)))
+    service.compact_closed_months()
+    expected: dict = json.loads((root / MANIFEST).read_bytes())
+    (root / MANIFEST).write_bytes(b'{"days": {"2026')  # Torn write
+    (root / 'logs/OLD/RequestHandler_log_20260120.csv').write_bytes(daily_log('20260120', 5))
+
+    service.compact_closed_months()
+
+    manifest: dict = json.loads((root / MANIFEST).read_bytes())
+    assert {date: manifest['days'][date] for date in DAYS} == expected['days']
+    assert service.read_day('RequestHandler', '20260120') == daily_log('20260120', 5)
+    assert service.read_day('RequestHandler', DAYS[0]) == daily_log(DAYS[0], 2)
+    assert not [path for path in (root / 'logs/OLD/ARCHIVE').iterdir() if path.name.startswith('.')]  # No temp files
+
+
+def test_compaction_on_the_share(fakes):
+    share = fakes[0]
+    for rows, date in enumerate(DAYS, start=2):
+        share.put(f'logs/OLD/RequestHandler_log_{date}.csv', daily_log(date, rows))
+    service: ArchiveService = ArchiveService()
+
+    service.compact_closed_months()
+    share.put('logs/OLD/RequestHandler_log_20260120.csv', daily_log('20260120', 5))
+    service.compact_closed_months()  # Replaces the manifest
+
+    assert sorted(json.loads(share.files[MANIFEST])['days']) == DAYS + ['20260120']
+    assert service.read_day('RequestHandler', DAYS[2]) == daily_log(DAYS[2], 4)
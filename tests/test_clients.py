@@ -0,0 +1,82 @@
+""" Tests for the process-wide client registry """
+import threading
+import time
+
+import pytest
+
+from src.scfapp.log_alerts.services import clients
+
+
+class ClosingClient:
+    """ Records whether it was closed """
+    def __init__(self, fail: bool = False):
+        self.fail: bool = fail
+        self.closed: bool = False
+
+    def close(self) -> None:
+        self.closed = True
+        if self.fail:
+            raise RuntimeError("Connection already closed")
+
+
+@pytest.fixture(autouse=True)
+def empty_registry():
+    """ Start and end each test with no registered clients """
+    clients.close_clients()
+    yield
+    clients.close_clients()
+
+
+def test_client_is_created_once_and_reused():
+    created: list[object] = []
+
+    def factory() -> object:
+        created.append(object())
+        return created[-1]
+
+    first: object = clients.get_client('test_client', factory)
+
+    assert clients.get_client('test_client', factory) is first
+    assert len(created) == 1
+
+
+def test_concurrent_first_use_creates_one_client():
+    created: list[object] = []
+    results: list[object] = []
+
+    def factory() -> object:
+        time.sleep(0.01)  # Widen the race
+        created.append(object())
+        return created[-1]
+
+    threads: list[threading.Thread] = [
+        threading.Thread(target=lambda: results.append(clients.get_client('test_client', factory))) for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1
+    assert all(result is created[0] for result in results)
+
+
+def test_registered_fake_replaces_the_factory():
+    fake: object = object()
+    clients.register_client(clients.EMAIL_CLIENT, fake)
+
+    assert clients.get_email_client() is fake
+
+
+def test_close_clients_closes_and_forgets_every_client():
+    failing: ClosingClient = ClosingClient(fail=True)
+    closing: ClosingClient = ClosingClient()
+    clients.register_client('failing', failing)
+    clients.register_client('closing', closing)
+    clients.register_client('no_close', object())
+
+    clients.close_clients()  # A failed close doesn't stop the others
+
+    assert failing.closed and closing.closed
+    replacement: ClosingClient = clients.get_client('closing', ClosingClient)
+    assert replacement is not closing
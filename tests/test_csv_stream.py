@@ -0,0 +1,84 @@
+""" Tests for incremental CSV parsing """
+import csv
+import io
+
+import pytest
+
+from src.scfapp.log_alerts.services.csv_stream import CsvRowStream, _LineQueue, iter_csv_rows
+
+STRAY_QUOTE_LOG: str = (
+    'Timestamp,Barcode,Message\n'
+    '2026-01-14T09:00:00,31234000000001,Barcode 5" ruler failed\n'
+    '2026-01-14T09:05:00,31234000000002,Item not found\n'
+    '2026-01-14T09:10:00,31234000000003,"Request failed:\nretry, then gave up"\n'
+    '2026-01-14T09:15:00,31234000000004,Item not found\n'
+)
+
+
+def split(data: bytes, size: int) -> list[bytes]:
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+def dict_reader_rows(text: str) -> list[dict]:
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+@pytest.mark.parametrize('size', [1, 2, 7, 64, 1024 * 1024])
+def test_stray_quote_in_unquoted_field(size: int):
+    rows: list[dict] = list(iter_csv_rows(split(STRAY_QUOTE_LOG.encode(), size)))
+
+    assert len(rows) == 4
+    assert rows[0]['Message'] == 'Barcode 5" ruler failed'
+    assert rows[2]['Message'] == 'Request failed:\nretry, then gave up'
+    assert rows == dict_reader_rows(STRAY_QUOTE_LOG)
+
+
+@pytest.mark.parametrize('text', [
+    'a,b\n1,"x\n\ny"\n\n2,3,4\n5\n',  # Quoted newlines, a blank line, and long and short rows
+    'a,b\r\n1,2\r\n"q""x",3\r\n',  # CRLF line endings and an escaped quote
+    'a,b\n1,2\n"unterminated\nfield',  # Unterminated quoted field at the end of the file
+    'a,b\n1,2',  # No final newline
+])
+@pytest.mark.parametrize('size', [1, 3, 1024])
+def test_rows_match_dict_reader(text: str, size: int):
+    assert list(iter_csv_rows(split(text.encode(), size))) == dict_reader_rows(text)
+
+
+def test_multibyte_character_split_across_chunks():
+    data: bytes = 'Message\ncafé\n'.encode()
+    stream: CsvRowStream = CsvRowStream()
+
+    rows: list[dict] = stream.feed(data[:-2]) + stream.feed(data[-2:]) + stream.close()  # Splits the 'é'
+
+    assert rows == [{'Message': 'café'}]
+
+
+def test_quoted_record_waits_for_the_next_chunk():
+    stream: CsvRowStream = CsvRowStream()
+
+    assert stream.feed(b'a,b\n1,"two\n') == []
+    assert stream.feed(b'lines"\n3,4\n') == [{'a': '1', 'b': 'two\nlines'}, {'a': '3', 'b': '4'}]
+    assert stream.close() == []
+
+
+def test_field_spanning_many_chunks_is_parsed_in_linear_time(monkeypatch):
+    trace: str = ''.join(f'  at frame {i} (handler.py:{i})\n' for i in range(2000))
+    text: str = f'Timestamp,Message\n2026-01-14T09:00:00,"{trace}"\n2026-01-14T09:05:00,Item not found\n'
+    lines_read: list[int] = [0]
+    next_line = _LineQueue.__next__
+
+    def counting_next(queue: _LineQueue) -> str:
+        lines_read[0] += 1
+        return next_line(queue)
+
+    monkeypatch.setattr(_LineQueue, '__next__', counting_next)
+    rows: list[dict] = list(iter_csv_rows(split(text.encode(), 64)))
+
+    assert rows == dict_reader_rows(text)
+    assert lines_read[0] < 4 * text.count('\n')  # Re-parsing on every chunk would read ~2,000,000 lines
+
+
+def test_line_spanning_many_chunks():
+    text: str = 'Timestamp,Message\n2026-01-14T09:00:00,' + 'x' * 100000 + '\n'
+
+    assert list(iter_csv_rows(split(text.encode(), 100))) == dict_reader_rows(text)
@@ -0,0 +1,88 @@
+""" Tests that the digest sends each recipient one email and archives only the logs whose sections were delivered """
+import pytest
+
+from benchmarks.fakes import FakeEmailClient, FakePoller
+from src.scfapp.log_alerts.config import ERROR_TYPES
+from src.scfapp.log_alerts.services import clients
+from src.scfapp.log_alerts.services.digest_service import DigestService
+from tests.test_error_delivery import HEADER, log_path
+
+
+class RecipientRejectingEmailClient(FakeEmailClient):
+    """ Rejects (without retrying) any email addressed to one of the given addresses """
+    def __init__(self, rejected: set[str]):
+        super().__init__()
+        self.rejected: set[str] = rejected
+
+    def begin_send(self, message: dict) -> FakePoller:
+        if any(recipient['address'] in self.rejected for recipient in message['recipients']['to']):
+            raise ValueError("Rejected")
+        return super().begin_send(message)
+
+
+def addresses(message: dict, field: str = 'to') -> list[str]:
+    return [recipient['address'] for recipient in message['recipients'].get(field) or []]
+
+
+@pytest.fixture
+def digest(fakes, monkeypatch) -> DigestService:
+    """ RequestHandler goes to ops; ItemsHandler to ops and items; both logs have one error """
+    monkeypatch.setitem(ERROR_TYPES[0], 'to', 'ops@example.org')
+    monkeypatch.setitem(ERROR_TYPES[0], 'cc', '')
+    monkeypatch.setitem(ERROR_TYPES[1], 'to', 'OPS@example.org, items@example.org')
+    monkeypatch.setitem(ERROR_TYPES[1], 'cc', '')
+
+    service: DigestService = DigestService()
+    yesterday: str = service.errors_service.set_filestring()
+    fakes[0].put(log_path('RequestHandler', yesterday), HEADER + b'2026-10-16T09:00:00,Request failed\n')
+    fakes[0].put(log_path('ItemsHandler', yesterday), HEADER + b'2026-10-16T09:00:00,Item not found\n')
+    return service
+
+
+def test_recipient_groups_send_each_address_one_email():
+    sections: list[dict] = [
+        {'to': 'a@example.org, b@example.org', 'cc': 'c@example.org'},
+        {'to': 'A@example.org', 'cc': 'd@example.org'},
+        {'to': 'c@example.org', 'cc': ''}
+    ]
+
+    groups: list[dict] = DigestService().recipient_groups(sections)
+
+    assert sorted((group['sections'], group['to'], group['cc']) for group in groups) == [
+        ((0,), [{'address': 'b@example.org'}], []),
+        ((0, 1), [{'address': 'a@example.org'}], []),  # Case-insensitive
+        ((0, 2), [{'address': 'c@example.org'}], []),  # TO of one section, so TO of its email
+        ((1,), [{'address': 'd@example.org'}], [])  # Only CC'd, so sent as TO
+    ]
+
+
+def test_digest_groups_recipients_and_archives_delivered_logs(digest, fakes):
+    share, _, email = fakes
+    yesterday: str = digest.errors_service.set_filestring()
+
+    results: list[dict] = digest.run()
+
+    assert [result['status'] for result in results] == ['Succeeded', 'Succeeded']
+    by_recipient: dict[str, dict] = {tuple(addresses(message)): message for message in email.sent}
+    assert sorted(by_recipient) == [('items@example.org',), ('ops@example.org',)]
+    ops_body: str = by_recipient[('ops@example.org',)]['content']['html']
+    items_body: str = by_recipient[('items@example.org',)]['content']['html']
+    assert 'RequestHandler errors' in ops_body and 'ItemsHandler errors' in ops_body
+    assert 'ItemsHandler errors' in items_body and 'RequestHandler errors' not in items_body
+    for err_type in ('RequestHandler', 'ItemsHandler'):
+        assert log_path(err_type, yesterday, archived=True) in share.files
+        assert log_path(err_type, yesterday) not in share.files
+
+
+def test_digest_leaves_logs_whose_sections_were_not_delivered_to_everyone(digest, fakes):
+    share = fakes[0]
+    email: RecipientRejectingEmailClient = RecipientRejectingEmailClient({'items@example.org'})
+    clients.register_client(clients.EMAIL_CLIENT, email)
+    yesterday: str = digest.errors_service.set_filestring()
+
+    digest.run()
+
+    assert [addresses(message) for message in email.sent] == [['ops@example.org']]
+    assert log_path('RequestHandler', yesterday, archived=True) in share.files  # Only ops gets it, and ops did
+    assert log_path('ItemsHandler', yesterday) in share.files  # Ops got it, items didn't
+    assert log_path('ItemsHandler', yesterday, archived=True) not in share.files
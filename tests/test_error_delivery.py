@@ -0,0 +1,108 @@
+""" Tests that error logs are only archived once their report is delivered """
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from benchmarks.fakes import FakeEmailClient, FakePoller
+from src.scfapp.log_alerts.config import ERROR_TYPES
+from src.scfapp.log_alerts.services import clients
+from src.scfapp.log_alerts.services.errors_service import ErrorsService
+from src.scfapp.log_alerts.services.log_storage import LocalLogStorage
+
+YESTERDAY: str = '20261016'
+HEADER: bytes = b'Timestamp,Message\n'
+
+
+class RejectingEmailClient(FakeEmailClient):
+    """ Rejects (without retrying) any email whose subject names one of the given error types """
+    def __init__(self, rejected: set[str]):
+        super().__init__()
+        self.rejected: set[str] = rejected
+
+    def begin_send(self, message: dict) -> FakePoller:
+        if any(err_type in message['content']['subject'] for err_type in self.rejected):
+            raise ValueError("Rejected")
+        return super().begin_send(message)
+
+
+def log_path(err_type: str, filestring: str, archived: bool = False) -> str:
+    return f"logs/{'OLD/' if archived else ''}{err_type}_log_{filestring}.csv"
+
+
+@pytest.fixture
+def rejecting_email(fakes) -> RejectingEmailClient:
+    email: RejectingEmailClient = RejectingEmailClient({'RequestHandler'})
+    clients.register_client(clients.EMAIL_CLIENT, email)
+    return email
+
+
+def test_async_run_archives_only_delivered_logs(rejecting_email, tmp_path: Path):
+    (tmp_path / 'logs' / 'OLD').mkdir(parents=True)
+    for err_type, row in (('RequestHandler', b'Request failed'), ('ItemsHandler', b'Item not found')):
+        (tmp_path / log_path(err_type, YESTERDAY)).write_bytes(HEADER + b'2026-10-16T09:00:00,' + row + b'\n')
+    service: ErrorsService = ErrorsService()
+    service.storage = LocalLogStorage(str(tmp_path))  # Processed on worker threads
+
+    asyncio.run(service.process_errors_async(ERROR_TYPES, YESTERDAY))
+
+    assert len(rejecting_email.sent) == 1
+    assert (tmp_path / log_path('RequestHandler', YESTERDAY)).exists()
+    assert (tmp_path / log_path('ItemsHandler', YESTERDAY, archived=True)).exists()
+    assert not (tmp_path / log_path('ItemsHandler', YESTERDAY)).exists()
+
+
+def test_batched_run_archives_only_delivered_logs(fakes, rejecting_email):
+    share = fakes[0]
+    share.put(log_path('RequestHandler', YESTERDAY), HEADER + b'2026-10-16T09:00:00,Request failed\n')
+    share.put(log_path('ItemsHandler', YESTERDAY), HEADER + b'2026-10-16T09:00:00,Item not found\n')
+
+    results: list[dict] = ErrorsService().process_errors_batched(ERROR_TYPES, YESTERDAY)
+
+    assert sorted(result['status'] == 'Succeeded' for result in results) == [False, True]
+    assert log_path('RequestHandler', YESTERDAY) in share.files
+    assert log_path('ItemsHandler', YESTERDAY, archived=True) in share.files
+    assert log_path('ItemsHandler', YESTERDAY) not in share.files
+
+
+def test_default_run_archives_only_delivered_logs(fakes, rejecting_email):
+    from src.scfapp.log_alerts.blueprints.bp_errors import process_day
+
+    share = fakes[0]
+    share.put(log_path('RequestHandler', YESTERDAY), HEADER + b'2026-10-16T09:00:00,Request failed\n')
+    share.put(log_path('ItemsHandler', YESTERDAY), HEADER + b'2026-10-16T09:00:00,Item not found\n')
+
+    process_day(ErrorsService(), YESTERDAY)
+
+    assert len(rejecting_email.sent) == 1
+    assert log_path('RequestHandler', YESTERDAY) in share.files
+    assert log_path('ItemsHandler', YESTERDAY, archived=True) in share.files
+    assert log_path('ItemsHandler', YESTERDAY) not in share.files
+
+
+def test_catchup_keeps_undelivered_days(fakes, rejecting_email):
+    share = fakes[0]
+    for filestring in ('20261014', YESTERDAY):
+        share.put(log_path('RequestHandler', filestring), HEADER + b'2026-10-14T09:00:00,Request failed\n')
+    share.put(log_path('RequestHandler', '20261015'), HEADER)  # Nothing to send
+    share.put(log_path('ItemsHandler', '20261015'), HEADER + b'2026-10-15T09:00:00,Item not found\n')
+
+    ErrorsService().process_catchup(ERROR_TYPES, YESTERDAY)
+
+    assert log_path('RequestHandler', '20261014') in share.files
+    assert log_path('RequestHandler', YESTERDAY) in share.files
+    assert log_path('RequestHandler', '20261015', archived=True) in share.files
+    assert log_path('ItemsHandler', '20261015', archived=True) in share.files
+    assert len(rejecting_email.sent) == 1
+
+
+def test_catchup_archives_after_delivery(fakes):
+    share, _, email = fakes
+    for filestring in ('20261015', YESTERDAY):
+        share.put(log_path('RequestHandler', filestring), HEADER + b'2026-10-15T09:00:00,Request failed\n')
+
+    ErrorsService().process_catchup(ERROR_TYPES, YESTERDAY)
+
+    assert len(email.sent) == 1
+    assert log_path('RequestHandler', '20261015', archived=True) in share.files
+    assert log_path('RequestHandler', YESTERDAY, archived=True) in share.files
@@ -0,0 +1,153 @@
+""" Tests that queued error logs are emailed at most once per log, however often their work items are delivered """
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+from benchmarks.fakes import FakeEmailClient
+from src.scfapp.log_alerts.services import clients
+from src.scfapp.log_alerts.services.error_queue_service import ErrorQueueService
+from src.scfapp.log_alerts.services.state_store import StateStore, create_state_store
+from tests.test_error_delivery import HEADER, YESTERDAY, RejectingEmailClient, log_path
+
+KEY: str = f"RequestHandler_log_{YESTERDAY}.csv"
+BODY: str = json.dumps({'type': 'RequestHandler', 'date': YESTERDAY, 'key': KEY})
+MARKER: str = f"{KEY}.json"
+
+
+@pytest.fixture
+def share(fakes):
+    share = fakes[0]
+    share.put(log_path('RequestHandler', YESTERDAY), HEADER + b'2026-10-16T09:00:00,Request failed\n')
+    return share
+
+
+def lease(minutes: int) -> bytes:
+    now: datetime = datetime.now(timezone.utc)
+    return json.dumps({'claimed': now.isoformat(), 'expires': (now + timedelta(minutes=minutes)).isoformat()}).encode()
+
+
+def test_redelivered_item_is_not_emailed_again(fakes, share):
+    email = fakes[2]
+    service: ErrorQueueService = ErrorQueueService()
+
+    service.process(BODY)
+    service.process(BODY)  # Redelivered after the log was archived
+
+    assert len(email.sent) == 1
+    assert log_path('RequestHandler', YESTERDAY, archived=True) in share.files
+    assert service.markers.read(MARKER) is None
+
+
+def test_failed_archive_is_retried_without_resending(fakes, share, monkeypatch):
+    email = fakes[2]
+    service: ErrorQueueService = ErrorQueueService()
+
+    def fail_move(source: str, destination: str) -> None:
+        raise OSError("Share unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(service.errors_service.storage, 'move', fail_move)
+        with pytest.raises(RuntimeError):
+            service.process(BODY)
+    assert len(email.sent) == 1
+    assert 'sent' in json.loads(service.markers.read(MARKER))
+
+    service.process(BODY)  # The queue's retry
+
+    assert len(email.sent) == 1
+    assert log_path('RequestHandler', YESTERDAY, archived=True) in share.files
+    assert service.markers.read(MARKER) is None
+
+
+def test_failed_send_releases_the_claim_for_the_retry(fakes, share):
+    clients.register_client(clients.EMAIL_CLIENT, RejectingEmailClient({'RequestHandler'}))
+    service: ErrorQueueService = ErrorQueueService()
+
+    with pytest.raises(RuntimeError):
+        service.process(BODY)
+    assert service.markers.read(MARKER) is None
+    assert log_path('RequestHandler', YESTERDAY) in share.files
+
+    email: FakeEmailClient = FakeEmailClient()
+    clients.register_client(clients.EMAIL_CLIENT, email)
+    service.process(BODY)  # The queue's retry
+
+    assert len(email.sent) == 1
+    assert log_path('RequestHandler', YESTERDAY, archived=True) in share.files
+
+
+def test_item_claimed_by_another_delivery_is_dropped(fakes, share):
+    email = fakes[2]
+    service: ErrorQueueService = ErrorQueueService()
+    service.markers.write(MARKER, lease(5))
+
+    service.process(BODY)
+
+    assert not email.sent
+    assert log_path('RequestHandler', YESTERDAY) in share.files
+    assert 'claimed' in json.loads(service.markers.read(MARKER))  # Still the other delivery's
+
+
+def test_expired_claim_is_taken_over(fakes, share):
+    email = fakes[2]
+    service: ErrorQueueService = ErrorQueueService()
+    service.markers.write(MARKER, lease(-1))  # Its worker crashed mid-report
+
+    service.process(BODY)
+
+    assert len(email.sent) == 1
+    assert log_path('RequestHandler', YESTERDAY, archived=True) in share.files
+    assert service.markers.read(MARKER) is None
+
+
+def test_concurrent_deliveries_send_once(share):
+    email: FakeEmailClient = FakeEmailClient(latency=0.05)  # Slow enough for the deliveries to overlap
+    clients.register_client(clients.EMAIL_CLIENT, email)
+    barrier: threading.Barrier = threading.Barrier(4)
+    errors: list[BaseException] = []
+
+    def deliver() -> None:
+        service: ErrorQueueService = ErrorQueueService()
+        barrier.wait()
+        try:
+            service.process(BODY)
+        except BaseException as e:
+            errors.append(e)
+
+    threads: list[threading.Thread] = [threading.Thread(target=deliver) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert len(email.sent) == 1
+    assert log_path('RequestHandler', YESTERDAY, archived=True) in share.files
+
+
+def test_header_only_log_is_archived_without_a_report(fakes):
+    share, _, email = fakes
+    share.put(log_path('RequestHandler', YESTERDAY), HEADER)
+    service: ErrorQueueService = ErrorQueueService()
+
+    service.process(BODY)
+
+    assert not email.sent
+    assert log_path('RequestHandler', YESTERDAY, archived=True) in share.files
+    assert service.markers.read(MARKER) is None
+
+
+@pytest.mark.parametrize('kind', ['memory', 'local', 'share'])
+def test_state_store_create_only_once(fakes, kind: str, tmp_path: Path):
+    store: StateStore = create_state_store(kind, str(tmp_path / 'fanout') if kind == 'local' else 'state/fanout')
+
+    assert store.create(MARKER, b'first')
+    assert not store.create(MARKER, b'second')
+    assert store.read(MARKER) == b'first'
+    if kind == 'share':
+        assert [path for path in fakes[0].files if path.startswith('state/fanout/.')] == []  # Temp files cleaned up
+    if kind == 'local':
+        assert sorted(path.name for path in (tmp_path / 'fanout').iterdir()) == [MARKER]
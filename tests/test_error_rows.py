@@ -0,0 +1,90 @@
+""" Tests that column-oriented error rows round-trip the CSV rows they were parsed from """
+import csv
+import io
+from datetime import datetime
+
+from src.scfapp.log_alerts.services.error_rows import SHARE_SAMPLE, ErrorRows
+from src.scfapp.log_alerts.services.error_summary import ErrorSummary
+
+SCHEMA: dict[str, str] = {'Timestamp': 'timestamp', 'Attempts': 'int', 'Seconds': 'float', 'Status': 'category'}
+LOG: str = (
+    'Timestamp,Status,Attempts,Seconds,Message\n'
+    '2026-10-16T09:00:00,FAILED,3,1.5,"Item 1 not found, retrying"\n'
+    '2026-10-16T09:00:01.250000+00:00,FAILED,,0.25,"Multi-line\nmessage"\n'
+    '10/16/2026 9:00 AM,TIMEOUT,n/a,2,Logged in another format\n'  # Not ISO 8601; 2 isn't written as a float
+    '2026-10-16T09:00:03,FAILED,1\n'
+    '2026-10-16T09:00:04,RETRY,2,0.5,Extra columns,spill over\n'
+)
+
+
+def csv_rows(text: str) -> list[dict]:
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+def as_text(value) -> str | None:
+    """ Value as it was written in the CSV """
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return None if value is None else str(value)
+
+
+def collect(text: str, schema: dict[str, str] | None = SCHEMA, **kwargs) -> ErrorRows:
+    rows: ErrorRows = ErrorRows(schema=schema, **kwargs)
+    for row in csv_rows(text):
+        rows.add(row)
+    return rows
+
+
+def test_rows_round_trip_their_csv_values():
+    expected: list[dict] = [{k: v for k, v in row.items() if k is not None} for row in csv_rows(LOG)]
+
+    rows: ErrorRows = collect(LOG)
+
+    assert len(rows) == len(expected)
+    for row, original in zip(rows, expected):
+        assert list(row) == list(original)
+        assert {column: as_text(value) for column, value in row.items()} == {
+            column: value or None for column, value in original.items()
+        }
+
+
+def test_schema_columns_are_parsed_once():
+    rows: ErrorRows = collect(LOG)
+
+    assert rows[0]['Timestamp'] == datetime(2026, 10, 16, 9)
+    assert rows[0]['Attempts'] == 3 and rows[0]['Seconds'] == 1.5
+    assert rows[1]['Attempts'] is None  # Empty
+    assert rows[2]['Timestamp'] == '10/16/2026 9:00 AM' and rows[2]['Attempts'] == 'n/a'  # Kept as logged
+    assert rows[2]['Seconds'] == '2'
+    assert rows[3]['Message'] is None  # Short row
+    assert rows[-1]['Message'] == 'Extra columns'  # The overflow is dropped
+    assert rows[0]['Status'] is rows[1]['Status'] is rows[3]['Status']  # Shared
+    assert [record for record in rows.records(['Status', 'Missing'])][:2] == [('FAILED', None), ('FAILED', None)]
+
+
+def test_columns_added_later_are_empty_for_earlier_rows():
+    rows: ErrorRows = collect('Timestamp,Message\n2026-10-16T09:00:00,first\n')
+    rows.add({'Timestamp': '2026-10-16T09:00:01', 'Message': 'second', 'Barcode': '39031031000001'})
+
+    assert [row.get('Barcode') for row in rows] == [None, '39031031000001']
+    assert list(rows[0]) == ['Timestamp', 'Message', 'Barcode']
+
+
+def test_text_columns_stop_sharing_mostly_distinct_values():
+    lines: list[str] = [f'2026-10-16T09:00:00,Item {i} not found,same' for i in range(SHARE_SAMPLE + 10)]
+    rows: ErrorRows = collect('Timestamp,Message,Note\n' + '\n'.join(lines) + '\n', schema=None)
+    message, note = (rows.columns[rows.positions[column]] for column in ('Message', 'Note'))
+
+    assert message.shared is None
+    assert note.shared is not None and len(note.shared) == 1
+    assert rows[-1]['Message'] == f'Item {SHARE_SAMPLE + 9} not found'
+
+
+def test_truncated_rows_are_counted_and_summarized():
+    summary: ErrorSummary = ErrorSummary({'type': 'RequestHandler', 'schema': SCHEMA})
+
+    rows: ErrorRows = collect(LOG, max_rows=2, summary=summary)
+
+    assert (len(rows), rows.truncated) == (2, 3)
+    assert summary.rows == 5
+    assert [row['Message'] for row in rows] == ['Item 1 not found, retrying', 'Multi-line\nmessage']
@@ -0,0 +1,88 @@
+""" Tests for grouping error messages by signature """
+import pytest
+
+from src.scfapp.log_alerts.config import ERROR_TYPES
+from src.scfapp.log_alerts.services import errors_service
+from src.scfapp.log_alerts.services.error_signatures import (
+    DEFAULT_SIGNATURE_PATTERNS, SAMPLE_IDS, SignatureNormalizer, get_normalizer
+)
+from src.scfapp.log_alerts.services.error_summary import ErrorSummary
+from src.scfapp.log_alerts.services.errors_service import ErrorsService
+
+NORMALIZER: SignatureNormalizer = SignatureNormalizer(DEFAULT_SIGNATURE_PATTERNS)
+
+
+@pytest.mark.parametrize('message, signature, values', [
+    (
+        'Item 39031031234567 not found in MMS 991234567890104106',
+        'Item <id> not found in MMS <id>',
+        ('39031031234567', '991234567890104106')
+    ),
+    (
+        'Request 3f2b8c1e-4d5a-4e6f-9a8b-7c6d5e4f3a2b failed at 2026-10-16T09:15:02Z',
+        'Request <uuid> failed at <timestamp>',
+        ('3f2b8c1e-4d5a-4e6f-9a8b-7c6d5e4f3a2b',)
+    ),
+    ('Loan for user AB12345 due 10/16/2026 5:00 PM', 'Loan for user <id> due <timestamp>', ('AB12345',)),
+    ('Checksum 5d41402abc4b2a76b9719d91 mismatch', 'Checksum <hex> mismatch', ('5d41402abc4b2a76b9719d91',)),
+    ('Retry 3 of 5 failed', 'Retry 3 of 5 failed', ()),  # Short numbers aren't IDs
+])
+def test_default_patterns_mask_variable_values(message, signature, values):
+    assert NORMALIZER.normalize(message) == (signature, values)
+
+
+def test_per_type_patterns_take_precedence():
+    normalizer: SignatureNormalizer = get_normalizer({
+        'type': 'SignatureTestHandler',
+        'signature_patterns': [[r'\bLIB-\d+\b', '<library>']]
+    })
+
+    assert normalizer.normalize('LIB-12345 has no item 39031031234567') == (
+        '<library> has no item <id>', ('LIB-12345', '39031031234567')
+    )
+
+
+def test_bad_per_type_pattern_fails_fast():
+    with pytest.raises(Exception):
+        SignatureNormalizer([('(unclosed', '<x>')])
+
+
+def test_summary_groups_rows_by_signature():
+    summary: ErrorSummary = ErrorSummary({'type': 'RequestHandler'}, NORMALIZER)
+    for hour, barcode in enumerate(['39031031000001', '39031031000002', '39031031000001', '39031031000003',
+                                    '39031031000004']):
+        summary.add({'Timestamp': f'2026-10-16T0{hour}:00:00', 'Message': f'Item {barcode} not found'})
+    summary.add({'Timestamp': '2026-10-16T06:00:00', 'Message': 'Request 3f2b8c1e-4d5a-4e6f-9a8b-7c6d5e4f3a2b failed'})
+
+    top: list[dict] = summary.top(0)
+
+    assert summary.rows == 6
+    assert top == [
+        {
+            'Message': 'Item <id> not found', 'Count': 5,
+            'First Seen': '2026-10-16T00:00:00', 'Last Seen': '2026-10-16T04:00:00',
+            'Sample IDs': '39031031000001, 39031031000002, 39031031000003'
+        },
+        {
+            'Message': 'Request <uuid> failed', 'Count': 1,
+            'First Seen': '2026-10-16T06:00:00', 'Last Seen': '2026-10-16T06:00:00',
+            'Sample IDs': '3f2b8c1e-4d5a-4e6f-9a8b-7c6d5e4f3a2b'
+        },
+    ]
+    assert len(top[0]['Sample IDs'].split(', ')) == SAMPLE_IDS
+
+
+def test_grouped_report_lists_distinct_problems(fakes, monkeypatch):
+    monkeypatch.setattr(errors_service, 'ERRORS_GROUP_SIGNATURES', True)
+    rows: list[str] = [f'2026-10-16T09:{i // 60:02d}:{i % 60:02d},Item 390310310{i:05d} not found' for i in range(500)]
+    fakes[0].put('logs/RequestHandler_log_20261016.csv', ('Timestamp,Message\n' + '\n'.join(rows) + '\n').encode())
+    service: ErrorsService = ErrorsService()
+
+    email_body, attachments = service.build_error_report(
+        ERROR_TYPES[0], service.get_errors(ERROR_TYPES[0], '20261016')
+    )
+
+    assert '500 errors with 1 distinct problems' in email_body
+    assert 'Item &lt;id&gt; not found' in email_body
+    assert '39031031000499' not in email_body  # Only the first few IDs are sampled
+    assert [attachment['name'] for attachment in attachments] == ['RequestHandler_log_20261016.csv.gz']
@@ -0,0 +1,92 @@
+""" Tests for switching oversized error reports to a summary with the full log attached as a gzip'd CSV """
+import base64
+import gzip
+
+import pytest
+
+from src.scfapp.log_alerts.config import ERROR_TYPES
+from src.scfapp.log_alerts.services import errors_service
+from src.scfapp.log_alerts.services.email_service import EmailService
+from src.scfapp.log_alerts.services.errors_service import ErrorsService
+
+YESTERDAY: str = '20261016'
+REQUEST_HANDLER: dict = ERROR_TYPES[0]
+LOG_PATH: str = f"logs/RequestHandler_log_{YESTERDAY}.csv"
+
+
+def handler_log(rows: int) -> bytes:
+    """ A log with a few messages repeated over many rows """
+    lines: list[str] = ['Timestamp,Message']
+    for row in range(rows):
+        lines.append(f"2026-10-16T{row // 3600 % 24:02d}:{row // 60 % 60:02d}:{row % 60:02d},Request {row % 3} failed")
+    return ('\n'.join(lines) + '\n').encode()
+
+
+@pytest.fixture
+def share(fakes):
+    share = fakes[0]
+    share.put(LOG_PATH, handler_log(300))
+    return share
+
+
+def test_small_log_is_reported_in_full_without_a_summary(share):
+    service: ErrorsService = ErrorsService()
+    all_errors = service.get_errors(REQUEST_HANDLER, YESTERDAY)
+
+    email_body, attachments = service.build_error_report(REQUEST_HANDLER, all_errors)
+
+    assert all_errors.summary is None  # Not summarized while reading
+    assert attachments == []
+    assert email_body.count('Request 1 failed') == 100
+
+
+def test_oversized_log_is_summarized_with_the_log_attached(share, monkeypatch):
+    monkeypatch.setattr(errors_service, 'ERRORS_SUMMARY_MAX_BYTES', 1024)
+    service: ErrorsService = ErrorsService()
+    all_errors = service.get_errors(REQUEST_HANDLER, YESTERDAY)
+
+    email_body, attachments = service.build_error_report(REQUEST_HANDLER, all_errors)
+
+    assert len(email_body.encode()) < 4096
+    assert '300 errors with 3 distinct messages' in email_body
+    assert email_body.count('Request 1 failed') == 1
+    assert [attachment['name'] for attachment in attachments] == [f"RequestHandler_log_{YESTERDAY}.csv.gz"]
+    assert attachments[0]['contentType'] == 'application/gzip'
+    assert gzip.decompress(base64.b64decode(attachments[0]['contentInBase64'])) == share.files[LOG_PATH]
+
+
+def test_summary_counts_rows_past_the_row_cap(share, monkeypatch):
+    monkeypatch.setattr(errors_service, 'ERRORS_MAX_ROWS', 50)
+    monkeypatch.setattr(errors_service, 'ERRORS_SUMMARY_MAX_ROWS', 100)
+    service: ErrorsService = ErrorsService()
+    all_errors = service.get_errors(REQUEST_HANDLER, YESTERDAY)
+
+    email_body, _ = service.build_error_report(REQUEST_HANDLER, all_errors)
+
+    assert (len(all_errors), all_errors.truncated) == (50, 250)
+    assert '300 errors with 3 distinct messages' in email_body
+
+
+def test_log_too_large_to_attach_is_referenced_by_its_archive_path(share, monkeypatch):
+    monkeypatch.setattr(errors_service, 'ERRORS_SUMMARY_MAX_ROWS', 100)
+    monkeypatch.setattr(errors_service, 'ERRORS_ATTACHMENT_MAX_BYTES', 64)
+    service: ErrorsService = ErrorsService()
+
+    email_body, attachments = service.build_error_report(
+        REQUEST_HANDLER, service.get_errors(REQUEST_HANDLER, YESTERDAY)
+    )
+
+    assert attachments == []
+    assert f"archived as OLD/RequestHandler_log_{YESTERDAY}.csv" in email_body
+
+
+def test_create_attachment_base64_encodes_the_data():
+    data: bytes = gzip.compress(b'Timestamp,Message\n')
+
+    attachment: dict = EmailService().create_attachment('log.csv.gz', 'application/gzip', data)
+
+    assert attachment == {
+        'name': 'log.csv.gz',
+        'contentType': 'application/gzip',
+        'contentInBase64': base64.b64encode(data).decode('ascii')
+    }
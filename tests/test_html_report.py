@@ -0,0 +1,47 @@
+""" Tests that the HTML renderer reproduces the error table DataFrame.to_html used to write """
+import csv
+import io
+
+from pandas import DataFrame
+
+from src.scfapp.log_alerts.config import ERROR_TYPES
+from src.scfapp.log_alerts.services.csv_stream import iter_csv_rows
+from src.scfapp.log_alerts.services.errors_service import ErrorsService
+from src.scfapp.log_alerts.services.html_report import HtmlReport
+
+LOG: str = (
+    'Timestamp,Barcode,Message\n'
+    '2026-01-14T09:00:00,31234000000001,<b>Tom & "Jerry"</b> can\'t\n'
+    '2026-01-14T09:05:00,,Item not found\n'
+    '2026-01-14T09:10:00,31234000000003\n'  # Short row
+)
+
+
+def to_html(rows: list[dict]) -> str:
+    """ The markup the error emails used to be built from; missing values are now empty cells rather than NaN """
+    return DataFrame(rows).to_html(index=False, border=0, classes='error-table', na_rep='') + '\n'
+
+
+def render(rows) -> str:
+    report: HtmlReport = HtmlReport()
+    report.table(rows)
+    return report.fragment()
+
+
+def test_table_matches_to_html_for_parsed_error_rows():
+    rows = ErrorsService().collect_rows(iter_csv_rows([LOG.encode()]), ERROR_TYPES[0])  # Typed, columnar rows
+
+    assert render(rows) == to_html(list(csv.DictReader(io.StringIO(LOG))))
+
+
+def test_table_matches_to_html_for_mappings():
+    rows: list[dict] = [
+        {'Count': 3, 'Signature': 'Item <N> not found', 'Example': None},
+        {'Count': 1, 'Signature': 'Request & retry', 'Example': 'x > y'},
+    ]
+
+    assert render(rows) == to_html(rows)
+
+
+def test_empty_table_writes_nothing():
+    assert render([]) == ''
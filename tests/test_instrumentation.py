@@ -0,0 +1,126 @@
+""" Tests for per-stage spans and their exporters """
+import json
+import logging
+
+import pytest
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader
+
+from src.scfapp.log_alerts.config import ERROR_TYPES
+from src.scfapp.log_alerts.services import instrumentation
+from src.scfapp.log_alerts.services.errors_service import ErrorsService
+from src.scfapp.log_alerts.services.instrumentation import (
+    NOOP_SPAN, LogExporter, MemoryExporter, OtelExporter, create_exporter, instrumented, set_exporter, span
+)
+
+
+@pytest.fixture
+def exporter():
+    """ Collect spans in memory for one test, then turn instrumentation back off """
+    memory: MemoryExporter = MemoryExporter()
+    set_exporter(memory)
+    yield memory
+    set_exporter(None)
+
+
+def test_span_records_duration_volume_and_outcome(exporter):
+    with span('errors.read', type='RequestHandler') as current:
+        current.add(rows=3, nbytes=120)
+        current.add(rows=2)
+    with span('errors.read', type='ItemsHandler') as current:
+        current.fail('missing')
+    with pytest.raises(ValueError):
+        with span('email.send'):
+            raise ValueError("Rejected")
+
+    first, second = exporter.stage('errors.read')
+    assert first['duration_ms'] >= 0
+    assert {key: first[key] for key in ('rows', 'bytes', 'outcome', 'type')} == {
+        'rows': 5, 'bytes': 120, 'outcome': 'ok', 'type': 'RequestHandler'
+    }
+    assert second['outcome'] == 'missing'
+    assert exporter.stage('email.send')[0]['outcome'] == 'error'
+
+
+def test_instrumented_measures_the_result(exporter):
+    @instrumented('requests.query', rows=len, ok=bool)
+    def query(rows: int) -> list[int]:
+        return list(range(rows))
+
+    assert query(4) == [0, 1, 2, 3]
+    query(0)
+
+    assert [(record['rows'], record['outcome']) for record in exporter.stage('requests.query')] == [
+        (4, 'ok'), (0, 'failed')
+    ]
+
+
+def test_spans_are_noops_when_off():
+    set_exporter(None)
+
+    with span('errors.read') as current:
+        current.add(rows=1)
+
+    assert current is NOOP_SPAN and current.rows == 0
+
+
+def test_service_stages_are_instrumented(fakes, exporter):
+    log: bytes = b'Timestamp,Message\n2026-10-16T09:00:00,Request failed\n'
+    fakes[0].put('logs/RequestHandler_log_20261016.csv', log)
+
+    ErrorsService().get_errors(ERROR_TYPES[0], '20261016')
+    ErrorsService().get_errors(ERROR_TYPES[1], '20261016')
+
+    read, missing = exporter.stage('errors.read')
+    assert (read['type'], read['rows'], read['bytes'], read['outcome']) == ('RequestHandler', 1, len(log), 'ok')
+    assert (missing['type'], missing['outcome']) == ('ItemsHandler', 'missing')
+
+
+def test_log_exporter_writes_metric_traces(caplog):
+    with caplog.at_level(logging.INFO):
+        LogExporter('info').export({'stage': 'email.send', 'duration_ms': 1.5, 'rows': 0, 'bytes': 10})
+
+    record: logging.LogRecord = caplog.records[-1]
+    assert record.levelno == logging.INFO
+    assert record.getMessage().startswith('METRIC ')
+    assert json.loads(record.getMessage()[7:]) == {'stage': 'email.send', 'duration_ms': 1.5, 'rows': 0, 'bytes': 10}
+
+
+def test_otel_exporter_records_meters():
+    reader: InMemoryMetricReader = InMemoryMetricReader()
+    otel: OtelExporter = OtelExporter(MeterProvider(metric_readers=[reader]))
+
+    otel.export({'stage': 'errors.read', 'duration_ms': 12.5, 'rows': 3, 'bytes': 200, 'outcome': 'ok', 'type': 'A'})
+    otel.export({'stage': 'errors.read', 'duration_ms': 7.5, 'rows': 0, 'bytes': 0, 'outcome': 'missing', 'type': 'B'})
+
+    metrics: dict[str, list] = {
+        metric.name: metric.data.data_points
+        for resource in reader.get_metrics_data().resource_metrics
+        for scope in resource.scope_metrics
+        for metric in scope.metrics
+    }
+    assert sorted((point.attributes['outcome'], point.sum) for point in metrics['stage.duration']) == [
+        ('missing', 7.5), ('ok', 12.5)
+    ]
+    assert [(dict(point.attributes), point.value) for point in metrics['stage.rows']] == [
+        ({'stage': 'errors.read', 'outcome': 'ok', 'type': 'A'}, 3)
+    ]
+    assert [point.value for point in metrics['stage.bytes']] == [200]
+
+
+def test_azure_monitor_is_configured_with_a_connection_string(monkeypatch):
+    import azure.monitor.opentelemetry
+
+    calls: list[dict] = []
+    monkeypatch.setattr(azure.monitor.opentelemetry, 'configure_azure_monitor', lambda **kwargs: calls.append(kwargs))
+
+    assert not instrumentation.configure_azure_monitor(None)
+    assert instrumentation.configure_azure_monitor('InstrumentationKey=test')
+    assert calls == [{
+        'connection_string': 'InstrumentationKey=test',
+        'logger_name': instrumentation.METER_NAME,
+        'enable_live_metrics': False,
+        'enable_performance_counters': False
+    }]
+    assert isinstance(create_exporter('otel'), OtelExporter)
+    assert len(calls) == 1  # No connection string in the tests' environment
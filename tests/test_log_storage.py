@@ -0,0 +1,99 @@
+""" Tests that the local and file share log storage backends behave the same """
+import asyncio
+from pathlib import Path
+from typing import Any, Callable
+
+import pytest
+
+from src.scfapp.log_alerts.config import ERROR_TYPES
+from src.scfapp.log_alerts.services.errors_service import ErrorsService
+from src.scfapp.log_alerts.services.log_storage import (
+    FileShareLogStorage, LocalLogStorage, LogNotFoundError, LogStorage
+)
+
+
+@pytest.fixture
+def backends(fakes, tmp_path: Path) -> dict[str, LogStorage]:
+    return {'local': LocalLogStorage(str(tmp_path)), 'share': FileShareLogStorage()}
+
+
+def outcome(operation: Callable[[], Any]) -> Any:
+    """ Result of an operation, or the type of exception it raised """
+    try:
+        result: Any = operation()
+        return b''.join(result) if hasattr(result, '__next__') else result
+    except Exception as e:
+        return type(e)
+
+
+def exercise(storage: LogStorage) -> list:
+    """ Run the same operations on a backend and collect what each one returned or raised """
+    storage.make_directory('logs')
+    storage.make_directory('logs')  # Already exists
+    storage.make_directory('logs/OLD')
+    storage.write('logs/a.csv', b'Timestamp,Message\n')
+    storage.write('logs/a.csv', b'Timestamp,Message\nrow 1\n')  # Replaces
+    storage.write('logs/b.csv', b'b')
+    storage.write_at('logs/c.csv', 0, b'0123456789')  # Creates
+    storage.write_at('logs/c.csv', 4, b'ab')  # Truncates after the new data
+
+    results: list = [
+        sorted((item['name'], item['is_directory'], item['size']) for item in storage.list('logs')),
+        outcome(lambda: storage.open_stream('logs/a.csv')),
+        outcome(lambda: storage.open_stream('logs/c.csv')),
+        outcome(lambda: storage.read_range('logs/a.csv', 18, 3)),
+        outcome(lambda: storage.read_range('logs/a.csv', 100, 3)),  # Past the end
+        outcome(lambda: storage.move('logs/a.csv', 'logs/OLD/a.csv')),
+        outcome(lambda: storage.move('logs/b.csv', 'logs/OLD/a.csv')),  # Replaces the destination
+        outcome(lambda: storage.open_stream('logs/OLD/a.csv')),
+        outcome(lambda: storage.delete('logs/c.csv')),
+        sorted(item['name'] for item in storage.list('logs')),
+    ]
+    for operation in (  # Missing files and directories
+        lambda: storage.open_stream('logs/missing.csv'),
+        lambda: storage.read_range('logs/missing.csv', 0, 1),
+        lambda: storage.move('logs/missing.csv', 'logs/OLD/missing.csv'),
+        lambda: storage.delete('logs/missing.csv'),
+        lambda: storage.list('logs/missing'),
+    ):
+        results.append(outcome(operation))
+    return results
+
+
+def test_backends_behave_the_same(backends):
+    local, share = (exercise(backends[name]) for name in ('local', 'share'))
+
+    assert local == share
+    assert local == [
+        [('OLD', True, 0), ('a.csv', False, 24), ('b.csv', False, 1), ('c.csv', False, 6)],
+        b'Timestamp,Message\nrow 1\n',
+        b'0123ab',
+        b'row',
+        b'',
+        None,
+        None,
+        b'b',
+        None,
+        ['OLD'],
+    ] + [LogNotFoundError] * 5
+
+
+def test_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        LogStorage()
+
+
+@pytest.mark.parametrize('backend', ['local', 'share'])
+def test_archiving_replaces_an_earlier_copy(backends, backend):
+    storage: LogStorage = backends[backend]
+    storage.make_directory('logs')
+    storage.make_directory('logs/OLD')
+    storage.write('logs/OLD/RequestHandler_log_20261016.csv', b'partial copy from an interrupted run')
+    storage.write('logs/RequestHandler_log_20261016.csv', b'Timestamp,Message\n')
+    service: ErrorsService = ErrorsService()
+    service.storage = storage
+
+    assert asyncio.run(service.archive_error_log_async(ERROR_TYPES[0], '20261016'))
+
+    assert b''.join(storage.open_stream('logs/OLD/RequestHandler_log_20261016.csv')) == b'Timestamp,Message\n'
+    assert outcome(lambda: storage.open_stream('logs/RequestHandler_log_20261016.csv')) is LogNotFoundError
@@ -0,0 +1,60 @@
+""" Tests for the per-day metrics store """
+from datetime import date, timedelta
+
+from src.scfapp.log_alerts.services.metrics_store import MetricsStore
+from src.scfapp.log_alerts.services.state_store import MemoryStateStore
+
+DAY: date = date(2026, 10, 16)
+
+
+def test_history_tells_zero_from_no_data():
+    metrics: MetricsStore = MetricsStore(MemoryStateStore())
+    metrics.record('errors/A', DAY - timedelta(days=2), 5)
+    metrics.record('errors/A', DAY, 0)
+
+    assert metrics.history('errors/A', DAY, 4) == [None, 5, None, 0]
+    assert metrics.history('errors/B', DAY, 2) == [None, None]
+
+
+def test_record_is_idempotent_by_day():
+    store: MemoryStateStore = MemoryStateStore()
+    metrics: MetricsStore = MetricsStore(store)
+    metrics.record('errors/A', DAY, 7)
+    size: int = len(store.read(metrics.series_name('errors/A')))
+
+    metrics.record('errors/A', DAY, 7)
+    metrics.record('errors/A', DAY, 0, overwrite=False)  # Doesn't replace a recorded count
+
+    assert len(store.read(metrics.series_name('errors/A'))) == size
+    assert metrics.history('errors/A', DAY, 1) == [7]
+
+    metrics.record('errors/A', DAY + timedelta(days=1), 0, overwrite=False)  # Fills an empty day
+    assert MetricsStore(store).history('errors/A', DAY + timedelta(days=1), 2) == [7, 0]
+
+
+def test_trend_averages_earlier_days():
+    metrics: MetricsStore = MetricsStore(MemoryStateStore())
+    for offset in range(1, 8):
+        metrics.record('errors/A', DAY - timedelta(days=offset), offset)
+    metrics.record('errors/A', DAY, 100)  # Not part of its own trend
+
+    assert metrics.trend('errors/A', DAY) == {'avg_7': 4.0, 'avg_30': 4.0}
+
+
+def test_quiet_error_types_are_recorded_as_zero(fakes, monkeypatch):
+    from src.scfapp.log_alerts.config import ERROR_TYPES
+    from src.scfapp.log_alerts.services import errors_service
+
+    monkeypatch.setattr(errors_service, 'METRICS_TRENDS', True)
+    share = fakes[0]
+    share.put('logs/RequestHandler_log_20261016.csv', b'Timestamp,Message\n2026-10-16T09:00:00,Request failed\n')
+    share.put('logs/ItemsHandler_log_20261016.csv', b'Timestamp,Message\n')
+    service: errors_service.ErrorsService = errors_service.ErrorsService()
+    service.get_errors(ERROR_TYPES[1], '20261016')  # Header only
+
+    service.record_daily_volumes(ERROR_TYPES, '20261016')
+
+    metrics: MetricsStore = service.metrics
+    assert metrics.history('errors/RequestHandler', DAY, 1) == [None]  # Still waiting to be read
+    assert metrics.history('errors/ItemsHandler', DAY, 1) == [0]
+    assert metrics.history('errors/LoanReturnedHandler', DAY, 1) == [0]
@@ -0,0 +1,131 @@
+""" Tests for the persistent query result cache: TTL, open-window expiry, eviction and what gets cached """
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from azure.monitor.query import LogsQueryStatus
+
+from benchmarks.fakes import FakeLogsQueryClient
+from benchmarks.generators import request_traces
+from src.scfapp.log_alerts.services import query_cache
+from src.scfapp.log_alerts.services.query_cache import QueryCache, CachingLogsQueryClient, INDEX_NAME
+from src.scfapp.log_alerts.services.state_store import MemoryStateStore
+
+RESOURCE: str = '/subscriptions/test/appinsights'
+QUERY: str = "traces | where message has 'Request'"
+TTL: timedelta = timedelta(minutes=60)
+
+
+class PartialLogsQueryClient(FakeLogsQueryClient):
+    """ Returns its results as partial (incomplete) """
+    def query_resource(self, *args, **kwargs):
+        response = super().query_resource(*args, **kwargs)
+        response.status = LogsQueryStatus.PARTIAL
+        return response
+
+
+@pytest.fixture
+def clock(monkeypatch) -> SimpleNamespace:
+    """ Stands in for the time module in query_cache, so entry ages can be advanced """
+    fake_time: SimpleNamespace = SimpleNamespace(now=1_000_000.0)
+    fake_time.time = lambda: fake_time.now
+    monkeypatch.setattr(query_cache, 'time', fake_time)
+    return fake_time
+
+
+@pytest.fixture
+def store() -> MemoryStateStore:
+    return MemoryStateStore()
+
+
+def window(end: datetime) -> tuple[datetime, datetime]:
+    return end - timedelta(hours=1), end
+
+
+def caching_client(store: MemoryStateStore, start: datetime, **kwargs) -> CachingLogsQueryClient:
+    return CachingLogsQueryClient(FakeLogsQueryClient(request_traces(200, start)), QueryCache(store, **kwargs))
+
+
+def test_closed_window_is_served_past_the_ttl(store, clock):
+    timespan: tuple[datetime, datetime] = window(datetime.now(timezone.utc) - timedelta(days=1))
+    client: CachingLogsQueryClient = caching_client(store, timespan[0], ttl=TTL)
+
+    first = client.query_resource(RESOURCE, QUERY, timespan=timespan)
+    clock.now += 10 * TTL.total_seconds()
+    second = client.query_resource(RESOURCE, QUERY, timespan=timespan)
+
+    assert client.client.queries == 1
+    assert second.tables[0].rows == first.tables[0].rows
+    assert (client.cache.hits, client.cache.misses) == (1, 1)
+
+
+def test_open_window_expires_after_the_ttl(store, clock):
+    timespan: tuple[datetime, datetime] = window(datetime.now(timezone.utc) + timedelta(hours=1))
+    client: CachingLogsQueryClient = caching_client(store, timespan[0], ttl=TTL)
+
+    client.query_resource(RESOURCE, QUERY, timespan=timespan)
+    clock.now += TTL.total_seconds() - 1
+    client.query_resource(RESOURCE, QUERY, timespan=timespan)
+    assert client.client.queries == 1  # Still fresh
+
+    clock.now += 2
+    client.query_resource(RESOURCE, QUERY, timespan=timespan)
+    assert client.client.queries == 2  # Expired, queried again
+
+
+def test_keys_include_the_timespan_and_query(store, clock):
+    end: datetime = datetime.now(timezone.utc) - timedelta(days=1)
+    client: CachingLogsQueryClient = caching_client(store, end - timedelta(days=1))
+
+    client.query_resource(RESOURCE, QUERY, timespan=window(end))
+    client.query_resource(RESOURCE, QUERY, timespan=window(end - timedelta(hours=1)))
+    client.query_resource(RESOURCE, QUERY.replace('Request', 'Item'), timespan=window(end))
+
+    assert client.client.queries == 3
+
+
+def test_oldest_entries_are_evicted_past_the_size_limit(store, clock):
+    end: datetime = datetime.now(timezone.utc) - timedelta(days=1)
+    client: CachingLogsQueryClient = caching_client(store, end - timedelta(days=1))
+    client.query_resource(RESOURCE, QUERY, timespan=window(end))
+    entry_size: int = max(item['size'] for item in client.cache.load_index().values())
+    client.cache.max_bytes = 2 * entry_size + entry_size // 2  # Room for two entries
+
+    for hours in range(3):
+        clock.now += 1
+        client.query_resource(RESOURCE, QUERY, timespan=window(end - timedelta(hours=hours + 1)))
+
+    index: dict = client.cache.load_index()
+    assert len(index) == 2
+    assert sum(item['size'] for item in index.values()) <= client.cache.max_bytes
+    assert len([name for name in store.files if name.endswith('.json.gz')]) == 2
+
+    queries: int = client.client.queries
+    client.query_resource(RESOURCE, QUERY, timespan=window(end))  # Evicted, so queried again
+    client.query_resource(RESOURCE, QUERY, timespan=window(end - timedelta(hours=3)))  # Newest, still cached
+    assert client.client.queries == queries + 1
+
+
+def test_partial_results_are_not_cached(store, clock):
+    timespan: tuple[datetime, datetime] = window(datetime.now(timezone.utc) - timedelta(days=1))
+    client: CachingLogsQueryClient = CachingLogsQueryClient(
+        PartialLogsQueryClient(request_traces(200, timespan[0])), QueryCache(store)
+    )
+
+    client.query_resource(RESOURCE, QUERY, timespan=timespan)
+    client.query_resource(RESOURCE, QUERY, timespan=timespan)
+
+    assert client.client.queries == 2
+    assert store.read(INDEX_NAME) is None
+
+
+def test_corrupt_entry_is_a_miss(store, clock):
+    timespan: tuple[datetime, datetime] = window(datetime.now(timezone.utc) - timedelta(days=1))
+    client: CachingLogsQueryClient = caching_client(store, timespan[0])
+    client.query_resource(RESOURCE, QUERY, timespan=timespan)
+    store.write(client.cache.entry_name(client.cache.key(RESOURCE, QUERY, timespan)), b'not gzip')
+
+    result = client.query_resource(RESOURCE, QUERY, timespan=timespan)
+
+    assert client.client.queries == 2
+    assert result.tables[0].rows
@@ -0,0 +1,81 @@
+""" Tests that incremental request ingestion counts each trace exactly once across runs """
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from benchmarks.generators import request_traces
+from src.scfapp.log_alerts.config import REQUESTS_INGEST_LAG_MINUTES
+from src.scfapp.log_alerts.services import requests_service
+from src.scfapp.log_alerts.services.requests_service import RequestsService
+from src.scfapp.log_alerts.services.state_store import MemoryStateStore
+
+DAY_START: datetime = datetime(2026, 10, 16, tzinfo=ZoneInfo('America/New_York'))
+DAY_END: datetime = DAY_START + timedelta(days=1)
+LAG: timedelta = timedelta(minutes=REQUESTS_INGEST_LAG_MINUTES)
+
+
+class FrozenDatetime(datetime):
+    """ datetime whose now() is set by the test """
+    current: datetime = DAY_START
+
+    @classmethod
+    def now(cls, tz=None) -> datetime:
+        return cls.current.astimezone(tz)
+
+
+@pytest.fixture
+def clock(monkeypatch) -> type[FrozenDatetime]:
+    monkeypatch.setattr(requests_service, 'datetime', FrozenDatetime)
+    return FrozenDatetime
+
+
+def tally_counts(tally: dict) -> dict[str, dict[str, int]]:
+    return {req_type: dict(map(tuple, type_tally['ids'])) for req_type, type_tally in tally['types'].items()}
+
+
+def expected_counts(service: RequestsService, logs, end: datetime) -> dict[str, dict[str, int]]:
+    return {
+        summary['type']: dict(summary['ids'])
+        for summary in service.get_requests_summarized(logs, (DAY_START, end))
+    }
+
+
+def test_reruns_and_polls_count_each_trace_once(fakes, clock):
+    logs = fakes[1]
+    logs.traces.extend(request_traces(1000, DAY_START))
+    service: RequestsService = RequestsService()
+    store: MemoryStateStore = MemoryStateStore()
+
+    clock.current = DAY_START + timedelta(hours=9)
+    first: dict = service.ingest_requests(logs, store, DAY_START, DAY_END)
+    queries: int = logs.queries
+    rerun: dict = service.ingest_requests(logs, store, DAY_START, DAY_END)  # Same moment, e.g. a retried timer
+
+    assert logs.queries == queries  # Nothing new to query
+    assert tally_counts(rerun) == tally_counts(first) == expected_counts(service, logs, clock.current - LAG)
+
+    clock.current = DAY_START + timedelta(hours=17, minutes=3)
+    service.ingest_requests(logs, store, DAY_START, DAY_END)
+    clock.current = DAY_END + timedelta(hours=2)
+    final: dict = service.ingest_requests(logs, store, DAY_START, DAY_END)
+    service.ingest_requests(logs, store, DAY_START, DAY_END)
+
+    assert tally_counts(final) == tally_counts(service.load_tally(store, DAY_START))
+    assert tally_counts(final) == expected_counts(service, logs, DAY_END)
+    assert all(type_tally['watermark'] == DAY_END.isoformat() for type_tally in final['types'].values())
+
+
+def test_failed_query_leaves_the_watermark(fakes, clock):
+    logs = fakes[1]
+    logs.traces.extend(request_traces(100, DAY_START))
+    service: RequestsService = RequestsService()
+    store: MemoryStateStore = MemoryStateStore()
+    clock.current = DAY_START + timedelta(hours=12)
+    before: dict = service.ingest_requests(logs, store, DAY_START, DAY_END)
+
+    clock.current = DAY_END + timedelta(hours=1)
+    logs.traces = None  # Makes the query fail
+    assert service.ingest_requests(logs, store, DAY_START, DAY_END) is None
+
+    assert service.load_tally(store, DAY_START) == before
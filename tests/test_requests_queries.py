@@ -0,0 +1,88 @@
+""" Tests that the request query modes report the same requests """
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.generators import request_prefix, request_traces
+from src.scfapp.log_alerts.config import REQUEST_TYPES
+from src.scfapp.log_alerts.services.requests_service import RequestsService
+
+START: datetime = datetime(2026, 10, 16, tzinfo=timezone.utc)
+TIMESPAN: tuple[datetime, datetime] = (START, START + timedelta(days=1))
+
+
+def trace_rows(request_info: dict) -> list[list]:
+    return request_info['data'][['timestamp', 'message']].values.tolist()
+
+
+def test_batched_query_matches_per_type_queries(fakes):
+    logs = fakes[1]
+    logs.traces.extend(request_traces(500, START))
+    service: RequestsService = RequestsService()
+
+    per_type: list[dict] = service.get_requests_per_type(logs, TIMESPAN)
+    queries: int = logs.queries
+    batched: list[dict] = service.get_requests_batched(logs, TIMESPAN)
+
+    assert logs.queries - queries == 1
+    assert [info['type'] for info in batched] == [info['type'] for info in per_type]
+    assert [trace_rows(info) for info in batched] == [trace_rows(info) for info in per_type]
+    assert sum(len(info['data']) for info in batched) == 500
+    assert service.generate_email_body(batched, '2026-10-16') == service.generate_email_body(per_type, '2026-10-16')
+
+
+def test_batched_query_classifies_server_side():
+    query: str = RequestsService().build_batched_query()
+
+    assert query.count('traces') == 1
+    assert "| extend request_type = case(message has 'Create Item Request. Barcode:', 'Physical Item'" in query
+    assert query.endswith('| project request_type, timestamp, message')
+
+
+def id_list(block: str) -> list[str]:
+    """ A report block with its indented ID lines sorted """
+    lines: list[str] = block.splitlines()
+    ids: list[str] = sorted(line for line in lines if line.startswith('    '))
+    return [line for line in lines if not line.startswith('    ')] + ids
+
+
+def unique_traces(count: int) -> list[tuple[datetime, str]]:
+    return [
+        (START + timedelta(minutes=i), f"{request_prefix(REQUEST_TYPES[i % len(REQUEST_TYPES)])} {i:014d}")
+        for i in range(count)
+    ]
+
+
+def test_summarized_query_renders_the_default_report(fakes):
+    logs = fakes[1]
+    logs.traces.extend(unique_traces(200))
+    service: RequestsService = RequestsService()
+
+    default: str = service.generate_email_body(service.get_requests_per_type(logs, TIMESPAN), '2026-10-16')
+    summarized: str = service.generate_email_body(service.get_requests_summarized(logs, TIMESPAN), '2026-10-16')
+
+    assert summarized == default
+    assert 'Requested More Than Once' not in default
+
+
+def test_summarized_query_adds_repeated_ids(fakes):
+    logs = fakes[1]
+    logs.traces.extend(request_traces(500, START))  # IDs repeat
+    service: RequestsService = RequestsService()
+
+    default: str = service.generate_email_body(service.get_requests_per_type(logs, TIMESPAN), '2026-10-16')
+    summarized: str = service.generate_email_body(service.get_requests_summarized(logs, TIMESPAN), '2026-10-16')
+    blocks: list[str] = summarized.split('\n\n')
+    repeated: list[str] = [block for block in blocks if 'Requested More Than Once' in block]
+
+    assert 'Requested More Than Once' not in default
+    assert repeated
+    # The same IDs, with a repeated ID's requests listed together rather than in time order
+    assert [id_list(block) for block in blocks if block not in repeated] == [
+        id_list(block) for block in default.split('\n\n')
+    ]
+
+
+def test_summarized_query_extracts_and_counts_server_side():
+    query: str = RequestsService().build_summarized_query()
+
+    assert 'extract(@"([^:]*)$", 1, message)' in query
+    assert '| summarize request_count = count(), first_seen = min(timestamp) by request_type, request_id' in query
@@ -0,0 +1,49 @@
+""" Tests for the index of error rows reported on earlier days """
+from datetime import date, timedelta
+
+from src.scfapp.log_alerts.services.seen_index import SeenIndex, content_hash
+from src.scfapp.log_alerts.services.state_store import MemoryStateStore
+
+DAY: date = date(2026, 10, 16)
+
+
+def test_rows_are_seen_only_after_a_delivered_report():
+    store: MemoryStateStore = MemoryStateStore()
+    index: SeenIndex = SeenIndex(store, 'seen.bin', max_days=30, today=DAY)
+    assert not index.seen(content_hash('Item not found'))
+    assert not index.seen(content_hash('Item not found'))  # Same day
+    index.save()
+
+    later: SeenIndex = SeenIndex(store, 'seen.bin', max_days=30, today=DAY + timedelta(days=1))
+    assert later.seen(content_hash('Item not found'))
+    assert not later.seen(content_hash('Request failed'))
+
+
+def test_discarded_rows_are_not_saved():
+    store: MemoryStateStore = MemoryStateStore()
+    index: SeenIndex = SeenIndex(store, 'seen.bin', max_days=30, today=DAY)
+    index.seen(content_hash('Item not found'))
+    index.discard()
+    index.save()
+
+    assert store.read('seen.bin') is None
+    assert not SeenIndex(store, 'seen.bin', max_days=30, today=DAY + timedelta(days=1)).seen(
+        content_hash('Item not found')
+    )
+
+
+def test_entries_expire_after_max_days():
+    store: MemoryStateStore = MemoryStateStore()
+    index: SeenIndex = SeenIndex(store, 'seen.bin', max_days=7, today=DAY)
+    index.seen(content_hash('Item not found'))
+    index.save()
+
+    assert SeenIndex(store, 'seen.bin', max_days=7, today=DAY + timedelta(days=7)).entries
+    assert not SeenIndex(store, 'seen.bin', max_days=7, today=DAY + timedelta(days=8)).entries
+
+
+def test_unreadable_index_starts_empty():
+    store: MemoryStateStore = MemoryStateStore()
+    store.write('seen.bin', b'garbage')
+
+    assert SeenIndex(store, 'seen.bin', max_days=7, today=DAY).entries == {}
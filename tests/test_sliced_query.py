@@ -0,0 +1,78 @@
+""" Tests for splitting request queries into time slices """
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any
+
+from azure.monitor.query import LogsQueryStatus
+
+from benchmarks.fakes import FakeLogsQueryClient
+from src.scfapp.log_alerts.services.sliced_query import SlicedQueryExecutor, SlicedQueryPartialResult
+
+START: datetime = datetime(2026, 10, 16, tzinfo=timezone.utc)
+END: datetime = START + timedelta(days=1)
+
+
+class LimitedLogsQueryClient(FakeLogsQueryClient):
+    """ Returns a partial result, truncated to the limit, for any window with more rows than the limit """
+    def __init__(self, traces: list[tuple[datetime, str]], limit: int):
+        super().__init__(traces)
+        self.limit: int = limit
+
+    def query_resource(self, resource_id: str, query: str, *, timespan: tuple[datetime, datetime], **kwargs: Any):
+        result = super().query_resource(resource_id, query, timespan=timespan, **kwargs)
+        table = result.tables[0]
+        if len(table.rows) <= self.limit:
+            return result
+        table.rows = table.rows[:self.limit]
+        return SimpleNamespace(status=LogsQueryStatus.PARTIAL, partial_data=[table], partial_error="Too many rows")
+
+
+def build_query(start: datetime, end: datetime) -> str:
+    return (f"traces | where timestamp >= datetime({start.isoformat()}) and timestamp < datetime({end.isoformat()}) "
+            f"| where message has 'Request'")
+
+
+def traces_every(step: timedelta, count: int) -> list[tuple[datetime, str]]:
+    return [(START + step * i, f"Request {i}") for i in range(count)]
+
+
+def test_partial_slices_are_split_until_complete():
+    traces: list[tuple[datetime, str]] = traces_every(timedelta(minutes=15), 96)
+    client: LimitedLogsQueryClient = LimitedLogsQueryClient(traces, limit=10)
+    executor: SlicedQueryExecutor = SlicedQueryExecutor(client, slices=2, concurrency=4, min_slice=timedelta(minutes=1))
+
+    columns, rows = executor.query(build_query, (START, END), 'test')
+
+    assert executor.complete
+    assert columns == ['timestamp', 'message']
+    assert rows == [[ts, message] for ts, message in traces]
+    assert client.queries > 2
+
+
+def test_boundary_traces_are_counted_once():
+    traces: list[tuple[datetime, str]] = [(START + timedelta(hours=12), "Request on the boundary")]
+    executor: SlicedQueryExecutor = SlicedQueryExecutor(FakeLogsQueryClient(traces), slices=2, concurrency=2)
+
+    _, rows = executor.query(build_query, (START, END), 'test')
+
+    assert rows == [[START + timedelta(hours=12), "Request on the boundary"]]
+
+
+def test_slices_still_partial_at_the_minimum_length_are_reported():
+    busy: datetime = START + timedelta(hours=6)
+    traces: list[tuple[datetime, str]] = [(busy, f"Request {i}") for i in range(20)]
+    executor: SlicedQueryExecutor = SlicedQueryExecutor(
+        LimitedLogsQueryClient(traces, limit=5), slices=4, concurrency=4, min_slice=timedelta(hours=1)
+    )
+
+    _, rows = executor.query(build_query, (START, END), 'test')
+
+    assert not executor.complete
+    assert len(rows) == 5
+    assert len(executor.partial_windows) == 1
+    window_start, window_end = executor.partial_windows[0]
+    assert window_start <= busy < window_end and window_end - window_start < timedelta(hours=2)
+
+    result: SlicedQueryPartialResult = SlicedQueryPartialResult([], executor.partial_windows)
+    assert result.status == LogsQueryStatus.PARTIAL
+    assert window_start.isoformat() in result.partial_error